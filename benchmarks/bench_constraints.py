@@ -0,0 +1,104 @@
+"""Compare the plonex constraints parser with pip-requirements-parser.
+
+The synthetic file follows the format of the Plone release constraints:
+one `name==version` pin per line, a few extras and environment markers,
+comments and `-c` includes. A real file (e.g. a downloaded
+https://dist.plone.org/release/6.1-latest/constraints.txt) can be used instead.
+Both parsers must produce the same constraints.
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from pip_requirements_parser import RequirementsFile  # type: ignore
+from plonex.services.install.constraints import parse_constraints_file
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+
+import sys
+
+
+DEFAULT_LINES = 1500
+DEFAULT_RUNS = 10
+
+
+def synthetic_constraints(lines: int) -> str:
+    result = [
+        "# Plone constraints",
+        "-c https://dist.plone.org/release/6.1-latest/zope-constraints.txt",
+        "",
+    ]
+    for index in range(lines):
+        if index % 100 == 0:
+            result.append(f"# Section {index // 100}")
+        if index % 150 == 0:
+            result.append(f'package-{index}==1.{index} ; python_version < "3.12"')
+        elif index % 250 == 0:
+            result.append(f"Package_{index}[test]==2.{index}")
+        else:
+            result.append(f"package.name{index}==1.{index % 10}.{index}")
+    return "\n".join(result) + "\n"
+
+
+def best_of(runs: int, function: Callable[[], object]) -> float:
+    """Return the best time in milliseconds"""
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--file",
+        type=Path,
+        help="Parse this constraints file instead of a synthetic one",
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=DEFAULT_LINES,
+        help=f"Number of pins of the synthetic file (default: {DEFAULT_LINES})",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=DEFAULT_RUNS,
+        help=f"Number of runs, the best one is reported (default: {DEFAULT_RUNS})",
+    )
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        path = args.file
+        if path is None:
+            path = Path(temp_dir) / "constraints.txt"
+            path.write_text(synthetic_constraints(args.lines))
+
+        def full_parser():
+            return RequirementsFile.from_file(str(path), include_nested=False)
+
+        expected = [requirement.dumps() for requirement in full_parser().requirements]
+        found = [
+            requirement.dumps()
+            for requirement in parse_constraints_file(path).requirements
+        ]
+        if found != expected:
+            print("The parsers do not agree:")
+            for line in sorted(set(found).symmetric_difference(expected)):
+                print(f"  {line}")
+            return 1
+
+        full_ms = best_of(args.runs, full_parser)
+        plonex_ms = best_of(args.runs, lambda: parse_constraints_file(path))
+
+    print(f"{len(expected)} constraints")
+    print(f"{'pip-requirements-parser':>24}: {full_ms:8.2f} ms")
+    print(f"{'plonex':>24}: {plonex_ms:8.2f} ms ({full_ms / plonex_ms:.0f}x faster)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Check the import time of the plonex entry point.
+
+Runs `python -X importtime -m plonex.cli --version` a few times
+and fails if the cumulative import time of plonex.cli exceeds the budget
+or if any module that only some commands need is imported.
+
+Supervisor restarts `plonex zeoserver` and `plonex runwsgi`,
+so this cost is paid every time a process is (re)started.
+"""
+
+from argparse import ArgumentParser
+from statistics import median
+
+import subprocess
+import sys
+
+
+DEFAULT_BUDGET_MS = 200
+DEFAULT_RUNS = 5
+FORBIDDEN_MODULES = (
+    "jinja2",
+    "pip_requirements_parser",
+    "plonex.services.describe",
+    "plonex.services.install",
+    "requests",
+    "setuptools",
+    "webbrowser",
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Return the cumulative import time in microseconds for each module"""
+    timings: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        timings[module.strip()] = int(cumulative)
+    return timings
+
+
+def measure() -> dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "plonex.cli", "--version"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Import time budget for plonex.cli (default: {DEFAULT_BUDGET_MS})",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=DEFAULT_RUNS,
+        help=f"Number of runs, the median is used (default: {DEFAULT_RUNS})",
+    )
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    elapsed_ms = median(timings["plonex.cli"] for timings in runs) / 1000
+    forbidden = sorted(set(FORBIDDEN_MODULES).intersection(runs[-1]))
+
+    print(f"plonex.cli import time: {elapsed_ms:.1f} ms (budget {args.budget_ms} ms)")
+    failed = False
+    if elapsed_ms > args.budget_ms:
+        print("The import time budget is exceeded")
+        failed = True
+    if forbidden:
+        print(f"Unexpected modules imported: {', '.join(forbidden)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
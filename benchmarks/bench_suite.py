@@ -0,0 +1,361 @@
+"""Measure the orchestration overhead of plonex on synthetic projects.
+
+The fixtures are generated in a temporary folder and never touch the network:
+the project has a fake .venv whose bin folder holds stub executables
+and the git executable is replaced by a stub that answers instantly,
+so what is measured is the time spent by plonex itself.
+
+Benchmarks:
+
+- startup_cold: `plonex compile` in a new process without the options cache
+- startup_warm: `plonex compile` in a new process with the options cache
+- options_deep: resolve the options of a chain of nested profiles
+- options_wide: resolve the options of many sibling profiles
+- constraints: `make_constraints_txt` on a 1,500 lines constraints file
+- template: render a template with `TemplateService`
+- sources_list: `plonex sources list --refresh` with 200 checkouts
+- sources_list_cached: `plonex sources list` with 200 checkouts
+  whose status is in the status index
+
+The results can be saved as JSON and compared with a stored baseline,
+in which case the exit code is 1 if a benchmark got slower than the tolerance.
+"""
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import datetime
+from importlib.metadata import version
+from pathlib import Path
+from plonex import yaml_io
+from plonex.base import BaseService
+from plonex.options_cache import options_store
+from plonex.services.install import InstallService
+from plonex.services.sources import SourcesService
+from plonex.services.template import TemplateService
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+
+
+DEFAULT_RUNS = 5
+DEFAULT_TOLERANCE = 0.2
+PROFILE_DEPTH = 20
+PROFILE_WIDTH = 50
+OPTIONS_PER_PROFILE = 50
+CONSTRAINTS = 1500
+CHECKOUTS = 200
+
+STUB_EXECUTABLE = "#!/bin/sh\nexit 0\n"
+# Answers `git status --porcelain=v2 --branch` like for a clean checkout,
+# the remote URL and the HEAD are read from the files of the .git folder
+STUB_GIT = """#!/bin/sh
+for arg in "$@"; do
+    case "$arg" in
+        --porcelain=v2)
+            echo "# branch.oid 0123456789abcdef0123456789abcdef01234567"
+            echo "# branch.head main"
+            echo "# branch.upstream origin/main"
+            echo "# branch.ab +0 -0"
+            exit 0;;
+    esac
+done
+exit 0
+"""
+GIT_CONFIG = """[core]
+\trepositoryformatversion = 0
+[remote "origin"]
+\turl = {repo}
+\tfetch = +refs/heads/*:refs/remotes/origin/*
+[branch "main"]
+\tremote = origin
+\tmerge = refs/heads/main
+"""
+
+
+def write_executable(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    path.chmod(0o755)
+
+
+def write_yaml(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(yaml_io.dump(data))
+
+
+def profile_options(name: str) -> dict:
+    return {
+        f"{name}_option_{index}": (
+            f"value {index}" if index % 2 else {"enabled": True, "port": index}
+        )
+        for index in range(OPTIONS_PER_PROFILE)
+    }
+
+
+def make_project(root: Path, profiles: list[str] | None = None) -> Path:
+    """Create a project folder with a fake virtualenv"""
+    write_yaml(root / "etc" / "plonex.yml", {"profiles": profiles or []})
+    bin_folder = root / ".venv" / "bin"
+    for name in ("activate", "pip", "python", "uv", "gitman", "runwsgi"):
+        write_executable(bin_folder / name, STUB_EXECUTABLE)
+    return root
+
+
+def make_deep_project(root: Path) -> Path:
+    """A project whose profiles extend each other PROFILE_DEPTH times"""
+    for level in range(PROFILE_DEPTH):
+        nested = [f"../level-{level + 1}"] if level + 1 < PROFILE_DEPTH else []
+        write_yaml(
+            root / "profiles" / f"level-{level}" / "etc" / "plonex.yml",
+            {"profiles": nested, **profile_options(f"level_{level}")},
+        )
+    return make_project(root, ["profiles/level-0"])
+
+
+def make_wide_project(root: Path) -> Path:
+    """A project with PROFILE_WIDTH sibling profiles sharing a base profile"""
+    write_yaml(
+        root / "profiles" / "base" / "etc" / "plonex.yml", profile_options("base")
+    )
+    for index in range(PROFILE_WIDTH):
+        write_yaml(
+            root / "profiles" / f"sibling-{index}" / "etc" / "plonex.yml",
+            {"profiles": ["../base"], **profile_options(f"sibling_{index}")},
+        )
+    return make_project(
+        root, [f"profiles/sibling-{index}" for index in range(PROFILE_WIDTH)]
+    )
+
+
+def make_constraints_project(root: Path) -> Path:
+    make_project(root)
+    options = yaml_io.load_file(root / "etc" / "plonex.yml")
+    options["plonex_base_constraint"] = None
+    write_yaml(root / "etc" / "plonex.yml", options)
+    lines = [f"package-{index}==1.{index % 10}.{index}" for index in range(CONSTRAINTS)]
+    # Markers and extras like the ones found in the Plone constraints
+    lines[::100] = [
+        f"package-{index}[test]==2.0 ; python_version >= '3.10'"
+        for index in range(0, CONSTRAINTS, 100)
+    ]
+    constraints = root / "etc" / "constraints.d" / "plone.txt"
+    constraints.parent.mkdir(parents=True, exist_ok=True)
+    constraints.write_text("\n".join(lines) + "\n")
+    return root
+
+
+def make_template(root: Path) -> tuple[Path, dict]:
+    template = root / "zope.conf.j2"
+    template.write_text(
+        "%define INSTANCEHOME {{ instance_home }}\n"
+        "{% for name, value in environment.items() %}"
+        "  {{ name }} {{ value | string | upper }}\n"
+        "{% endfor %}"
+        "{% for line in zope_conf_additional %}{{ line }}\n{% endfor %}"
+    )
+    options = {
+        "instance_home": str(root),
+        "environment": {f"VARIABLE_{index}": index for index in range(200)},
+        "zope_conf_additional": [f"# line {index}" for index in range(200)],
+    }
+    return template, options
+
+
+def make_sources_project(root: Path) -> Path:
+    make_project(root)
+    sources = {}
+    for index in range(CHECKOUTS):
+        name = f"collective.package{index}"
+        repo = f"https://github.com/example/{name}.git"
+        sources[name] = {"repo": repo}
+        git_folder = root / "src" / name / ".git"
+        git_folder.mkdir(parents=True)
+        (git_folder / "HEAD").write_text("ref: refs/heads/main\n")
+        (git_folder / "config").write_text(GIT_CONFIG.format(repo=repo))
+    write_yaml(root / "etc" / "plonex.yml", {"sources": sources})
+    return root
+
+
+def reset_caches() -> None:
+    options_store.clear()
+    yaml_io.clear_cache()
+
+
+def run_plonex(project: Path, *args: str) -> None:
+    subprocess.run(
+        [sys.executable, "-m", "plonex.cli", "-q", "-t", str(project), *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def benchmarks(workdir: Path) -> dict[str, Callable[[], object]]:
+    """Create the fixtures and return the functions to time"""
+    startup = make_project(workdir / "startup")
+    deep = make_deep_project(workdir / "deep")
+    wide = make_wide_project(workdir / "wide")
+    constraints = make_constraints_project(workdir / "constraints")
+    template, template_options = make_template(workdir)
+    sources = make_sources_project(workdir / "sources")
+
+    def startup_cold() -> None:
+        shutil.rmtree(startup / "var", ignore_errors=True)
+        run_plonex(startup, "compile")
+
+    def startup_warm() -> None:
+        run_plonex(startup, "compile")
+
+    def options(project: Path) -> Callable[[], object]:
+        def resolve() -> object:
+            reset_caches()
+            return BaseService(target=project).options
+
+        return resolve
+
+    def make_constraints_txt() -> None:
+        reset_caches()
+        InstallService(target=constraints).make_constraints_txt()
+
+    def render_template() -> None:
+        with TemplateService(
+            source_path=template,
+            target_path=workdir / "zope.conf",
+            options=template_options,
+        ) as service:
+            service.run()
+
+    def sources_list(refresh: bool) -> Callable[[], object]:
+        def run_list() -> None:
+            reset_caches()
+            with redirect_stdout(io.StringIO()):
+                with SourcesService(target=sources) as service:
+                    service.run_list(refresh=refresh)
+
+        return run_list
+
+    return {
+        "startup_cold": startup_cold,
+        "startup_warm": startup_warm,
+        "options_deep": options(deep),
+        "options_wide": options(wide),
+        "constraints": make_constraints_txt,
+        "template": render_template,
+        "sources_list": sources_list(refresh=True),
+        "sources_list_cached": sources_list(refresh=False),
+    }
+
+
+def measure(function: Callable[[], object], runs: int) -> dict[str, float]:
+    """Time function runs times after a warm up run, in milliseconds"""
+    function()
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        function()
+        timings.append((perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(timings),
+        "median_ms": median(timings),
+        "max_ms": max(timings),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return the benchmarks whose median is slower than the baseline"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        print(f"{name:>19}: {before:9.2f} ms -> {after:9.2f} ms ({change:+.0%})")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=DEFAULT_RUNS,
+        help=f"Number of runs for each benchmark (default: {DEFAULT_RUNS})",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        metavar="NAME",
+        help="Run only the given benchmark (can be repeated)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write the results in this JSON file",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        metavar="BASELINE",
+        help="Compare the results with a JSON file written by --output",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=(
+            "Slowdown of the median allowed by --compare "
+            f"(default: {DEFAULT_TOLERANCE:.0%}%)"
+        ),
+    )
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        workdir = Path(temp_dir)
+        write_executable(workdir / "bin" / "git", STUB_GIT)
+        os.environ["PATH"] = f"{workdir / 'bin'}{os.pathsep}{os.environ['PATH']}"
+        BaseService.command_output_enabled = False
+        selected = {
+            name: function
+            for name, function in benchmarks(workdir).items()
+            if not args.only or name in args.only
+        }
+        results = {}
+        for name, function in selected.items():
+            results[name] = measure(function, args.runs)
+            print(f"{name:>19}: {results[name]['median_ms']:9.2f} ms")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plonex": version("plonex"),
+        "runs": args.runs,
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written in {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        print(f"Compared with {args.compare}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Compare the YAML loaders on a synthetic configuration file.
+
+The file has 2,000 top level keys mixing scalars, lists and mappings,
+which is much larger than a real plonex.yml but makes the differences
+between the pure Python loader, the libyaml loader and the parse cache
+easy to see.
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from plonex import yaml_io
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+
+import sys
+import yaml
+
+
+DEFAULT_KEYS = 2000
+DEFAULT_RUNS = 20
+
+
+def synthetic_config(keys: int) -> dict:
+    config: dict = {}
+    for index in range(keys):
+        if index % 3 == 0:
+            config[f"option_{index}"] = f"value {index}"
+        elif index % 3 == 1:
+            config[f"option_{index}"] = [f"item-{index}-{item}" for item in range(5)]
+        else:
+            config[f"option_{index}"] = {
+                "enabled": index % 2 == 0,
+                "port": 8000 + index,
+                "label": "{{ option_0 }}",
+            }
+    return config
+
+
+def best_of(runs: int, function: Callable[[], object]) -> float:
+    """Return the best time in milliseconds"""
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--keys",
+        type=int,
+        default=DEFAULT_KEYS,
+        help=f"Number of top level keys (default: {DEFAULT_KEYS})",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=DEFAULT_RUNS,
+        help=f"Number of runs, the best one is reported (default: {DEFAULT_RUNS})",
+    )
+    args = parser.parse_args()
+
+    config = synthetic_config(args.keys)
+    with TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "plonex.yml"
+        path.write_text(yaml.dump(config))
+        text = path.read_text()
+
+        results = {
+            "yaml.safe_load": best_of(args.runs, lambda: yaml.safe_load(text)),
+            "yaml_io.safe_load": best_of(args.runs, lambda: yaml_io.safe_load(text)),
+            "yaml_io.load_file (cached)": best_of(
+                args.runs, lambda: yaml_io.load_file(path)
+            ),
+            "yaml.dump": best_of(args.runs, lambda: yaml.dump(config)),
+            "yaml_io.dump": best_of(args.runs, lambda: yaml_io.dump(config)),
+        }
+
+    print(f"{args.keys} keys, {len(text)} bytes, libyaml: {yaml.__with_libyaml__}")
+    for name, elapsed_ms in results.items():
+        print(f"{name:>28}: {elapsed_ms:8.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+from importlib import import_module
+from typing import Any
+from typing import Callable
+
+
+def lazy_getattr(
+    namespace: dict[str, Any],
+    imports: dict[str, str],
+) -> Callable[[str], Any]:
+    """Return a module level `__getattr__` that imports names on first use.
+
+    The imports argument maps an attribute name to the module defining it.
+    Once imported, the value is stored in the namespace of the module,
+    so later lookups are plain attribute accesses.
+    """
+
+    def __getattr__(name: str) -> Any:
+        try:
+            module_name = imports[name]
+        except KeyError:
+            raise AttributeError(
+                f"module {namespace['__name__']!r} has no attribute {name!r}"
+            ) from None
+        value = getattr(import_module(module_name), name)
+        namespace[name] = value
+        return value
+
+    return __getattr__
@@ -2,24 +2,93 @@ from dataclasses import dataclass
 from dataclasses import field
 from functools import cached_property
 from functools import wraps
-from jinja2 import BaseLoader
-from jinja2 import Environment
 from pathlib import Path
 from plonex import logger
+from plonex import yaml_io
 from plonex._logger import warning_once
 from plonex.config import normalize_options
+from plonex.options_cache import cache_key
+from plonex.options_cache import options_store
+from plonex.options_cache import OptionsCache
+from plonex.timings import timings
 from rich.console import Console
 from tempfile import mkdtemp
 from typing import Any
 from typing import Callable
 from typing import ClassVar
+from typing import Hashable
 from typing import Sequence
+from typing import TYPE_CHECKING
 
 import logging
+import resource
 import sh  # type: ignore[import-untyped]
 import sys
 import time
-import yaml
+
+
+if TYPE_CHECKING:
+    from plonex.services.profile import ProfileGraph
+
+
+# The spans recorded for the lifecycle methods of the services
+_TRACED_METHODS = {
+    "enter": "__enter__",
+    "run": "run",
+    "exit": "__exit__",
+}
+
+
+def _traced(phase: str) -> Callable[[Callable], Callable]:
+    """Record a span for each call of a service method.
+
+    Calls through super() of a method already being traced
+    are part of the outer span.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not timings.active or phase in self._traced_phases:
+                return method(self, *args, **kwargs)
+            self._traced_phases.add(phase)
+            try:
+                with timings.span(
+                    f"{phase} {self.name}", **{"plonex.service": self.name}
+                ):
+                    return method(self, *args, **kwargs)
+            finally:
+                self._traced_phases.discard(phase)
+
+        wrapper.__traced__ = True  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+def _command_attributes(
+    usage_before: resource.struct_rusage,
+    exit_code: int,
+    output: str | bytes,
+    stream_output: bool,
+) -> dict[str, Any]:
+    """The span attributes of a command run by execute_command.
+
+    The resource usage is the one of the terminated child processes,
+    maxrss is the peak of the largest one so far (in KiB on Linux).
+    """
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    attributes: dict[str, Any] = {
+        "process.exit_code": exit_code,
+        "process.child.maxrss": usage.ru_maxrss,
+        "process.child.utime": usage.ru_utime - usage_before.ru_utime,
+        "process.child.stime": usage.ru_stime - usage_before.ru_stime,
+    }
+    if not stream_output:
+        if isinstance(output, str):
+            output = output.encode()
+        attributes["process.output.bytes"] = len(output)
+    return attributes
 
 
 @dataclass(kw_only=True)
@@ -41,9 +110,23 @@ class BaseService:
     post_services: None | list = field(default=None, init=False)
     logger: logging.Logger = field(default=logger, init=False)
     _entered: bool = field(default=False, init=False)
+    _options_inputs: list[Path] = field(default_factory=list, init=False, repr=False)
+    _options_cacheable: bool = field(default=True, init=False, repr=False)
+    _traced_phases: set[str] = field(default_factory=set, init=False, repr=False)
 
     stream_output: ClassVar[bool] = False
     command_output_enabled: ClassVar[bool] = True
+    options_cache_enabled: ClassVar[bool] = False
+    http_cache_enabled: ClassVar[bool] = False
+    offline: ClassVar[bool] = False
+
+    def __init_subclass__(cls, **kwargs):
+        """Trace the lifecycle methods overridden by the subclass"""
+        super().__init_subclass__(**kwargs)
+        for phase, method_name in _TRACED_METHODS.items():
+            method = cls.__dict__.get(method_name)
+            if method is not None and not hasattr(method, "__traced__"):
+                setattr(cls, method_name, _traced(phase)(method))
 
     @cached_property
     def options_defaults(self) -> dict:
@@ -52,13 +135,16 @@ class BaseService:
         }
 
     def _load_yaml_mapping(self, path: Path) -> dict:
+        self._options_inputs.append(path)
         if not path.exists():
             self.logger.warning("Config file %r does not exist", path)
+            self._options_cacheable = False
             return {}
 
-        file_options = yaml.safe_load(path.read_text()) or {}
+        file_options = yaml_io.load_file(path) or {}
         if not isinstance(file_options, dict):
             self.logger.error("The config file %r should contain a dict", path)
+            self._options_cacheable = False
             return {}
         return file_options
 
@@ -112,46 +198,80 @@ class BaseService:
             return profile
         return relative_to / source_path
 
-    def _load_profile_options(
+    def _add_profile_node(
         self,
+        graph: "ProfileGraph",
         profile: str | Path,
         relative_to: Path,
-        seen: set[Path] | None = None,
-    ) -> dict:
+    ) -> Path:
+        """Add a profile and its nested profiles to the graph.
+
+        Returns the profile root.
+        """
+        from plonex.services.profile import ProfileNode
         from plonex.services.profile import ProfileService
 
         resolved_profile = self._resolve_profile_source(profile, relative_to)
         profile_service = ProfileService(source=resolved_profile, target=self.target)
-        profile_root = profile_service.source_path
-
-        if seen is None:
-            seen = set()
-        if profile_root in seen:
-            return {}
-        seen.add(profile_root)
-
-        profile_options: dict = {}
+        if profile_service.is_remote_source:
+            # The options cache cannot tell when the profile cache expires
+            self._options_cacheable = False
+        profile_root = profile_service.source_path.resolve()
+        if profile_root in graph.nodes:
+            return profile_root
+
+        node = ProfileNode(
+            source=resolved_profile,
+            root=profile_root,
+            remote=profile_service.is_remote_source,
+        )
+        graph.nodes[profile_root] = node
         profile_plonex_yml = profile_root / "etc" / "plonex.yml"
+        self._options_inputs.append(profile_plonex_yml)
         if not profile_plonex_yml.exists():
             self.logger.warning("No plonex.yml file found in profile %r", profile_root)
-            return profile_options
+            return profile_root
 
-        raw_profile_options = self._load_yaml_mapping(profile_plonex_yml)
+        node.options = self._load_yaml_mapping(profile_plonex_yml)
         nested_profiles = self._normalize_profiles(
-            raw_profile_options.get("profiles"),
+            node.options.get("profiles"),
             profile_plonex_yml,
         )
-        for nested_profile in nested_profiles:
-            profile_options = self._merge_options_with_prefixes(
-                profile_options,
-                self._load_profile_options(nested_profile, profile_root, seen),
-            )
+        node.profiles = [
+            self._add_profile_node(graph, nested_profile, profile_root)
+            for nested_profile in nested_profiles
+        ]
+        return profile_root
 
-        profile_options = self._merge_options_with_prefixes(
-            profile_options,
-            raw_profile_options,
-        )
-        return profile_options
+    def _load_profile_graph(self) -> "ProfileGraph":
+        from plonex.services.profile import ProfileGraph
+
+        with timings.span("profiles"):
+            return self._build_profile_graph(ProfileGraph())
+
+    def _build_profile_graph(self, graph: "ProfileGraph") -> "ProfileGraph":
+        plonex_yml = self.target / "etc" / "plonex.yml"
+        self._options_inputs.append(plonex_yml)
+        if not plonex_yml.exists():
+            return graph
+
+        local_options = self._load_yaml_mapping(plonex_yml)
+        profiles = self._normalize_profiles(local_options.get("profiles"), plonex_yml)
+        graph.profiles = [
+            self._add_profile_node(graph, profile, self.target) for profile in profiles
+        ]
+        return graph
+
+    @property
+    def profile_graph(self) -> "ProfileGraph":
+        """The profiles of the target, shared by all the services of a command"""
+        store_key = ("profile_graph", self.target.absolute().as_posix())
+        return self._memoized(store_key, self._load_profile_graph)
+
+    @property
+    def profile_roots(self) -> list[Path]:
+        """The profile roots from the lowest to the highest precedence"""
+        return self.profile_graph.roots
 
     def _merge_options_with_prefixes(
         self,
@@ -202,30 +322,59 @@ class BaseService:
 
     @cached_property
     def plonex_options(self) -> dict:
-        """Return the options from the plonex.yml file"""
+        """Return the options from the plonex.yml file
+
+        They only depend on the target, so they are shared by all the services
+        working on the same target.
+        """
+        store_key = ("plonex_options", self.target.absolute().as_posix())
+        return self._memoized(store_key, self._load_plonex_options)
+
+    def _memoized(self, store_key: Hashable, load: Callable[[], Any]) -> Any:
+        """Return the value stored under store_key, calling load on a miss.
+
+        The files read by load and whether the result can be cached on disk
+        are stored with the value and replayed on a hit.
+        """
+        entry = options_store.get(store_key)
+        if entry is not None:
+            self._options_inputs.extend(map(Path, entry.inputs))
+            self._options_cacheable = self._options_cacheable and entry.cacheable
+            return entry.value
+
+        cacheable = self._options_cacheable
+        first_input = len(self._options_inputs)
+        self._options_cacheable = True
+        value = load()
+        options_store.set(
+            store_key,
+            value,
+            inputs=self._options_inputs[first_input:],
+            cacheable=self._options_cacheable,
+        )
+        self._options_cacheable = cacheable and self._options_cacheable
+        return value
+
+    def _load_plonex_options(self) -> dict:
         plonex_yml = self.target / "etc" / "plonex.yml"
-        local_options = {}
+        self._options_inputs.append(plonex_yml)
         if not plonex_yml.exists():
             self.logger.warning("No plonex.yml file found in %r", self.target)
         merged_profile_options: dict = {}
         if plonex_yml.exists():
             local_options = self._load_yaml_mapping(plonex_yml)
-            profiles = self._normalize_profiles(
-                local_options.get("profiles"), plonex_yml
+            merged_profile_options = self.profile_graph.merged_options(
+                self._merge_options_with_prefixes
             )
-
-            for profile in profiles:
-                merged_profile_options = self._merge_options_with_prefixes(
-                    merged_profile_options,
-                    self._load_profile_options(profile, self.target),
-                )
-
             merged_profile_options = self._merge_options_with_prefixes(
                 merged_profile_options,
                 local_options,
             )
 
+        self._options_inputs.append(self.legacy_constraints_file)
         if self.legacy_constraints_file.exists():
+            # Keep warning about the legacy file on every run
+            self._options_cacheable = False
             warning_key = f"legacy-constraints:{self.legacy_constraints_file}"
             legacy_plone_version = self._legacy_plone_version()
             if (
@@ -273,15 +422,17 @@ class BaseService:
         Precedence is given in alphabetical order.
         """
         mapping = {}
-        paths = list(self.target.glob("etc/plonex.*.yml"))
-        paths += list(self.target.glob(f"etc/plonex-{self.name}.yml"))
-        paths += list(self.target.glob(f"etc/plonex-{self.name}.*.yml"))
-
-        for path in paths:
+        for path in self._additional_config_paths():
             file_options = self._load_yaml_mapping(path)
             mapping[path] = file_options
         return mapping
 
+    def _additional_config_paths(self) -> list[Path]:
+        paths = list(self.target.glob("etc/plonex.*.yml"))
+        paths += list(self.target.glob(f"etc/plonex-{self.name}.yml"))
+        paths += list(self.target.glob(f"etc/plonex-{self.name}.*.yml"))
+        return paths
+
     @cached_property
     def config_files_options_mapping(self) -> dict:
         """Return the options from the config files"""
@@ -300,6 +451,38 @@ class BaseService:
             options.update(file_options)
         return options
 
+    @cached_property
+    def _options_key(self) -> str:
+        """Identify the resolved options of this service.
+
+        They depend on the service class, the name, the defaults
+        and the options passed explicitly to the service.
+        """
+        return cache_key(
+            {
+                "class": f"{type(self).__module__}.{type(self).__qualname__}",
+                "name": self.name,
+                "options_defaults": self.options_defaults,
+                "cli_options": self.cli_options,
+                "config_files": [
+                    Path(path).absolute().as_posix() for path in self.config_files
+                ],
+            }
+        )
+
+    @property
+    def options_cache(self) -> OptionsCache | None:
+        """The on disk cache for the resolved options (if enabled)"""
+        if not self.options_cache_enabled:
+            return None
+        return OptionsCache(
+            path=self.target.absolute()
+            / "var"
+            / "cache"
+            / "options"
+            / f"{self._options_key}.json"
+        )
+
     @cached_property
     def options(self) -> dict:
         """Return the options for this service.
@@ -311,7 +494,52 @@ class BaseService:
         3. In the plonex.*.yml files (if any)
         4. In the plonex.yml file
         5. In the class definition options_default (lowest priority)
+
+        The resolved options are shared in memory with the other services
+        of the same command and, when the options cache is enabled, reused
+        across commands until one of the contributing files changes.
         """
+        with timings.span(f"options {self.name}"):
+            return self._load_options()
+
+    def _load_options(self) -> dict:
+        config_paths = self._additional_config_paths()
+        store_key = ("options", self._options_key)
+        entry = options_store.get(store_key, config_paths=config_paths)
+        if entry is not None:
+            self._options_cacheable = entry.cacheable
+            return entry.value
+
+        cache = self.options_cache
+        if cache is not None:
+            cached_options = cache.load(config_paths)
+            if cached_options is not None:
+                self.logger.debug("Using cached options from %s", cache.path)
+                return cached_options
+
+        with timings.span("resolve options"):
+            options = self._resolve_options()
+        options_store.set(
+            store_key,
+            options,
+            inputs=self._options_inputs,
+            config_paths=list(self.additional_plonex_options),
+            cacheable=self._options_cacheable,
+        )
+        if cache is not None and self._options_cacheable:
+            cache.store(
+                options,
+                inputs=self._options_inputs,
+                config_paths=list(self.additional_plonex_options),
+            )
+        return options
+
+    def _resolve_options(self) -> dict:
+        """Merge all the options layers and resolve the variables"""
+        # Jinja is only needed when the options are not cached
+        from plonex.resolver import OptionsResolutionError
+        from plonex.resolver import resolve_options
+
         options = self.options_defaults.copy()
         options.update(self.plonex_options)
         for path, file_options in self.additional_plonex_options.items():
@@ -322,28 +550,12 @@ class BaseService:
         options.update(self.config_files_options)
         options.update(self.cli_options)
 
-        # FIXME: This should probably done in a more sane way
-        # The goal is to resolve the variables inside the options
-        # Maybe the ansible code has something that can be reused
-        options_as_yaml_text = yaml.dump(options)
-        env = Environment(loader=BaseLoader())
-        counter = 0
-        resolved_options = options_as_yaml_text
-        while counter < 10:
-            resolved_options = env.from_string(options_as_yaml_text).render(
-                keep_training_newline=True, **options
-            )
-            if resolved_options == options_as_yaml_text:
-                break
-            options_as_yaml_text = resolved_options
-            counter += 1
-        else:
-            self.logger.error("Too many iterations while resolving options")
-
-        resolved = yaml.safe_load(resolved_options) or {}
-        if not isinstance(resolved, dict):
-            self.logger.error("Resolved options should contain a dict")
-            return {}
+        try:
+            resolved = resolve_options(options)
+        except OptionsResolutionError as exc:
+            self.logger.error(str(exc))
+            self._options_cacheable = False
+            resolved = exc.options
         return normalize_options(resolved, self.logger)
 
     @cached_property
@@ -403,7 +615,12 @@ class BaseService:
 
     @property
     def virtualenv_dir(self) -> Path:
-        """The path to the virtualenv"""
+        """The path to the virtualenv
+
+        When .venv is a symlink to one of the virtualenvs in .venvs,
+        the symlink is not resolved, so that the commands keep using
+        the current virtualenv after a switch.
+        """
         dir = self.target / ".venv"
         if not (dir / "bin" / "activate").exists():
             raise FileNotFoundError(
@@ -431,6 +648,7 @@ class BaseService:
 
         return wrapper
 
+    @_traced("enter")
     def __enter__(self):
         """Load the environment variables before entering the context manager."""
         if self.options.get("environment_vars"):
@@ -462,6 +680,7 @@ class BaseService:
     def command(self) -> list[str]:
         return ["true"]  # pragma: no cover
 
+    @_traced("run_command")
     @entered_only
     def run_command(
         self,
@@ -498,6 +717,38 @@ class BaseService:
         if stream_output is None:
             stream_output = cls.stream_output
         command_list = list(map(str, command))
+        if not timings.active:
+            return cls._execute_command(command_list, cwd, stream_output)
+        with timings.span(
+            f"command {Path(command_list[0]).name}",
+            **{"process.command_line": " ".join(command_list)},
+        ) as span:
+            # The resource usage and the output size are only for the trace
+            if span is None or not timings.tracing:
+                return cls._execute_command(command_list, cwd, stream_output)
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            captured: str | bytes = ""
+            exit_code = 0
+            try:
+                output = cls._execute_command(command_list, cwd, stream_output)
+                captured = output
+            except sh.ErrorReturnCode as exc:
+                exit_code = exc.exit_code
+                captured = exc.stdout + exc.stderr
+                raise
+            finally:
+                span.attributes.update(
+                    _command_attributes(usage, exit_code, captured, stream_output)
+                )
+            return output
+
+    @classmethod
+    def _execute_command(
+        cls,
+        command_list: list[str],
+        cwd: Path | None,
+        stream_output: bool,
+    ) -> str:
         executable, *args = command_list
         kwargs: dict[str, Any] = {"_cwd": str(cwd)} if cwd else {}
         if stream_output:
@@ -532,6 +783,7 @@ class BaseService:
         sh.Command(executable)(*args, **kwargs)
         return "".join(stdout_chunks)
 
+    @_traced("run")
     @entered_only
     def run(self):
         """Run the command"""
@@ -540,6 +792,7 @@ class BaseService:
             return
         self.run_command(command)
 
+    @_traced("exit")
     def __exit__(self, exc_type, exc_value, traceback):
         for post_service in self.post_services or []:
             with post_service:
@@ -7,29 +7,52 @@ from importlib.metadata import version
 from itertools import chain
 from pathlib import Path
 from plonex import logger
+from plonex._lazy import lazy_getattr
 from plonex.base import BaseService
 from plonex.config import normalize_default_actions
-from plonex.services.adduser import AddUser
-from plonex.services.compile import CompileService
-from plonex.services.describe import DescribeService
-from plonex.services.init import InitService
-from plonex.services.install import InstallService
-from plonex.services.robotserver import RobotServer
-from plonex.services.robottest import RobotTest
-from plonex.services.runwsgi import RunWSGI
-from plonex.services.sources import SourcesService
-from plonex.services.supervisor import Supervisor
-from plonex.services.upgrade import UpgradeService
-from plonex.services.zconsole import ZConsole
-from plonex.services.zeoserver import ZeoServer
-from plonex.services.zopetest import ZopeTest
+from plonex.timings import Span
+from plonex.timings import timings
 from rich.console import Console
+from typing import Any
 from typing import Callable
 
 import logging
+import os
 import sys
 
 
+# Importing every service would load requests, jinja2, pip_requirements_parser
+# and friends even for `plonex --version`: services are imported on first use
+_LAZY_IMPORTS: dict[str, str] = {
+    "AddUser": "plonex.services.adduser",
+    "CompileService": "plonex.services.compile",
+    "DescribeService": "plonex.services.describe",
+    "InitService": "plonex.services.init",
+    "InstallService": "plonex.services.install",
+    "ProfileService": "plonex.services.profile",
+    "RobotServer": "plonex.services.robotserver",
+    "RobotTest": "plonex.services.robottest",
+    "RunWSGI": "plonex.services.runwsgi",
+    "SourcesService": "plonex.services.sources",
+    "Supervisor": "plonex.services.supervisor",
+    "UpgradeService": "plonex.services.upgrade",
+    "ZConsole": "plonex.services.zconsole",
+    "ZeoServer": "plonex.services.zeoserver",
+    "ZopeTest": "plonex.services.zopetest",
+}
+
+__getattr__ = lazy_getattr(globals(), _LAZY_IMPORTS)
+
+
+def _service_class(name: str) -> Any:
+    """Return a service class, importing it on first use.
+
+    The class is looked up as a module attribute,
+    so patching `plonex.cli.<ServiceClass>` is honored.
+    """
+    return getattr(sys.modules[__name__], name)
+
+
 def build_parser():
     # Preserve compatibility with tests and callers that patch
     # plonex.cli.autocomplete before invoking build_parser().
@@ -76,7 +99,7 @@ def _resolve_target(args) -> Path:
     sys.exit(1)
 
 
-def _configure_logging(args, target: Path) -> None:
+def _configure_logging(args, target: Path, options: dict | None = None) -> None:
     """Set the log level based on CLI flags and optional config-file setting."""
     BaseService.command_output_enabled = not args.quiet
     if args.verbose:
@@ -88,8 +111,9 @@ def _configure_logging(args, target: Path) -> None:
         return
 
     logging.getLogger("sh").setLevel(logging.WARNING)
-    with InitService(target=target) as init:
-        log_level = init.options.get("log_level")
+    if options is None:
+        options = _project_options(target)
+    log_level = options.get("log_level")
     if log_level:
         log_level = log_level.upper()
         if log_level not in {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}:
@@ -105,36 +129,42 @@ def _configure_logging(args, target: Path) -> None:
             logger.setLevel(log_level)
 
 
+def _project_options(target: Path) -> dict:
+    with _service_class("InitService")(target=target) as init:
+        return init.options
+
+
 def _load_default_actions(target: Path) -> list[list[str]] | None:
-    with InitService(target=target) as init:
+    with _service_class("InitService")(target=target) as init:
         return normalize_default_actions(init.options)
 
 
 def _handle_compile(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "compile")
-    with CompileService(target=target) as svc:
+    with _service_class("CompileService")(target=target) as svc:
         svc.run()
 
 
 def _handle_describe(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "describe")
-    with DescribeService(
+    with _service_class("DescribeService")(
         target=target,
         generate_html=getattr(args, "describe_html", False),
         browse_html=getattr(args, "describe_browse", False),
+        refresh_sources=getattr(args, "describe_refresh", False),
     ) as svc:
         svc.run()
 
 
 def _handle_robotserver(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "robotserver")
-    with RobotServer(target=target, layer=args.layer) as svc:
+    with _service_class("RobotServer")(target=target, layer=args.layer) as svc:
         svc.run()
 
 
 def _handle_robottest(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "robottest")
-    with RobotTest(
+    with _service_class("RobotTest")(
         target=target,
         paths=args.paths,
         browser=args.browser,
@@ -145,7 +175,7 @@ def _handle_robottest(args: Namespace, parser: ArgumentParser, target: Path) ->
 
 def _handle_zopetest(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "zopetest")
-    with ZopeTest(
+    with _service_class("ZopeTest")(
         target=target,
         package=args.package,
         test=args.test,
@@ -156,7 +186,7 @@ def _handle_zopetest(args: Namespace, parser: ArgumentParser, target: Path) -> N
 def _handle_zeoserver(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "zeoserver")
     logger.debug("Starting ZEO Server")
-    with ZeoServer(target=target) as svc:
+    with _service_class("ZeoServer")(target=target) as svc:
         svc.run()
 
 
@@ -173,7 +203,7 @@ def _handle_runwsgi(args: Namespace, parser: ArgumentParser, target: Path) -> No
     _run_service_dependencies(target, "runwsgi")
     logger.debug("Starting runwsgi")
     config_files = getattr(args, "runtime_config", []) or []
-    with RunWSGI(
+    with _service_class("RunWSGI")(
         name=args.name,
         target=target,
         config_files=config_files,
@@ -195,7 +225,7 @@ def _handle_fg(args: Namespace, parser: ArgumentParser, target: Path) -> None:
             "security_policy_implementation": "python",
         }
     )
-    with RunWSGI(
+    with _service_class("RunWSGI")(
         name=args.name,
         target=target,
         config_files=config_files,
@@ -209,7 +239,7 @@ def _handle_zconsole(args: Namespace, parser: ArgumentParser, target: Path) -> N
     _run_service_dependencies(target, "zconsole")
     zconsole_action = getattr(args, "zconsole_action", "debug") or "debug"
     config_files = getattr(args, "runtime_config", []) or []
-    with ZConsole(
+    with _service_class("ZConsole")(
         name=args.name,
         target=target,
         config_files=config_files,
@@ -222,14 +252,16 @@ def _handle_zconsole(args: Namespace, parser: ArgumentParser, target: Path) -> N
 
 def _handle_run(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "run")
-    with ZConsole(target=target, action="run", args=args.args or []) as svc:
+    with _service_class("ZConsole")(
+        target=target, action="run", args=args.args or []
+    ) as svc:
         svc.run()
 
 
 def _handle_adduser(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "adduser")
     config_files = getattr(args, "runtime_config", []) or []
-    with AddUser(
+    with _service_class("AddUser")(
         target=target,
         config_files=config_files,
         username=args.username,
@@ -241,7 +273,7 @@ def _handle_adduser(args: Namespace, parser: ArgumentParser, target: Path) -> No
 def _handle_supervisor(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "supervisor")
     supervisor_action = getattr(args, "supervisor_action", None) or "status"
-    with Supervisor(target=target) as svc:
+    with _service_class("Supervisor")(target=target) as svc:
         if supervisor_action == "start":
             svc.run()
         elif supervisor_action == "stop":
@@ -261,22 +293,39 @@ def _handle_db(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "db")
     db_action = getattr(args, "db_action", None)
     if db_action == "backup":
-        with ZeoServer(target=target) as svc:
+        with _service_class("ZeoServer")(target=target) as svc:
             svc.run_backup()
     elif db_action == "restore":
-        with ZeoServer(target=target) as svc:
+        with _service_class("ZeoServer")(target=target) as svc:
             svc.run_restore()
     elif db_action == "pack":
-        with ZeoServer(target=target) as svc:
+        with _service_class("ZeoServer")(target=target) as svc:
             svc.run_pack(days=args.days)
     else:
         parser.print_help()
 
 
 def _handle_dependencies(args: Namespace, parser: ArgumentParser, target: Path) -> None:
+    if getattr(args, "check", False):
+        svc = _service_class("InstallService")(target=target)
+        if not svc.check(sync=getattr(args, "sync", False)):
+            sys.exit(1)
+        return
+    if getattr(args, "rollback", False):
+        if not _service_class("InstallService")(target=target).rollback():
+            sys.exit(1)
+        return
     _run_service_dependencies(target, "dependencies")
+    if getattr(args, "prefetch", False):
+        with _service_class("InstallService")(target=target) as svc:
+            svc.prefetch()
+        return
+    if getattr(args, "build_new", False):
+        with _service_class("InstallService")(target=target) as svc:
+            svc.build_new()
+        return
     persist_mode = getattr(args, "persist_mode", None)
-    with InstallService(target=target) as svc:
+    with _service_class("InstallService")(target=target) as svc:
         svc.run(
             persist=persist_mode == "project",
             persist_local=persist_mode == "local",
@@ -290,11 +339,15 @@ def _handle_sources(args: Namespace, parser: ArgumentParser, target: Path) -> No
     _run_service_dependencies(target, "sources")
     sources_action = getattr(args, "sources_action", None) or "update"
     glob_pattern = getattr(args, "glob", None)
-    with SourcesService(target=target) as svc:
+    with _service_class("SourcesService")(target=target) as svc:
         if sources_action == "update":
-            svc.run_update(glob=glob_pattern)
+            svc.run_update(
+                glob=glob_pattern, jobs=getattr(args, "sources_jobs", None)
+            )
         elif sources_action == "list":
-            svc.run_list(glob=glob_pattern)
+            svc.run_list(
+                glob=glob_pattern, refresh=getattr(args, "sources_refresh", False)
+            )
         elif sources_action == "missing":
             svc.run_show_missing(glob=glob_pattern)
         elif sources_action == "clone-missing":
@@ -306,6 +359,7 @@ def _handle_sources(args: Namespace, parser: ArgumentParser, target: Path) -> No
                 force=True,
                 assume_yes=getattr(args, "sources_yes", False),
                 glob=glob_pattern,
+                jobs=getattr(args, "sources_jobs", None),
             )
         elif sources_action == "tainted":
             svc.run_show_tainted(glob=glob_pattern)
@@ -321,15 +375,15 @@ def _handle_sources(args: Namespace, parser: ArgumentParser, target: Path) -> No
 
 def _handle_install(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "install")
-    with InstallService(target=target) as svc:
+    with _service_class("InstallService")(target=target) as svc:
         svc.add_packages(args.package)
-    with InstallService(target=target) as svc:
+    with _service_class("InstallService")(target=target) as svc:
         svc.run()
 
 
 def _handle_upgrade(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     _run_service_dependencies(target, "upgrade")
-    with UpgradeService(target=target) as svc:
+    with _service_class("UpgradeService")(target=target) as svc:
         svc.run()
 
 
@@ -357,27 +411,68 @@ _ACTION_HANDLERS: dict[str, Callable[[Namespace, ArgumentParser, Path], None]] =
 def _dispatch(args: Namespace, parser: ArgumentParser, target: Path) -> None:
     handler = _ACTION_HANDLERS.get(args.action)
     if handler is not None:
-        handler(args, parser, target)
+        with timings.span(f"action {args.action}"):
+            handler(args, parser, target)
     else:
         parser.print_help()
 
 
-def main() -> None:
-    parser = build_parser()
-    args = parser.parse_args()
+def _timings_requested(args: Namespace) -> bool:
+    return bool(args.timings or args.timings_json or args.trace)
+
+
+def _start_timings() -> Span:
+    return timings.start(" ".join(["plonex", *sys.argv[1:]]))
+
+
+def _set_tracing(args: Namespace) -> None:
+    timings.tracing = bool(args.trace) and timings.active
+
+
+def _apply_timings_options(args: Namespace, options: dict) -> None:
+    """Turn on the timings flags enabled in the options of the project"""
+    args.timings = args.timings or bool(options.get("timings"))
+    args.timings_json = args.timings_json or bool(options.get("timings_json"))
+    args.trace = args.trace or bool(options.get("trace"))
+
+
+def _report_timings(args: Namespace, root: Span) -> None:
+    """Print or save the timings as requested by the flags or etc/plonex.yml"""
+    target = root.attributes.get("target")
+    if args.timings:
+        Console(stderr=True).print(timings.render(root))
+    if args.timings_json and target is not None:
+        path = timings.write_json(root, Path(target) / "var" / "log" / "timings")
+        logger.info("Timings written in %s", path)
+    if args.trace and target is not None:
+        timings.write_trace(
+            root,
+            Path(target) / "var" / "log" / "plonex-trace.jsonl",
+            resource={"process.pid": os.getpid()},
+        )
 
-    if args.version:
-        print(version("plonex"))
-        return
 
+def _run(args: Namespace, parser: ArgumentParser) -> None:
     if args.action == "init":
         init_target = Path(args.target) if args.target else _prompt_init_target()
-        with InitService(target=init_target) as svc:
+        with _service_class("InitService")(target=init_target) as svc:
             svc.run()
         return
 
-    target = _resolve_target(args)
-    _configure_logging(args, target)
+    with timings.span("resolve target"):
+        target = _resolve_target(args)
+    BaseService.options_cache_enabled = True
+    # Read once for the log level and the timings options
+    with timings.span("project options"):
+        options = _project_options(target)
+    _apply_timings_options(args, options)
+    if _timings_requested(args) and not timings.active:
+        _start_timings()
+    _set_tracing(args)
+    if timings.root is not None and timings.active:
+        timings.root.attributes["target"] = str(target)
+    with timings.span("configure logging"):
+        _configure_logging(args, target, options)
     if args.action:
         try:
             _dispatch(args, parser, target)
@@ -408,5 +503,29 @@ def main() -> None:
             sys.exit(1)
 
 
+def main() -> None:
+    parser = build_parser()
+    args = parser.parse_args()
+    BaseService.offline = args.offline
+    _service_class("ProfileService").refresh = args.refresh_profiles
+
+    if args.version:
+        print(version("plonex"))
+        return
+
+    BaseService.http_cache_enabled = True
+    # Nothing is recorded unless the timings are requested,
+    # the options of the project might request them later
+    if _timings_requested(args):
+        _start_timings()
+        _set_tracing(args)
+    try:
+        _run(args, parser)
+    finally:
+        root = timings.stop()
+        if root is not None:
+            _report_timings(args, root)
+
+
 if __name__ == "__main__":
     main()
@@ -1,60 +1,52 @@
-from dataclasses import fields
+from collections.abc import Iterator
+from collections.abc import Mapping
+from importlib import import_module
 from pathlib import Path
 from plonex.base import BaseService
-from plonex.services.adduser import AddUser
-from plonex.services.compile import CompileService
-from plonex.services.describe import DescribeService
-from plonex.services.directory import DirectoryService
-from plonex.services.init import InitService
-from plonex.services.install import InstallService
-from plonex.services.robotserver import RobotServer
-from plonex.services.robottest import RobotTest
-from plonex.services.runwsgi import RunWSGI
-from plonex.services.sources import SourcesService
-from plonex.services.supervisor import Supervisor
-from plonex.services.template import TemplateService
-from plonex.services.upgrade import UpgradeService
-from plonex.services.zconsole import ZConsole
-from plonex.services.zeoserver import ZeoServer
-from plonex.services.zopetest import ZopeTest
+from plonex.timings import timings
 from typing import Any
 
 
-def _service_name(service_class) -> str | None:
-    for cls_field in fields(service_class):
-        if cls_field.name == "name" and isinstance(cls_field.default, str):
-            return cls_field.default or None
-    return None
-
-
-def _build_service_registry() -> dict[str, type[BaseService]]:
-    service_classes = [
-        AddUser,
-        CompileService,
-        DescribeService,
-        DirectoryService,
-        SourcesService,
-        InitService,
-        InstallService,
-        RobotServer,
-        RobotTest,
-        RunWSGI,
-        Supervisor,
-        UpgradeService,
-        ZConsole,
-        ZeoServer,
-        ZopeTest,
-    ]
-    registry: dict[str, type[BaseService]] = {}
-    for service_class in service_classes:
-        service_name = _service_name(service_class)
-        if service_name:
-            registry[service_name] = service_class
-    registry["template"] = TemplateService
-    return registry
-
-
-_SERVICE_REGISTRY: dict[str, type[BaseService]] = _build_service_registry()
+class _ServiceRegistry(Mapping[str, type[BaseService]]):
+    """Map the service names usable in the `services` option to their classes.
+
+    The service modules are imported only when a service is looked up.
+    """
+
+    def __init__(self, classes: dict[str, str]):
+        self._classes = classes
+
+    def __getitem__(self, service_name: str) -> type[BaseService]:
+        module_name, _, class_name = self._classes[service_name].partition(":")
+        return getattr(import_module(module_name), class_name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._classes)
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+
+_SERVICE_REGISTRY: Mapping[str, type[BaseService]] = _ServiceRegistry(
+    {
+        "adduser": "plonex.services.adduser:AddUser",
+        "compile": "plonex.services.compile:CompileService",
+        "describe": "plonex.services.describe:DescribeService",
+        "directory": "plonex.services.directory:DirectoryService",
+        "sources": "plonex.services.sources:SourcesService",
+        "init": "plonex.services.init:InitService",
+        "install": "plonex.services.install:InstallService",
+        "robotserver": "plonex.services.robotserver:RobotServer",
+        "robottest": "plonex.services.robottest:RobotTest",
+        "runwsgi": "plonex.services.runwsgi:RunWSGI",
+        "supervisor": "plonex.services.supervisor:Supervisor",
+        "upgrade": "plonex.services.upgrade:UpgradeService",
+        "zconsole": "plonex.services.zconsole:ZConsole",
+        "zeoserver": "plonex.services.zeoserver:ZeoServer",
+        "zopetest": "plonex.services.zopetest:ZopeTest",
+        "template": "plonex.services.template:TemplateService",
+    }
+)
 
 
 def _normalize_template_kwargs(kwargs: dict[str, Any], target: Path) -> dict[str, Any]:
@@ -143,6 +135,11 @@ def _service_from_config(
 
 
 def _run_service_dependencies(target: Path, service_name: str) -> None:
+    with timings.span("services dependencies"):
+        _run_services(target, service_name)
+
+
+def _run_services(target: Path, service_name: str) -> None:
     with BaseService(target=target) as svc:
         services = svc.options.get("services") or []
 
@@ -153,5 +150,6 @@ def _run_service_dependencies(target: Path, service_name: str) -> None:
         service = _service_from_config(spec, target, dependency_for=service_name)
         if service is None:
             continue
-        with service:
-            service.run()
+        with timings.span(f"service {service.name}"):
+            with service:
+                service.run()
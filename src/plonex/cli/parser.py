@@ -44,6 +44,46 @@ def _add_common_flags(subparser) -> None:
         default=SUPPRESS,
         dest="quiet",
     )
+    subparser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Do not access the network, use the cached remote resources",
+        required=False,
+        default=SUPPRESS,
+        dest="offline",
+    )
+    subparser.add_argument(
+        "--refresh-profiles",
+        action="store_true",
+        help="Fetch the remote profiles even if the cached copy is recent",
+        required=False,
+        default=SUPPRESS,
+        dest="refresh_profiles",
+    )
+    subparser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print how long each phase of the command took",
+        required=False,
+        default=SUPPRESS,
+        dest="timings",
+    )
+    subparser.add_argument(
+        "--timings-json",
+        action="store_true",
+        help="Write the timings of the command in var/log/timings",
+        required=False,
+        default=SUPPRESS,
+        dest="timings_json",
+    )
+    subparser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Append the trace of the command to var/log/plonex-trace.jsonl",
+        required=False,
+        default=SUPPRESS,
+        dest="trace",
+    )
 
 
 def _add_subparser(subparsers, *args, **kwargs):
@@ -96,6 +136,46 @@ def build_parser() -> ArgumentParser:
         default=False,
         dest="quiet",
     )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Do not access the network, use the cached remote resources",
+        required=False,
+        default=False,
+        dest="offline",
+    )
+    parser.add_argument(
+        "--refresh-profiles",
+        action="store_true",
+        help="Fetch the remote profiles even if the cached copy is recent",
+        required=False,
+        default=False,
+        dest="refresh_profiles",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print how long each phase of the command took",
+        required=False,
+        default=False,
+        dest="timings",
+    )
+    parser.add_argument(
+        "--timings-json",
+        action="store_true",
+        help="Write the timings of the command in var/log/timings",
+        required=False,
+        default=False,
+        dest="timings_json",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Append the trace of the command to var/log/plonex-trace.jsonl",
+        required=False,
+        default=False,
+        dest="trace",
+    )
     parser.add_argument(
         "-V",
         "--version",
@@ -7,6 +7,14 @@ def _register_sources_subcommands(parser) -> None:
         default=None,
         nargs="?",
     )
+    update_parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of sources updated at the same time (default: 1)",
+        type=int,
+        default=None,
+        dest="sources_jobs",
+    )
     list_parser = sources_subs.add_parser(
         "list", help="List configured sources and status"
     )
@@ -16,6 +24,14 @@ def _register_sources_subcommands(parser) -> None:
         default=None,
         nargs="?",
     )
+    list_parser.add_argument(
+        "--refresh",
+        help="Inspect all the checkouts instead of using the cached status",
+        required=False,
+        default=False,
+        action="store_true",
+        dest="sources_refresh",
+    )
     missing_parser = sources_subs.add_parser(
         "missing", help="Show configured sources that are missing"
     )
@@ -62,6 +78,14 @@ def _register_sources_subcommands(parser) -> None:
         action="store_true",
         dest="sources_yes",
     )
+    force_update_parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of sources updated at the same time (default: 1)",
+        type=int,
+        default=None,
+        dest="sources_jobs",
+    )
     tainted_parser = sources_subs.add_parser(
         "tainted", help="Show sources with local changes"
     )
@@ -156,6 +180,14 @@ def register_setup_parsers(subs, add_subparser) -> None:
         action="store_true",
         dest="describe_browse",
     )
+    describe_parser.add_argument(
+        "--refresh",
+        help="Inspect all the source checkouts instead of using the cached status",
+        required=False,
+        default=False,
+        action="store_true",
+        dest="describe_refresh",
+    )
 
     install_parser = add_subparser(
         subs,
@@ -223,6 +255,41 @@ def register_setup_parsers(subs, add_subparser) -> None:
         action="store_true",
         dest="sync",
     )
+    dependencies_parser.add_argument(
+        "--prefetch",
+        help="Download the wheels of the compiled requirements in the wheelhouse",
+        required=False,
+        default=False,
+        action="store_true",
+        dest="prefetch",
+    )
+    dependencies_parser.add_argument(
+        "--check",
+        help=(
+            "Report if the virtualenv is out of date "
+            "without installing or generating anything"
+        ),
+        required=False,
+        default=False,
+        action="store_true",
+        dest="check",
+    )
+    dependencies_parser.add_argument(
+        "--build-new",
+        help="Build a new virtualenv in .venvs/ and switch .venv to it",
+        required=False,
+        default=False,
+        action="store_true",
+        dest="build_new",
+    )
+    dependencies_parser.add_argument(
+        "--rollback",
+        help="Switch .venv back to the previous virtualenv",
+        required=False,
+        default=False,
+        action="store_true",
+        dest="rollback",
+    )
 
     sources_parser = add_subparser(
         subs,
@@ -0,0 +1,154 @@
+from hashlib import sha256
+from pathlib import Path
+from plonex import logger
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from urllib.parse import urlparse
+
+import json
+import os
+import re
+import requests
+import time
+
+
+# A path segment with a full release version (e.g. /release/6.0.11/)
+# identifies a file that never changes, unlike 6.1-latest or 6.2
+IMMUTABLE_SEGMENT = re.compile(r"^\d+\.\d+\.\d+((a|b|rc)\d+)?$")
+
+# Connections kept open for each host by the shared session
+POOL_SIZE = 16
+
+_session: requests.Session | None = None
+_session_lock = Lock()
+
+
+def session() -> requests.Session:
+    """Return the session shared by the threads of this process.
+
+    Reusing the session keeps the connections alive between requests,
+    which matters when several files are downloaded from the same host.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def default_cache_folder() -> Path:
+    """Return the folder where the downloaded files are cached"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "plonex" / "http"
+
+
+def is_immutable(url: str) -> bool:
+    """Tell if the URL points to a versioned file that never changes"""
+    return any(
+        IMMUTABLE_SEGMENT.match(segment)
+        for segment in urlparse(url).path.split("/")[:-1]
+    )
+
+
+class HttpCache:
+    """Cache downloaded files on disk and revalidate them with the server.
+
+    Each URL is stored as a body file and a JSON metadata file holding
+    its ETag and Last-Modified headers. A cached URL is revalidated
+    at most once per process with a conditional request, so an unchanged
+    file is not downloaded again. Versioned URLs are never revalidated.
+    The cache can be used by several threads at once.
+    """
+
+    timeout = 30
+
+    def __init__(self, folder: Path | None = None) -> None:
+        self.folder = folder
+        self.downloads = 0
+        # URLs already validated by this process
+        self._validated: set[str] = set()
+        self._lock = Lock()
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        folder = self.folder or default_cache_folder()
+        key = sha256(url.encode()).hexdigest()[:16]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        """Write the file so that concurrent readers never see it half written"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=path.parent, delete=False) as handle:
+            handle.write(data)
+        os.replace(handle.name, path)
+
+    def _conditional_headers(self, meta_path: Path) -> dict[str, str]:
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def fetch(self, url: str, offline: bool = False) -> Path:
+        """Return the path of a file holding the body of the URL.
+
+        In offline mode the cached copy is used as is
+        and a FileNotFoundError is raised if there is none.
+        The cached copy is also used when the server cannot be reached,
+        does not answer in time or fails with a server error.
+        """
+        body_path, meta_path = self._paths(url)
+        cached = body_path.exists() and meta_path.exists()
+        if cached and (offline or url in self._validated or is_immutable(url)):
+            return body_path
+        if offline:
+            raise FileNotFoundError(f"{url} is not cached and plonex is offline")
+
+        headers = self._conditional_headers(meta_path) if cached else {}
+        try:
+            response = session().get(url, timeout=self.timeout, headers=headers)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            if not cached:
+                raise
+            logger.warning("Could not revalidate %s, using the cached copy", url)
+            logger.debug(exc)
+            return body_path
+
+        if cached and response.status_code >= 500:
+            logger.warning(
+                "Could not revalidate %s (HTTP %s), using the cached copy",
+                url,
+                response.status_code,
+            )
+            return body_path
+        if cached and response.status_code == 304:
+            os.utime(meta_path)
+        else:
+            response.raise_for_status()
+            with self._lock:
+                self.downloads += 1
+            self._write_atomic(body_path, response.content)
+            meta = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched": time.time(),
+            }
+            self._write_atomic(meta_path, json.dumps(meta).encode())
+        self._validated.add(url)
+        return body_path
+
+    def clear(self) -> None:
+        """Forget which URLs were validated by this process"""
+        self._validated.clear()
+
+
+http_cache = HttpCache()
@@ -0,0 +1,210 @@
+from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+from typing import Hashable
+
+import copy
+import hashlib
+import json
+import os
+import time
+
+
+CACHE_FORMAT_VERSION = 1
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def file_fingerprint(path: Path, content_hash: bool = True) -> dict[str, Any] | None:
+    """Return the size, mtime and (optionally) the content hash of a file.
+
+    Returns None if the file does not exist.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    fingerprint: dict[str, Any] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    # File timestamps are not precise enough to notice a change made right
+    # after we looked at the file, so recently modified files are always hashed
+    if time.time_ns() - stat.st_mtime_ns < RACY_WINDOW_NS:
+        fingerprint["racy"] = True
+        content_hash = True
+    if content_hash:
+        try:
+            fingerprint["sha256"] = hashlib.sha256(path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
+    return fingerprint
+
+
+def fingerprint_matches(path: Path, fingerprint: dict[str, Any] | None) -> bool:
+    """Check if the file on disk still matches the recorded fingerprint.
+
+    A matching size and mtime are trusted without reading the file,
+    otherwise the content hash decides.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return fingerprint is None
+    if fingerprint is None:
+        return False
+    if stat.st_size != fingerprint.get("size"):
+        return False
+    if stat.st_mtime_ns == fingerprint.get("mtime_ns") and not fingerprint.get(
+        "racy"
+    ):
+        return True
+    if "sha256" not in fingerprint:
+        return False
+    try:
+        content = path.read_bytes()
+    except FileNotFoundError:
+        return False
+    return hashlib.sha256(content).hexdigest() == fingerprint["sha256"]
+
+
+def cache_key(payload: Any) -> str:
+    """Return a stable hash for a JSON serializable payload"""
+    text = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@dataclass(kw_only=True)
+class OptionsCache:
+    """Store the fully resolved options of a service on disk.
+
+    The cache entry records a fingerprint for every file that contributed
+    to the options and the list of additional config files that were found,
+    so that it can be validated with a few stat calls.
+    """
+
+    path: Path
+
+    def load(self, config_paths: list[Path]) -> dict | None:
+        """Return the cached options if they are still valid.
+
+        The config_paths argument is the list of additional config files
+        currently found on disk: if it differs from the recorded one,
+        the entry is stale.
+        """
+        try:
+            entry = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if not isinstance(entry, dict):
+            return None
+        if entry.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        if entry.get("config_paths") != [str(path) for path in config_paths]:
+            return None
+        inputs = entry.get("inputs")
+        if not isinstance(inputs, dict):
+            return None
+        for path, fingerprint in inputs.items():
+            if not fingerprint_matches(Path(path), fingerprint):
+                return None
+        options = entry.get("options")
+        return options if isinstance(options, dict) else None
+
+    def store(
+        self,
+        options: dict,
+        inputs: list[Path],
+        config_paths: list[Path],
+    ) -> bool:
+        """Write the options to the cache.
+
+        Returns False if the options cannot be stored faithfully as JSON
+        (e.g. dates or non string keys), in which case nothing is written.
+        """
+        try:
+            serialized_options = json.dumps(options, sort_keys=True)
+        except (TypeError, ValueError):
+            return False
+        if json.loads(serialized_options) != options:
+            return False
+
+        entry = {
+            "version": CACHE_FORMAT_VERSION,
+            "config_paths": [str(path) for path in config_paths],
+            "inputs": {str(path): file_fingerprint(path) for path in inputs},
+            "options": options,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entry, sort_keys=True))
+        os.replace(tmp_path, self.path)
+        return True
+
+
+@dataclass(kw_only=True)
+class StoreEntry:
+
+    value: Any
+    inputs: dict[str, dict[str, Any] | None] = field(default_factory=dict)
+    config_paths: list[str] | None = None
+    cacheable: bool = True
+
+
+class OptionsStore:
+    """Process wide memo for the options layers.
+
+    Services built during a single command share the parsed config files,
+    the merged project and profile options and the resolved options.
+    Entries are validated with a stat call on every file they depend on,
+    so files written during the command (e.g. by `plonex init`) are reloaded.
+    Values are deep copied in and out because services mutate them.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Hashable, StoreEntry] = {}
+
+    def get(
+        self,
+        key: Hashable,
+        config_paths: list[Path] | None = None,
+    ) -> StoreEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if config_paths is not None and entry.config_paths != [
+            str(path) for path in config_paths
+        ]:
+            return None
+        for path, fingerprint in entry.inputs.items():
+            if not fingerprint_matches(Path(path), fingerprint):
+                del self._entries[key]
+                return None
+        return replace(entry, value=copy.deepcopy(entry.value))
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        inputs: list[Path],
+        config_paths: list[Path] | None = None,
+        cacheable: bool = True,
+    ) -> None:
+        self._entries[key] = StoreEntry(
+            value=copy.deepcopy(value),
+            inputs={
+                str(path): file_fingerprint(path, content_hash=False)
+                for path in inputs
+            },
+            config_paths=(
+                None if config_paths is None else [str(path) for path in config_paths]
+            ),
+            cacheable=cacheable,
+        )
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+options_store = OptionsStore()
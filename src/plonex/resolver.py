@@ -0,0 +1,286 @@
+from collections import ChainMap
+from dataclasses import dataclass
+from dataclasses import field
+from jinja2 import BaseLoader
+from jinja2 import Environment
+from jinja2 import meta
+from jinja2 import nodes
+from jinja2 import Template
+from typing import Any
+from typing import Hashable
+from typing import Iterator
+
+import copy
+
+
+OptionPath = tuple[Hashable, ...]
+
+_TEMPLATE_MARKERS = ("{{", "{%", "{#")
+
+
+class OptionsResolutionError(ValueError):
+    """Raised when the options contain circular references.
+
+    The options attribute holds the options with every resolvable
+    value rendered, the strings involved in the cycles are left untouched.
+    """
+
+    def __init__(self, message: str, options: dict):
+        super().__init__(message, options)
+        self.options = options
+
+    def __str__(self) -> str:
+        return str(self.args[0])
+
+
+def format_option_path(path: OptionPath) -> str:
+    """Return a human readable representation of an option path"""
+    text = str(path[0])
+    for part in path[1:]:
+        text += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return text
+
+
+def _is_template(value: Any) -> bool:
+    return isinstance(value, str) and any(
+        marker in value for marker in _TEMPLATE_MARKERS
+    )
+
+
+def _iter_templates(value: Any, path: OptionPath) -> Iterator[tuple[OptionPath, str]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _iter_templates(item, (*path, key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _iter_templates(item, (*path, index))
+    elif _is_template(value):
+        yield path, value
+
+
+def _reference_path(node: nodes.Node) -> OptionPath | None:
+    """Return the static path of a variable lookup like `a.b['c']`.
+
+    Dynamic lookups (e.g. `a[name].b`) are truncated to their static prefix.
+    """
+    parts: list[Hashable] = []
+    while True:
+        if isinstance(node, nodes.Getattr):
+            parts.append(node.attr)
+            node = node.node
+        elif isinstance(node, nodes.Getitem):
+            if isinstance(node.arg, nodes.Const) and isinstance(
+                node.arg.value, Hashable
+            ):
+                parts.append(node.arg.value)
+            else:
+                parts.clear()
+            node = node.node
+        elif isinstance(node, nodes.Name):
+            return (node.name, *reversed(parts))
+        else:
+            return None
+
+
+def _iter_references(node: nodes.Node) -> Iterator[OptionPath]:
+    if isinstance(node, (nodes.Name, nodes.Getattr, nodes.Getitem)):
+        path = _reference_path(node)
+        if path is not None:
+            yield path
+            # Dynamic subscripts may reference other options
+            while isinstance(node, (nodes.Getattr, nodes.Getitem)):
+                if isinstance(node, nodes.Getitem):
+                    yield from _iter_references(node.arg)
+                node = node.node
+            return
+    for child in node.iter_child_nodes():
+        yield from _iter_references(child)
+
+
+@dataclass
+class _TemplatedValue:
+
+    path: OptionPath
+    ast: nodes.Template
+    references: set[OptionPath]
+    dependencies: list[OptionPath] = field(default_factory=list)
+
+
+class OptionsResolver:
+    """Resolve the Jinja expressions found in the options.
+
+    Every templated string is parsed once to find the options it references,
+    then the strings are rendered once each in dependency order.
+    The top level options are the rendering context, so `{{ a.b }}` refers
+    to the value of the key `b` in the top level option `a`.
+    """
+
+    def __init__(self, environment: Environment | None = None):
+        self.environment = environment or Environment(loader=BaseLoader())
+
+    def _collect(self, options: dict) -> dict[OptionPath, _TemplatedValue]:
+        templated: dict[OptionPath, _TemplatedValue] = {}
+        for path, source in _iter_templates(options, ()):
+            ast = self.environment.parse(source)
+            undeclared = meta.find_undeclared_variables(ast)
+            references = {
+                reference
+                for reference in _iter_references(ast)
+                if reference[0] in undeclared and reference[0] in options
+            }
+            templated[path] = _TemplatedValue(
+                path=path, ast=ast, references=references
+            )
+        return templated
+
+    @staticmethod
+    def _link(templated: dict[OptionPath, _TemplatedValue]) -> None:
+        """Compute the templated values each templated value depends on"""
+        by_prefix: dict[OptionPath, list[OptionPath]] = {}
+        for path in templated:
+            for length in range(1, len(path) + 1):
+                by_prefix.setdefault(path[:length], []).append(path)
+
+        for value in templated.values():
+            dependencies: dict[OptionPath, None] = {}
+            for reference in sorted(value.references, key=repr):
+                # Templated values nested inside the referenced option...
+                for path in by_prefix.get(reference, []):
+                    dependencies[path] = None
+                # ...or the templated value containing it
+                for length in range(1, len(reference)):
+                    if reference[:length] in templated:
+                        dependencies[reference[:length]] = None
+            # A value can always see its own raw text
+            dependencies.pop(value.path, None)
+            value.dependencies = list(dependencies)
+
+    @staticmethod
+    def _sort(
+        templated: dict[OptionPath, _TemplatedValue],
+    ) -> tuple[list[OptionPath], list[list[OptionPath]]]:
+        """Sort the templated values so that dependencies come first.
+
+        Returns the sorted paths and the list of cycles found.
+        """
+        order: list[OptionPath] = []
+        cycles: list[list[OptionPath]] = []
+        state: dict[OptionPath, int] = {}  # 1=visiting, 2=done, 3=cyclic
+        for root in templated:
+            if root in state:
+                continue
+            stack: list[tuple[OptionPath, Iterator[OptionPath]]] = [
+                (root, iter(templated[root].dependencies))
+            ]
+            state[root] = 1
+            while stack:
+                path, dependencies = stack[-1]
+                for dependency in dependencies:
+                    dependency_state = state.get(dependency)
+                    if dependency_state is None:
+                        state[dependency] = 1
+                        stack.append(
+                            (dependency, iter(templated[dependency].dependencies))
+                        )
+                        break
+                    if dependency_state == 1:
+                        in_progress = [item for item, _ in stack]
+                        start = in_progress.index(dependency)
+                        cycle = in_progress[start:]
+                        cycles.append([*cycle, dependency])
+                        for item in cycle:
+                            state[item] = 3
+                else:
+                    stack.pop()
+                    if state[path] == 1:
+                        state[path] = 2
+                        order.append(path)
+        return order, cycles
+
+    def resolve(self, options: dict) -> dict:
+        """Return a copy of the options with all the expressions rendered.
+
+        The templated keys are rendered last, with the resolved values.
+        """
+        resolved = copy.deepcopy(options)
+        templated = self._collect(resolved)
+        if not templated:
+            self._render_keys(resolved, resolved)
+            return resolved
+
+        self._link(templated)
+        order, cycles = self._sort(templated)
+        cyclic = {path for cycle in cycles for path in cycle}
+        for path in order:
+            value = templated[path]
+            if any(dependency in cyclic for dependency in value.dependencies):
+                cyclic.add(path)
+                continue
+            template = self.environment.from_string(value.ast)
+            self._set(resolved, path, self._render(template, resolved))
+
+        self._render_keys(resolved, resolved)
+        if cycles:
+            descriptions = [
+                " -> ".join(format_option_path(path) for path in cycle)
+                for cycle in cycles
+            ]
+            raise OptionsResolutionError(
+                "Circular reference while resolving options: "
+                + "; ".join(descriptions),
+                resolved,
+            )
+        return resolved
+
+    @staticmethod
+    def _render(template: Template, options: dict) -> str:
+        # Share the options with the template context instead of copying them
+        # like Template.render does, values resolved so far are visible
+        context = template.new_context(
+            ChainMap(options, template.globals),  # type: ignore[arg-type]
+            shared=True,
+        )
+        return template.environment.concat(  # type: ignore[attr-defined]
+            template.root_render_func(context)
+        )
+
+    def _render_keys(self, value: Any, options: dict) -> None:
+        """Render in place the templated keys of the dicts found in value"""
+        if isinstance(value, list):
+            for item in value:
+                self._render_keys(item, options)
+            return
+        if not isinstance(value, dict):
+            return
+        for item in value.values():
+            self._render_keys(item, options)
+        if not any(_is_template(key) for key in value):
+            return
+        items = [
+            (
+                (
+                    self._render(self.environment.from_string(key), options)
+                    if _is_template(key)
+                    else key
+                ),
+                item,
+            )
+            for key, item in value.items()
+        ]
+        value.clear()
+        value.update(items)
+
+    @staticmethod
+    def _set(options: dict, path: OptionPath, value: Any) -> None:
+        container: Any = options
+        for part in path[:-1]:
+            container = container[part]
+        container[path[-1]] = value
+
+
+def resolve_options(options: dict) -> dict:
+    """Resolve the Jinja expressions in the options.
+
+    Raises OptionsResolutionError if circular references are found.
+    """
+    return OptionsResolver().resolve(options)
@@ -1,24 +1,53 @@
 """Plonex services package."""
 
-from plonex.base import ZopeBasedService
-from plonex.services.compile import CompileService
-from plonex.services.describe import DescribeService
-from plonex.services.directory import DirectoryService
-from plonex.services.init import InitService
-from plonex.services.install import InstallService
-from plonex.services.profile import ProfileService
-from plonex.services.robotserver import RobotServer
-from plonex.services.robottest import RobotTest
-from plonex.services.runwsgi import RunWSGI
-from plonex.services.sources import SourcesService
-from plonex.services.supervisor import Supervisor
-from plonex.services.template import TemplateService
-from plonex.services.upgrade import UpgradeService
-from plonex.services.zconsole import ZConsole
-from plonex.services.zeoserver import ZeoServer
-from plonex.services.zopetest import ZopeTest
+from plonex._lazy import lazy_getattr
+from typing import TYPE_CHECKING
 
 
+if TYPE_CHECKING:
+    from plonex.base import ZopeBasedService
+    from plonex.services.compile import CompileService
+    from plonex.services.describe import DescribeService
+    from plonex.services.directory import DirectoryService
+    from plonex.services.init import InitService
+    from plonex.services.install import InstallService
+    from plonex.services.profile import ProfileService
+    from plonex.services.robotserver import RobotServer
+    from plonex.services.robottest import RobotTest
+    from plonex.services.runwsgi import RunWSGI
+    from plonex.services.sources import SourcesService
+    from plonex.services.supervisor import Supervisor
+    from plonex.services.template import TemplateService
+    from plonex.services.upgrade import UpgradeService
+    from plonex.services.zconsole import ZConsole
+    from plonex.services.zeoserver import ZeoServer
+    from plonex.services.zopetest import ZopeTest
+
+
+# The services are imported on first use: importing one of them
+# should not pull in the dependencies of all the others
+_LAZY_IMPORTS: dict[str, str] = {
+    "ZopeBasedService": "plonex.base",
+    "CompileService": "plonex.services.compile",
+    "DescribeService": "plonex.services.describe",
+    "DirectoryService": "plonex.services.directory",
+    "InitService": "plonex.services.init",
+    "InstallService": "plonex.services.install",
+    "ProfileService": "plonex.services.profile",
+    "RobotServer": "plonex.services.robotserver",
+    "RobotTest": "plonex.services.robottest",
+    "RunWSGI": "plonex.services.runwsgi",
+    "SourcesService": "plonex.services.sources",
+    "Supervisor": "plonex.services.supervisor",
+    "TemplateService": "plonex.services.template",
+    "UpgradeService": "plonex.services.upgrade",
+    "ZConsole": "plonex.services.zconsole",
+    "ZeoServer": "plonex.services.zeoserver",
+    "ZopeTest": "plonex.services.zopetest",
+}
+
+__getattr__ = lazy_getattr(globals(), _LAZY_IMPORTS)
+
 __all__ = [
     "CompileService",
     "DescribeService",
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
+from plonex import yaml_io
 from plonex.base import BaseService
 from plonex.services.sources import SourcesService
-from yaml import dump
 
 
 @dataclass(kw_only=True)
@@ -18,7 +18,7 @@ class CompileService(BaseService):
     def run(self) -> None:
         """Compile the configuration files in to a var files"""
         self.logger.info(f"Compiling configuration files in to {self.target_file}")
-        self.target_file.write_text(dump(self.options, sort_keys=True))
+        self.target_file.write_text(yaml_io.dump(self.options, sort_keys=True))
         with SourcesService(target=self.target) as gitman_service:
             gitman_file = gitman_service.compile_config()
         if gitman_file is not None:
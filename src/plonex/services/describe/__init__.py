@@ -25,6 +25,8 @@ class DescribeService(BaseService):
     )
     generate_html: bool = False
     browse_html: bool = False
+    # Ignore the cached status of the source checkouts
+    refresh_sources: bool = False
     var_folder: Path = field(init=False)
     describe_folder: Path = field(init=False)
 
@@ -78,12 +80,19 @@ class DescribeService(BaseService):
 
     @property
     def profiles(self) -> list[str]:
-        profiles = self.options.get("profiles") or []
-        if isinstance(profiles, str):
-            profiles = [profiles]
-        return (
-            [str(profile) for profile in profiles] if isinstance(profiles, list) else []
-        )
+        """All the profiles, nested ones included, by increasing precedence"""
+        graph = self.profile_graph
+        target = self.target.resolve()
+        profiles = []
+        for root in graph.roots:
+            node = graph.nodes[root]
+            if node.remote:
+                profiles.append(str(node.source))
+            elif root.is_relative_to(target):
+                profiles.append(root.relative_to(target).as_posix())
+            else:
+                profiles.append(str(root))
+        return profiles
 
     @property
     def additional_config_files(self) -> list[Path]:
@@ -147,7 +156,11 @@ class DescribeService(BaseService):
         service = SourcesService(target=self.target)
         rows: list[tuple[str, str, str, str, str]] = []
 
-        for source_name, path in sorted(service.configured_checkouts().items()):
+        checkouts = service.configured_checkouts()
+        statuses = service.checkout_statuses(
+            checkouts.values(), cached=True, refresh=self.refresh_sources
+        )
+        for source_name, path in sorted(checkouts.items()):
             source_options = service.sources.get(source_name)
             configured_repo = None
             configured_rev = None
@@ -155,20 +168,21 @@ class DescribeService(BaseService):
                 configured_repo = source_options.get("repo")
                 configured_rev = source_options.get("rev")
 
+            status = statuses[path]
             detected_repo = None
             details: list[str] = []
             health_symbol = "✓"
 
-            if not path.exists():
+            if not status.exists:
                 health_symbol = "✗"
                 details.append("missing")
-            elif not (path / ".git").exists():
+            elif not status.is_git:
                 health_symbol = "⚠"
                 details.append("not-git")
             else:
-                detected_repo = service._git_remote_url(path)
-                branch = service._git_current_branch(path)
-                if service._has_modifications(path):
+                detected_repo = status.remote_url
+                branch = status.branch
+                if status.modified:
                     health_symbol = "⚠"
                     details.append("modified")
 
@@ -182,6 +196,10 @@ class DescribeService(BaseService):
                         details.append(f"expected:{configured_rev}")
                 else:
                     details.append("detached")
+                if status.ahead:
+                    details.append(f"ahead:{status.ahead}")
+                if status.behind:
+                    details.append(f"behind:{status.behind}")
 
                 if (
                     isinstance(configured_repo, str)
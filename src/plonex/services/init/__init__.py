@@ -1,11 +1,7 @@
 from dataclasses import dataclass
 from functools import cached_property
 from importlib.metadata import version
-from pathlib import Path
 from plonex.base import BaseService
-from plonex.services.install import InstallService
-from plonex.services.supervisor import Supervisor
-from plonex.services.template import TemplateService
 from textwrap import dedent
 
 
@@ -32,6 +28,8 @@ class InitService(BaseService):
         return options_defaults
 
     def __post_init__(self):
+        from plonex.services.template import TemplateService
+
         self.target = self._ensure_dir(self.target)
 
         if not self.pre_services:
@@ -49,54 +47,11 @@ class InitService(BaseService):
                     )
                 )
 
-    def _collect_profile_roots(
-        self,
-        profile: str | Path,
-        relative_to: Path,
-        seen: set[Path],
-    ) -> list[Path]:
-        from plonex.services.profile import ProfileService
-
-        resolved_profile = self._resolve_profile_source(profile, relative_to)
-        profile_service = ProfileService(source=resolved_profile, target=self.target)
-        profile_root = profile_service.source_path.resolve()
-
-        if profile_root in seen:
-            return []
-        seen.add(profile_root)
-
-        roots: list[Path] = []
-        profile_plonex_yml = profile_root / "etc" / "plonex.yml"
-        if profile_plonex_yml.exists():
-            raw_profile_options = self._load_yaml_mapping(profile_plonex_yml)
-            nested_profiles = self._normalize_profiles(
-                raw_profile_options.get("profiles"),
-                profile_plonex_yml,
-            )
-            for nested_profile in nested_profiles:
-                roots.extend(
-                    self._collect_profile_roots(nested_profile, profile_root, seen)
-                )
-
-        roots.append(profile_root)
-        return roots
-
-    @cached_property
-    def profile_roots(self) -> list[Path]:
-        plonex_yml = self.target / "etc" / "plonex.yml"
-        if not plonex_yml.exists():
-            return []
-
-        raw_local = self._load_yaml_mapping(plonex_yml)
-        raw_profiles = self._normalize_profiles(raw_local.get("profiles"), plonex_yml)
-        seen: set[Path] = set()
-        roots: list[Path] = []
-        for profile in raw_profiles:
-            roots.extend(self._collect_profile_roots(profile, self.target, seen))
-        return roots
-
     def run(self):
         """Run the init command"""
+        from plonex.services.install import InstallService
+        from plonex.services.supervisor import Supervisor
+
         with InstallService(target=self.target) as install:
             install.run(persist_local=True)
         with Supervisor(target=self.target) as supervisor:
@@ -108,6 +63,7 @@ class InitService(BaseService):
                 dedent(
                     """\
                     /.venv
+                    /.venvs
                     /tmp
                     /var
                     """
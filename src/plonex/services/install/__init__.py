@@ -1,20 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from dataclasses import field
 from datetime import datetime
 from functools import cached_property
+from functools import partial
+from hashlib import sha256
 from importlib import resources
+from importlib.metadata import version
 from pathlib import Path
 from pip_requirements_parser import RequirementsFile  # type: ignore
 from plonex.base import BaseService
+from plonex.http_cache import http_cache
+from plonex.http_cache import session
+from plonex.options_cache import cache_key
+from plonex.services.install.constraints import ConstraintsFile
+from plonex.services.install.constraints import parse_constraints
+from plonex.services.install.constraints import parse_constraints_file
+from plonex.services.install.constraints import requirements_from_string
+from plonex.services.install.distributions import installed_distributions
+from plonex.services.install.distributions import scan_distributions
+from plonex.services.install.manifest import InputsManifest
+from plonex.services.install.parse_cache import ParseCache
+from plonex.services.install.state import InstalledState
+from plonex.services.install.venvs import Virtualenvs
 from plonex.services.sources import SourcesService
+from plonex.timings import in_current_context
 from rich.console import Console
-from tempfile import NamedTemporaryFile
+from typing import Any
+from typing import ClassVar
 from urllib.parse import urljoin
 from urllib.parse import urlparse
 
 import re
 import requests
 import sh  # type: ignore[import-untyped]
+import shutil
 import tomllib
 
 
@@ -37,6 +57,33 @@ class InstallService(BaseService):
     constraints_d_folder: Path = field(init=False)
     requirements_txt: Path = field(init=False)
     constrainst_txt: Path = field(init=False)
+    # Parsed remote requirements files by URL
+    _remote_requirement_files: dict[str, Any] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    # Files and URLs read to generate requirements.txt and constraints.txt
+    _read_files: set[Path] = field(default_factory=set, init=False, repr=False)
+    _read_urls: set[str] = field(default_factory=set, init=False, repr=False)
+    # The local files parsed during this run
+    _parse_cache: ParseCache = field(default_factory=ParseCache, init=False, repr=False)
+
+    # Number of remote requirements files downloaded at the same time
+    download_workers: ClassVar[int] = 8
+    # Number of threads reading the metadata of the installed distributions
+    metadata_workers: ClassVar[int] = 8
+    # Number of pip processes filling the wheelhouse at the same time
+    prefetch_workers: ClassVar[int] = 8
+    # Also needed to create the virtualenv and build the editable packages
+    prefetch_extra_requirements: ClassVar[tuple[str, ...]] = (
+        "pip",
+        "uv",
+        "setuptools",
+        "wheel",
+    )
+    # Like pip freeze, do not report the packaging tools as missing constraints
+    freeze_excluded: ClassVar[frozenset[str]] = frozenset(
+        {"pip", "setuptools", "wheel", "distribute"}
+    )
 
     @cached_property
     def options_defaults(self) -> dict:
@@ -69,8 +116,25 @@ class InstallService(BaseService):
             except sh.ErrorReturnCode:
                 continue
 
+    @cached_property
+    def host_uv(self) -> str | None:
+        """The uv executable of the host, used to create the virtualenv.
+
+        The `uv` option can point to a specific executable
+        or be set to false to create the virtualenv with `python -m venv`.
+        """
+        if "uv" in self.options:
+            return self.options["uv"] or None
+        try:
+            return self.execute_command(["which", "uv"]).strip() or None
+        except sh.ErrorReturnCode:
+            return None
+
     def ensure_virtualenv(self):
         """Ensure that we have a virtualenv"""
+        recovered = self.virtualenvs.recover()
+        if recovered is not None:
+            self.logger.warning("Restored the missing .venv symlink to %s", recovered)
         if not (self.target / ".venv" / "bin" / "activate").exists():
             if self.options.get("python") or self.dont_ask:
                 python_path = self.default_python
@@ -84,16 +148,48 @@ class InstallService(BaseService):
                     or self.default_python
                 )
             self.logger.info("Creating a virtualenv")
-            self.execute_command(
-                [str(python_path), "-m", "venv", str(self.target / ".venv")]
-            )
+            self._create_virtualenv(self.target / ".venv", python_path)
 
         if not (self.virtualenv_dir / "bin" / "uv").exists():
             self.logger.info("Installing uv")
+            self._install_uv(self.virtualenv_dir)
+
+    def _create_virtualenv(self, path: Path, python_path: str | None) -> None:
+        if self.host_uv:
             self.execute_command(
                 [
-                    str(self.virtualenv_dir / "bin" / "pip"),
+                    self.host_uv,
+                    "venv",
+                    "--seed",
+                    *(["--python", str(python_path)] if python_path else []),
+                    *self._uv_offline_options(),
+                    *self._uv_cache_options(),
+                    str(path),
+                ]
+            )
+        else:
+            self.execute_command([str(python_path), "-m", "venv", str(path)])
+
+    def _install_uv(self, virtualenv_dir: Path) -> None:
+        if self.host_uv:
+            self.execute_command(
+                [
+                    self.host_uv,
+                    "pip",
                     "install",
+                    "--python",
+                    str(virtualenv_dir / "bin" / "python"),
+                    *self._uv_offline_options(),
+                    *self._uv_cache_options(),
+                    "uv",
+                ]
+            )
+        else:
+            self.execute_command(
+                [
+                    str(virtualenv_dir / "bin" / "pip"),
+                    "install",
+                    *self._find_links_options(),
                     "uv",
                 ]
             )
@@ -167,7 +263,20 @@ class InstallService(BaseService):
     def resolve_package_name_from_path(self, requirement) -> str:
         """Resolve the package name from a path"""
         path = Path(requirement.link.path)
+        # The package name depends on these files, also when they do not exist
+        metadata_files = [
+            (path / name).absolute() for name in ("pyproject.toml", "setup.cfg")
+        ]
+        self._read_files.update(metadata_files)
+        return self._parse_cache.get(
+            ("package name", path.absolute()),
+            partial(self._package_name, path),
+            lambda _: metadata_files,
+        )
 
+    @staticmethod
+    def _package_name(path: Path) -> str:
+        """Read the package name from the metadata files of a project"""
         pyproject_toml = path / "pyproject.toml"
         if pyproject_toml.exists():
             pyproject = tomllib.loads(pyproject_toml.read_text())
@@ -200,28 +309,53 @@ class InstallService(BaseService):
         for requirements_folder in self._requirements_d_folders():
             for file in requirements_folder.iterdir():
                 if file.is_file():
-                    requirements_sources.append(
-                        RequirementsFile.from_file(str(file), include_nested=True)
+                    path = file.absolute()
+                    requirements = self._parse_cache.get(
+                        ("requirements", path),
+                        partial(
+                            RequirementsFile.from_file, str(path), include_nested=True
+                        ),
+                        partial(self._requirements_file_dependencies, path),
                     )
+                    self._read_files.add(path)
+                    self._read_files.update(self._nested_files(requirements))
+                    requirements_sources.append(requirements)
 
         if self.options.get("pip_requirements"):
             raw_pip_requirements = self.options.get("pip_requirements") or []
             if isinstance(raw_pip_requirements, str):
                 raw_pip_requirements = [raw_pip_requirements]
-            # Patch: See:
-            #
-            # - https://github.com/aboutcode-org/pip-requirements-parser/pull/25
-
-            import pip_requirements_parser
-
-            pip_requirements_parser.Path = Path
-
+            text = "\n".join(raw_pip_requirements)
             requirements_sources.append(
-                RequirementsFile.from_string("\n".join(raw_pip_requirements))
+                self._parse_cache.get(
+                    ("pip_requirements", text),
+                    partial(requirements_from_string, text),
+                    lambda _: (),
+                )
             )
 
         return requirements_sources
 
+    @classmethod
+    def _requirements_file_dependencies(cls, path: Path, requirements) -> set[Path]:
+        """The files a parsed requirements file depends on"""
+        return {path, *cls._nested_files(requirements)}
+
+    @staticmethod
+    def _nested_files(requirements) -> set[Path]:
+        """The local files read when parsing requirements with their includes"""
+        filenames = {
+            line.requirement_line.filename
+            for attribute in ("requirements", "options", "comments", "invalid_lines")
+            for line in getattr(requirements, attribute, [])
+            if getattr(line, "requirement_line", None) is not None
+        }
+        return {
+            Path(filename).absolute()
+            for filename in filenames
+            if not urlparse(filename).scheme
+        }
+
     def _iter_editable_requirements(self):
         """Iterate over editable requirements, yielding (name, requirement) tuples"""
         for requirements in self._collect_requirements_sources():
@@ -351,25 +485,75 @@ class InstallService(BaseService):
             return (base_source.parent / reference_path).resolve()
         return urljoin(base_source, reference)
 
-    def _parse_requirement_source(self, source: str | Path):
+    def _parse_requirement_source(self, source: str | Path) -> ConstraintsFile:
         if not self._is_remote_requirement_source(source):
-            return RequirementsFile.from_file(str(source), include_nested=False)
+            path = Path(source).absolute()
+            self._read_files.add(path)
+            return self._parse_cache.get(
+                ("constraints", path),
+                partial(parse_constraints_file, path),
+                lambda _: [path],
+            )
 
         remote_source = str(source)
-        response = requests.get(remote_source, timeout=30)
+        if remote_source not in self._remote_requirement_files:
+            self._prefetch_remote_sources([remote_source])
+        return self._remote_requirement_files[remote_source]
+
+    def _fetch_requirement_source(self, remote_source: str) -> ConstraintsFile:
+        """Download and parse a remote requirements file"""
+        self._read_urls.add(remote_source)
+        if self.http_cache_enabled:
+            cached = http_cache.fetch(remote_source, offline=self.offline)
+            return parse_constraints_file(cached)
+        if self.offline:
+            raise FileNotFoundError(f"Cannot download {remote_source} offline")
+        # The shared session keeps the connections alive between the includes
+        response = session().get(remote_source, timeout=30)
         response.raise_for_status()
-        with NamedTemporaryFile(
-            mode="w",
-            suffix=".txt",
-            dir=self.tmp_folder,
-            delete=False,
-        ) as handle:
-            handle.write(response.text)
-            tmp_name = handle.name
-        try:
-            return RequirementsFile.from_file(tmp_name, include_nested=False)
-        finally:
-            Path(tmp_name).unlink(missing_ok=True)
+        return parse_constraints(response.text)
+
+    def _remote_references(
+        self, parsed: ConstraintsFile, source: str | Path
+    ) -> list[str]:
+        """The remote files included by a parsed requirements file"""
+        references = []
+        for _, reference in parsed.includes:
+            resolved = self._resolve_requirement_source(reference, source)
+            if self._is_remote_requirement_source(resolved):
+                references.append(str(resolved))
+        return references
+
+    def _prefetch_remote_sources(self, remote_sources: list[str]) -> None:
+        """Download and parse the remote files and all their remote includes.
+
+        The include tree is walked breadth first and the files of each level
+        are downloaded concurrently. The results are only stored here:
+        the constraints are merged later in the usual order.
+        """
+        parsed_files = self._remote_requirement_files
+        pending = [
+            url for url in dict.fromkeys(remote_sources) if url not in parsed_files
+        ]
+        if not pending:
+            return
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            while pending:
+                level = executor.map(
+                    in_current_context(self._fetch_requirement_source), pending
+                )
+                for url, parsed in zip(pending, level):
+                    parsed_files[url] = parsed
+                references = [
+                    reference
+                    for url in pending
+                    for reference in self._remote_references(parsed_files[url], url)
+                ]
+                pending = [
+                    reference
+                    for reference in dict.fromkeys(references)
+                    if reference not in parsed_files
+                ]
 
     def _collect_compiled_constraint_entries(
         self,
@@ -386,50 +570,49 @@ class InstallService(BaseService):
         seen.add(source_key)
 
         parsed = self._parse_requirement_source(source)
+        self._prefetch_remote_sources(self._remote_references(parsed, source))
         source_is_remote = self._is_remote_requirement_source(source)
         included_files: list[str] = []
         resolved_constraints = {}
         explicit_constraints = {}
 
-        for option in getattr(parsed, "options", []):
-            for option_name, _flag in (("constraints", "-c"), ("requirements", "-r")):
-                for reference in option.options.get(option_name, []):
-                    resolved = self._resolve_requirement_source(reference, source)
-                    if self._is_remote_requirement_source(resolved):
-                        nested_includes, nested_resolved, nested_explicit = (
-                            self._collect_compiled_constraint_entries(
-                                resolved,
-                                developed_packages=developed_packages,
-                                seen=seen,
-                            )
-                        )
-                        for include_line in nested_includes:
-                            if include_line not in included_files:
-                                included_files.append(include_line)
-                        for key, requirement in nested_resolved.items():
-                            if key not in resolved_constraints:
-                                resolved_constraints[key] = requirement
-                        for key, requirement in nested_explicit.items():
-                            if key not in explicit_constraints:
-                                explicit_constraints[key] = requirement
-                        continue
-
-                    nested_includes, nested_resolved, nested_explicit = (
-                        self._collect_compiled_constraint_entries(
-                            resolved,
-                            developed_packages=developed_packages,
-                            seen=seen,
-                        )
+        for _, reference in parsed.includes:
+            resolved = self._resolve_requirement_source(reference, source)
+            if self._is_remote_requirement_source(resolved):
+                nested_includes, nested_resolved, nested_explicit = (
+                    self._collect_compiled_constraint_entries(
+                        resolved,
+                        developed_packages=developed_packages,
+                        seen=seen,
                     )
-                    for include_line in nested_includes:
-                        if include_line not in included_files:
-                            included_files.append(include_line)
-                    for key, requirement in nested_resolved.items():
-                        if key not in resolved_constraints:
-                            resolved_constraints[key] = requirement
-                    for key, requirement in nested_explicit.items():
-                        if key not in explicit_constraints:
-                            explicit_constraints[key] = requirement
+                )
+                for include_line in nested_includes:
+                    if include_line not in included_files:
+                        included_files.append(include_line)
+                for key, requirement in nested_resolved.items():
+                    if key not in resolved_constraints:
+                        resolved_constraints[key] = requirement
+                for key, requirement in nested_explicit.items():
+                    if key not in explicit_constraints:
+                        explicit_constraints[key] = requirement
+                continue
+
+            nested_includes, nested_resolved, nested_explicit = (
+                self._collect_compiled_constraint_entries(
+                    resolved,
+                    developed_packages=developed_packages,
+                    seen=seen,
+                )
+            )
+            for include_line in nested_includes:
+                if include_line not in included_files:
+                    included_files.append(include_line)
+            for key, requirement in nested_resolved.items():
+                if key not in resolved_constraints:
+                    resolved_constraints[key] = requirement
+            for key, requirement in nested_explicit.items():
+                if key not in explicit_constraints:
+                    explicit_constraints[key] = requirement
 
         for requirement in parsed.requirements:
             name = getattr(requirement, "name", None)
@@ -463,33 +646,34 @@ class InstallService(BaseService):
         seen.add(source_key)
 
         parsed = self._parse_requirement_source(source)
+        if expand_remote_includes:
+            self._prefetch_remote_sources(self._remote_references(parsed, source))
         included_files: list[str] = []
         constraints = {}
 
-        for option in getattr(parsed, "options", []):
-            for option_name, flag in (("constraints", "-c"), ("requirements", "-r")):
-                for reference in option.options.get(option_name, []):
-                    resolved = self._resolve_requirement_source(reference, source)
-                    if self._is_remote_requirement_source(resolved):
-                        include_line = f"{flag} {resolved}"
-                        if include_line not in included_files:
-                            included_files.append(include_line)
-                        if not expand_remote_includes:
-                            continue
-
-                    nested_includes, nested_constraints = (
-                        self._collect_constraint_entries(
-                            resolved,
-                            developed_packages=developed_packages,
-                            seen=seen,
-                            expand_remote_includes=expand_remote_includes,
-                        )
-                    )
-                    for include_line in nested_includes:
-                        if include_line not in included_files:
-                            included_files.append(include_line)
-                    for key, requirement in nested_constraints.items():
-                        constraints[key] = requirement
+        for option_name, reference in parsed.includes:
+            flag = "-c" if option_name == "constraints" else "-r"
+            resolved = self._resolve_requirement_source(reference, source)
+            if self._is_remote_requirement_source(resolved):
+                include_line = f"{flag} {resolved}"
+                if include_line not in included_files:
+                    included_files.append(include_line)
+                if not expand_remote_includes:
+                    continue
+
+            nested_includes, nested_constraints = (
+                self._collect_constraint_entries(
+                    resolved,
+                    developed_packages=developed_packages,
+                    seen=seen,
+                    expand_remote_includes=expand_remote_includes,
+                )
+            )
+            for include_line in nested_includes:
+                if include_line not in included_files:
+                    included_files.append(include_line)
+            for key, requirement in nested_constraints.items():
+                constraints[key] = requirement
 
         for requirement in parsed.requirements:
             name = getattr(requirement, "name", None)
@@ -514,12 +698,63 @@ class InstallService(BaseService):
             return None
         return name_as_pep503(str(name))
 
+    @property
+    def wheelhouse(self) -> Path:
+        """The folder filled by `plonex dependencies --prefetch`.
+
+        It can be shared by several projects with an absolute path.
+        """
+        return self._path_option("wheelhouse", "var/wheelhouse")
+
+    def _path_option(self, name: str, default: str) -> Path:
+        """A path option, relative to the target unless it is absolute"""
+        path = Path(self.options.get(name) or default).expanduser()
+        if path.is_absolute():
+            return path
+        return self.target / path
+
+    @property
+    def uv_cache_dir(self) -> Path | None:
+        """The uv cache shared by the projects, None to use the uv default.
+
+        The packages are linked from the cache into the virtualenvs
+        (see the `uv_link_mode` option), so the cache should be
+        on the same filesystem as the projects.
+        """
+        if not self.options.get("uv_cache_dir"):
+            return None
+        return self._path_option("uv_cache_dir", "")
+
+    def _uv_cache_options(self, link: bool = True) -> list[str]:
+        """The uv options to select the cache and how it is linked"""
+        options = []
+        if self.uv_cache_dir is not None:
+            options.extend(["--cache-dir", str(self.uv_cache_dir)])
+        link_mode = self.options.get("uv_link_mode")
+        if link and link_mode:
+            options.extend(["--link-mode", str(link_mode)])
+        return options
+
+    def _find_links_options(self) -> list[str]:
+        """The pip options to install only from the wheelhouse when offline"""
+        if not self.offline:
+            return []
+        return ["--no-index", "--find-links", str(self.wheelhouse)]
+
+    def _uv_offline_options(self) -> list[str]:
+        """The uv options to install only from the wheelhouse when offline"""
+        if not self.offline:
+            return []
+        return ["--offline", *self._find_links_options()]
+
     @property
     def command(self):
         return [
             str(self.virtualenv_dir / "bin" / "uv"),
             "pip",
             "install",
+            *self._uv_offline_options(),
+            *self._uv_cache_options(),
             "-r",
             str(self.requirements_txt.absolute()),
             "-c",
@@ -542,6 +777,8 @@ class InstallService(BaseService):
             str(self.virtualenv_dir / "bin" / "uv"),
             "pip",
             "compile",
+            *self._uv_offline_options(),
+            *self._uv_cache_options(link=False),
             str(self.requirements_txt.absolute()),
             "-c",
             str(self.constrainst_txt.absolute()),
@@ -562,9 +799,132 @@ class InstallService(BaseService):
             str(self.virtualenv_dir / "bin" / "uv"),
             "pip",
             "sync",
+            *self._uv_offline_options(),
+            *self._uv_cache_options(),
             str(self.compiled_requirements_txt.absolute()),
         ]
 
+    def _wheelhouse_contents(self) -> set[tuple[str, str]]:
+        """The (name, version) of the wheels already in the wheelhouse"""
+        contents = set()
+        for wheel in self.wheelhouse.glob("*.whl"):
+            name, _, rest = wheel.name.partition("-")
+            version = rest.partition("-")[0]
+            contents.add((name_as_pep503(name), version))
+        return contents
+
+    def _requirements_to_prefetch(self) -> list[str]:
+        """The pinned requirements whose wheel is not in the wheelhouse yet"""
+        contents = self._wheelhouse_contents()
+        names = {name for name, _ in contents}
+        missing = []
+        for requirement in parse_constraints_file(
+            self.compiled_requirements_txt
+        ).requirements:
+            line = requirement.dumps()
+            version = line.partition("==")[2].partition(";")[0].strip()
+            if (name_as_pep503(requirement.name), version) not in contents:
+                missing.append(line)
+        for extra in self.prefetch_extra_requirements:
+            if extra not in names:
+                missing.append(extra)
+        return missing
+
+    def _download_wheels(self, requirements: list[str]) -> str:
+        return self.execute_command(
+            [
+                str(self.virtualenv_dir / "bin" / "pip"),
+                "wheel",
+                "--no-deps",
+                "--wheel-dir",
+                str(self.wheelhouse),
+                "-c",
+                str(self.constrainst_txt.absolute()),
+                *requirements,
+            ]
+        )
+
+    @BaseService.entered_only
+    def prefetch(self) -> None:
+        """Fill the wheelhouse with the wheels of the compiled requirements.
+
+        The requirements are resolved with `uv pip compile`, then the wheels
+        are downloaded (or built for the packages without wheels)
+        by several pip processes at once. The editable packages are skipped.
+        """
+        if self.offline:
+            self.logger.error("Cannot fill the wheelhouse offline")
+            return
+        self.run_command(self.compile_command)
+        requirements = self._requirements_to_prefetch()
+        if not requirements:
+            self.logger.info("The wheelhouse %s is complete", self.wheelhouse)
+            return
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+        self.logger.info(
+            "Downloading %d wheels in %s", len(requirements), self.wheelhouse
+        )
+        workers = min(self.prefetch_workers, len(requirements))
+        chunks = [requirements[index::workers] for index in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Consume the results to raise the errors
+            list(executor.map(in_current_context(self._download_wheels), chunks))
+
+    @cached_property
+    def virtualenvs(self) -> Virtualenvs:
+        return Virtualenvs(target=self.target)
+
+    @BaseService.entered_only
+    def build_new(self) -> Path:
+        """Build a new virtualenv in .venvs and switch .venv to it.
+
+        The folder is named after the hash of the compiled requirements,
+        so building the same requirements again just switches back to it.
+        The virtualenv in use is not touched until the new one is complete.
+        """
+        self.run_command(self.compile_command)
+        key = sha256(self.compiled_requirements_txt.read_bytes()).hexdigest()[:16]
+        path = self.virtualenvs.path_for(key)
+        # uv is installed last, so it marks a complete virtualenv
+        if (path / "bin" / "uv").exists():
+            self.logger.info("Reusing the virtualenv %s", path)
+        else:
+            self.logger.info("Building a new virtualenv in %s", path)
+            shutil.rmtree(path, ignore_errors=True)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self._create_virtualenv(path, self.default_python)
+                command = self.sync_command
+                # Target the new virtualenv instead of the one running uv
+                command[3:3] = ["--python", str(path / "bin" / "python")]
+                self.run_command(command)
+                self._install_uv(path)
+            except BaseException:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+        self.virtualenvs.switch(path)
+        self.logger.info("Switched .venv to %s", path)
+
+        state_key = self._installed_state_key()
+        if state_key is not None:
+            distributions = installed_distributions(self.virtualenv_dir)
+            self.installed_state.store(
+                state_key, distributions, self._missing_constraints(), True
+            )
+        return path
+
+    def rollback(self) -> bool:
+        """Switch .venv back to the virtualenv it replaced"""
+        previous = self.virtualenvs.previous()
+        if previous is None:
+            self.logger.error("There is no previous virtualenv to roll back to")
+            return False
+        self.virtualenvs.switch(previous)
+        # The recorded state describes the other virtualenv
+        self.installed_state.clear()
+        self.logger.info("Switched .venv back to %s", previous)
+        return True
+
     @property
     def sources_update_before_dependencies(self) -> bool:
         return bool(self.options.get("sources_update_before_dependencies", False))
@@ -577,9 +937,127 @@ class InstallService(BaseService):
     def __enter__(self):
         super().__enter__()
         self.ensure_virtualenv()
+        self.update_requirements_files()
+        return self
+
+    @cached_property
+    def manifest(self) -> InputsManifest:
+        return InputsManifest(path=self.var_folder / "cache" / "requirements.json")
+
+    def _manifest_key(self) -> str:
+        """Summarize what decides the generated files, besides the files read"""
+        return cache_key(
+            {
+                "plonex": version("plonex"),
+                "plonex_base_constraint": str(self.plonex_base_constraint),
+                "pip_requirements": self.options.get("pip_requirements"),
+                "fragments": [
+                    sorted(str(file) for file in folder.iterdir())
+                    for folder in (
+                        *self._requirements_d_folders(),
+                        *self._constraints_d_folders(),
+                    )
+                ],
+            }
+        )
+
+    def _remote_copy(self, url: str) -> Path | None:
+        """The up to date cached copy of a remote file"""
+        if not self.http_cache_enabled:
+            return None
+        try:
+            return http_cache.fetch(url, offline=self.offline)
+        except (OSError, requests.RequestException) as exc:
+            self.logger.debug("Cannot check %s: %s", url, exc)
+            return None
+
+    def _cached_remote_copy(self, url: str) -> Path | None:
+        """The cached copy of a remote file, without revalidating it"""
+        if not self.http_cache_enabled:
+            return None
+        try:
+            return http_cache.fetch(url, offline=True)
+        except FileNotFoundError:
+            return None
+
+    def _generated_files(self) -> list[Path]:
+        self.requirements_txt = self.var_folder / "requirements.txt"
+        self.constrainst_txt = self.var_folder / "constraints.txt"
+        return [self.requirements_txt, self.constrainst_txt]
+
+    def update_requirements_files(self) -> None:
+        """Generate requirements.txt and constraints.txt if their inputs changed.
+
+        When nothing changed the files are not touched at all.
+        """
+        outputs = self._generated_files()
+        key = self._manifest_key()
+        if self.manifest.is_fresh(key, outputs, self._remote_copy):
+            self.logger.debug("The requirements and constraints are up to date")
+            return
+
+        self._read_files.clear()
+        self._read_urls.clear()
         self.make_requirements_txt()
         self.make_constraints_txt()
-        return self
+        urls = {}
+        for url in self._read_urls:
+            copy = self._remote_copy(url)
+            if copy is None:
+                # Without a cached copy a remote file cannot be checked later
+                self.manifest.clear()
+                return
+            urls[url] = copy
+        self.manifest.store(key, inputs=self._read_files, urls=urls, outputs=outputs)
+
+    @cached_property
+    def installed_state(self) -> InstalledState:
+        return InstalledState(path=self.var_folder / "cache" / "dependencies.json")
+
+    def _installed_state_key(self) -> str | None:
+        """Summarize the requirements and the constraints being installed.
+
+        The manifest stands for all the files read to generate them.
+        Returns None when there is no manifest to rely on.
+        """
+        try:
+            digests = {
+                path.name: sha256(path.read_bytes()).hexdigest()
+                for path in (
+                    self.manifest.path,
+                    self.requirements_txt,
+                    self.constrainst_txt,
+                )
+            }
+        except FileNotFoundError:
+            return None
+        return cache_key(digests)
+
+    def check(self, sync: bool = False) -> bool:
+        """Tell if the virtualenv matches the requirements and the constraints.
+
+        Nothing is installed or written and nothing is downloaded:
+        the remote files are compared with their cached copies.
+        The differences are logged.
+        """
+        outputs = self._generated_files()
+        if not (self.target / ".venv" / "bin" / "activate").exists():
+            drift = ["there is no virtualenv"]
+        elif not self.manifest.is_fresh(
+            self._manifest_key(), outputs, self._cached_remote_copy
+        ):
+            drift = ["the requirements or the constraints changed"]
+        else:
+            drift = self.installed_state.drift(
+                self._installed_state_key(),
+                installed_distributions(self.virtualenv_dir),
+                sync,
+            )
+        if drift:
+            self.logger.warning("The virtualenv is out of date: %s", "; ".join(drift))
+            return False
+        self.logger.info("The virtualenv is up to date")
+        return True
 
     def _resolve_first_profile_root(self) -> Path | None:
         plonex_yml = self.target / "etc" / "plonex.yml"
@@ -604,52 +1082,6 @@ class InstallService(BaseService):
             return None
         return resolved
 
-    def _collect_profile_roots(
-        self,
-        profile: str | Path,
-        relative_to: Path,
-        seen: set[Path],
-    ) -> list[Path]:
-        from plonex.services.profile import ProfileService
-
-        resolved_profile = self._resolve_profile_source(profile, relative_to)
-        profile_service = ProfileService(source=resolved_profile, target=self.target)
-        profile_root = profile_service.source_path.resolve()
-
-        if profile_root in seen:
-            return []
-        seen.add(profile_root)
-
-        roots: list[Path] = []
-        profile_plonex_yml = profile_root / "etc" / "plonex.yml"
-        if profile_plonex_yml.exists():
-            raw_profile_options = self._load_yaml_mapping(profile_plonex_yml)
-            nested_profiles = self._normalize_profiles(
-                raw_profile_options.get("profiles"),
-                profile_plonex_yml,
-            )
-            for nested_profile in nested_profiles:
-                roots.extend(
-                    self._collect_profile_roots(nested_profile, profile_root, seen)
-                )
-
-        roots.append(profile_root)
-        return roots
-
-    @cached_property
-    def profile_roots(self) -> list[Path]:
-        plonex_yml = self.target / "etc" / "plonex.yml"
-        if not plonex_yml.exists():
-            return []
-
-        raw_local = self._load_yaml_mapping(plonex_yml)
-        raw_profiles = self._normalize_profiles(raw_local.get("profiles"), plonex_yml)
-        seen: set[Path] = set()
-        roots: list[Path] = []
-        for profile in raw_profiles:
-            roots.extend(self._collect_profile_roots(profile, self.target, seen))
-        return roots
-
     def _dependency_roots_by_precedence(self) -> list[Path]:
         roots = [self.target]
         roots.extend(reversed(self.profile_roots))
@@ -671,6 +1103,39 @@ class InstallService(BaseService):
                 folders.append(folder)
         return folders
 
+    def _missing_constraints(self) -> set[str]:
+        """Find the installed packages that are not constrained"""
+        self.logger.debug("Checking if all constraints are met")
+
+        _, merged_constraints = self._collect_constraint_entries(self.constrainst_txt)
+        constraints = list(merged_constraints.values())
+        installed = scan_distributions(
+            self.virtualenv_dir, workers=self.metadata_workers
+        )
+
+        constrained_names = {
+            key for req in constraints if (key := self._requirement_key(req))
+        }
+        constrained_dumps = {
+            self._normalize_requirement_dump(req) for req in constraints
+        }
+
+        missing: set[str] = set()
+        for requirement in installed:
+            requirement_dump = self._normalize_requirement_dump(requirement)
+            if requirement_dump.startswith("--editable"):
+                continue
+
+            requirement_key = self._requirement_key(requirement)
+            if requirement_key in self.freeze_excluded:
+                continue
+            if requirement_key and requirement_key in constrained_names:
+                continue
+            if requirement_dump in constrained_dumps:
+                continue
+            missing.add(requirement_dump)
+        return missing
+
     @BaseService.entered_only
     def run(
         self,
@@ -696,47 +1161,33 @@ class InstallService(BaseService):
         )
         if should_update_sources:
             self.update_gitman_sources()
+            # The updated sources might declare other dependencies
+            self.update_requirements_files()
 
-        if sync:
-            self.run_command(self.compile_command)
-            self.run_command(self.sync_command)
-        else:
-            super().run()
-        # Run pip freeze and compare the output with the constraints
-        # to see if we are missing something
-        self.logger.debug("Checking if all constraints are met")
-
-        _, merged_constraints = self._collect_constraint_entries(self.constrainst_txt)
-        constraints = list(merged_constraints.values())
-        installed = self.execute_command(
-            [str(self.virtualenv_dir / "bin" / "pip"), "freeze"]
+        state_key = self._installed_state_key()
+        drift = self.installed_state.drift(
+            state_key, installed_distributions(self.virtualenv_dir), sync
         )
-
-        # Save the installed packages to a temporary file
-        with open(self.tmp_folder / "installed.txt", "w") as file:  # type: ignore
-            file.write(installed)
-
-        installed = RequirementsFile.from_file(file.name).requirements
-
-        constrained_names = {
-            key for req in constraints if (key := self._requirement_key(req))
-        }
-        constrained_dumps = {
-            self._normalize_requirement_dump(req) for req in constraints
-        }
-
-        missing = set()
-        for requirement in installed:
-            requirement_dump = self._normalize_requirement_dump(requirement)
-            if requirement_dump.startswith("--editable"):
-                continue
-
-            requirement_key = self._requirement_key(requirement)
-            if requirement_key and requirement_key in constrained_names:
-                continue
-            if requirement_dump in constrained_dumps:
-                continue
-            missing.add(requirement_dump)
+        if not drift:
+            self.logger.info("The virtualenv is up to date, nothing to install")
+            missing = set(self.installed_state.missing)
+        else:
+            self.logger.debug("Installing the dependencies: %s", "; ".join(drift))
+            # An interrupted installation should not look successful
+            self.installed_state.clear()
+            if sync:
+                self.run_command(self.compile_command)
+                self.run_command(self.sync_command)
+            else:
+                super().run()
+            missing = self._missing_constraints()
+            if state_key is not None:
+                self.installed_state.store(
+                    state_key,
+                    installed_distributions(self.virtualenv_dir),
+                    missing,
+                    sync,
+                )
 
         if missing:
             if persist or persist_local or persist_profile:
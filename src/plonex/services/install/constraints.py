@@ -0,0 +1,150 @@
+from functools import lru_cache
+from pathlib import Path
+from pip_requirements_parser import RequirementsFile  # type: ignore
+from typing import Any
+from typing import Iterator
+from typing import NamedTuple
+
+import re
+
+
+# The lines handled without the full parser: a name with optional extras,
+# at most one version specifier and an optional environment marker,
+# which is what the Plone constraints files are made of
+SIMPLE_REQUIREMENT = re.compile(
+    r"""
+    ^(?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)
+    \s*(?:\[\s*(?P<extras>[A-Za-z0-9._-]+(?:\s*,\s*[A-Za-z0-9._-]+)*)\s*\])?
+    \s*(?P<specifier>(?:===|==|!=|~=|<=|>=|<|>)\s*[A-Za-z0-9.*+!_-]+)?
+    \s*(?:;\s*(?P<marker>[^;]+?))?\s*$
+    """,
+    re.VERBOSE,
+)
+INCLUDE_OPTION = re.compile(
+    r"^(?P<option>-c|--constraint|-r|--requirement)(?:\s*=\s*|\s+|(?<=-[cr]))"
+    r"(?P<reference>\S+)$"
+)
+INCLUDE_OPTION_NAMES = {
+    "-c": "constraints",
+    "--constraint": "constraints",
+    "-r": "requirements",
+    "--requirement": "requirements",
+}
+# Comments start at the beginning of a line or after a whitespace
+COMMENT = re.compile(r"(^|\s+)#.*$")
+
+
+class Constraint(NamedTuple):
+    """A requirement line of a constraints file.
+
+    It has the attributes of the requirements returned by the full parser
+    that are needed to merge constraints files.
+    """
+
+    name: str
+    marker: str | None
+    line: str
+
+    def dumps(self) -> str:
+        return self.line
+
+
+class ConstraintsFile(NamedTuple):
+    """The parsed content of a constraints file"""
+
+    requirements: list[Any]
+    # The included files as (option name, reference) tuples,
+    # where the option name is either "constraints" or "requirements"
+    includes: list[tuple[str, str]]
+
+
+@lru_cache(maxsize=None)
+def normalize_marker(marker: str) -> str:
+    """Format a marker like the full parser does (e.g. with double quotes)"""
+    from packaging.markers import Marker
+
+    return str(Marker(marker))
+
+
+def logical_lines(text: str) -> Iterator[str]:
+    """Yield the lines of a requirements file, joining continued lines
+    and removing the comments
+    """
+    continued = ""
+    for line in text.splitlines():
+        if line.endswith("\\"):
+            continued += line[:-1]
+            continue
+        line = COMMENT.sub("", continued + line).strip()
+        continued = ""
+        if line:
+            yield line
+    if continued:
+        line = COMMENT.sub("", continued).strip()
+        if line:
+            yield line
+
+
+def requirements_from_string(text: str) -> Any:
+    """Parse a requirements text with the full parser"""
+    import pip_requirements_parser
+
+    # Patch: See:
+    #
+    # - https://github.com/aboutcode-org/pip-requirements-parser/pull/25
+    pip_requirements_parser.Path = Path
+    return RequirementsFile.from_string(text)
+
+
+def parse_simple_line(line: str) -> Constraint | None:
+    """Parse a line without the full parser, returns None if it is not simple"""
+    match = SIMPLE_REQUIREMENT.match(line)
+    if match is None:
+        return None
+    name, extras, specifier, marker = match.group(
+        "name", "extras", "specifier", "marker"
+    )
+    dumped = name
+    if extras:
+        dumped += f"[{','.join(sorted(extra.strip() for extra in extras.split(',')))}]"
+    if specifier:
+        dumped += re.sub(r"\s+", "", specifier)
+    if marker:
+        marker = normalize_marker(marker)
+        dumped += f"; {marker}"
+    return Constraint(name=name, marker=marker, line=dumped)
+
+
+def parse_constraints(text: str) -> ConstraintsFile:
+    """Parse the requirements and the includes of a constraints file.
+
+    The lines are parsed one by one with regular expressions,
+    only the lines that are not simple enough (URLs, hashes, several
+    version specifiers, ...) are handed to the full parser.
+    Editable requirements and the other options are ignored,
+    because they do not constrain anything.
+    """
+    requirements: list[Any] = []
+    includes: list[tuple[str, str]] = []
+    for line in logical_lines(text):
+        if line.startswith("-"):
+            match = INCLUDE_OPTION.match(line)
+            if match is not None:
+                includes.append(
+                    (INCLUDE_OPTION_NAMES[match["option"]], match["reference"])
+                )
+            continue
+        constraint = parse_simple_line(line)
+        if constraint is not None:
+            requirements.append(constraint)
+            continue
+        requirements.extend(
+            requirement
+            for requirement in requirements_from_string(line).requirements
+            if requirement.name
+        )
+    return ConstraintsFile(requirements=requirements, includes=includes)
+
+
+def parse_constraints_file(path: str | Path) -> ConstraintsFile:
+    return parse_constraints(Path(path).read_text())
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import json
+
+
+# The metadata of a distribution is either in a .dist-info folder
+# or, for the packages installed by setuptools, in a .egg-info folder or file
+METADATA_PATTERNS = ("*.dist-info", "*.egg-info")
+
+
+def metadata_paths(
+    virtualenv_dir: Path, patterns: tuple[str, ...] = METADATA_PATTERNS
+) -> list[Path]:
+    """Return the metadata paths found in the virtualenv site-packages"""
+    return sorted(
+        path
+        for pattern in patterns
+        for path in virtualenv_dir.glob(f"lib/python*/site-packages/{pattern}")
+    )
+
+
+def installed_distributions(virtualenv_dir: Path) -> list[str]:
+    """List the metadata folders of the distributions installed in a virtualenv.
+
+    The folder names carry the distribution name and version,
+    so the list changes whenever something is installed, upgraded or removed.
+    Looking at the folders takes a few milliseconds, unlike running pip.
+    """
+    return [
+        str(path.relative_to(virtualenv_dir))
+        for path in metadata_paths(virtualenv_dir, (*METADATA_PATTERNS, "*.egg-link"))
+    ]
+
+
+@dataclass(kw_only=True, frozen=True)
+class InstalledDistribution:
+    """A distribution installed in a virtualenv.
+
+    It quacks like the requirements parsed from the output of `pip freeze`.
+    """
+
+    name: str
+    version: str
+    # The URL of a distribution installed from a VCS, an archive or a folder
+    url: str | None = None
+    is_editable: bool = False
+
+    def dumps(self) -> str:
+        """Return the line that `pip freeze` would print"""
+        if self.is_editable:
+            return f"--editable {self.url}"
+        if self.url:
+            return f"{self.name}@{self.url}"
+        return f"{self.name}=={self.version}"
+
+
+def _read_headers(path: Path) -> dict[str, str]:
+    """Read the Name and Version headers of a metadata file"""
+    headers: dict[str, str] = {}
+    with path.open(encoding="utf-8", errors="replace") as stream:
+        for line in stream:
+            if not line.strip():
+                # The headers end with the first empty line
+                break
+            key, _, value = line.partition(":")
+            if key in ("Name", "Version") and key not in headers:
+                headers[key] = value.strip()
+                if len(headers) == 2:
+                    break
+    return headers
+
+
+def _direct_url(path: Path) -> tuple[str | None, bool]:
+    """Return the URL of a direct_url.json file as `pip freeze` prints it
+    and whether the distribution is editable
+    """
+    try:
+        direct_url = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None, False
+    url = direct_url.get("url")
+    if not url:
+        return None, False
+    dir_info = direct_url.get("dir_info") or {}
+    if dir_info.get("editable"):
+        return url, True
+    if vcs_info := direct_url.get("vcs_info"):
+        url = f"{vcs_info.get('vcs')}+{url}@{vcs_info.get('commit_id')}"
+    elif archive_hash := (direct_url.get("archive_info") or {}).get("hash"):
+        url = f"{url}#{archive_hash}"
+    if subdirectory := direct_url.get("subdirectory"):
+        url = f"{url}#subdirectory={subdirectory}"
+    return url, False
+
+
+def read_distribution(path: Path) -> InstalledDistribution | None:
+    """Read a .dist-info or .egg-info metadata path.
+
+    Returns None if the metadata is missing or broken.
+    """
+    if path.is_file():
+        metadata = path
+    elif path.suffix == ".dist-info":
+        metadata = path / "METADATA"
+    else:
+        metadata = path / "PKG-INFO"
+    try:
+        headers = _read_headers(metadata)
+    except OSError:
+        return None
+    if not headers.get("Name") or not headers.get("Version"):
+        return None
+    url, is_editable = _direct_url(path / "direct_url.json")
+    return InstalledDistribution(
+        name=headers["Name"],
+        version=headers["Version"],
+        url=url,
+        is_editable=is_editable,
+    )
+
+
+def scan_distributions(
+    virtualenv_dir: Path, workers: int = 8
+) -> list[InstalledDistribution]:
+    """Read the metadata of the distributions installed in a virtualenv.
+
+    This is what `pip freeze` does, without starting pip.
+    The metadata files are read by a pool of threads.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        distributions = executor.map(read_distribution, metadata_paths(virtualenv_dir))
+        return [
+            distribution for distribution in distributions if distribution is not None
+        ]
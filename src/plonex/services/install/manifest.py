@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from pathlib import Path
+from plonex.options_cache import file_fingerprint
+from plonex.options_cache import fingerprint_matches
+from typing import Callable
+from typing import Iterable
+
+import json
+import os
+
+
+MANIFEST_FORMAT_VERSION = 1
+
+
+@dataclass(kw_only=True)
+class InputsManifest:
+    """Record the inputs used to generate some files.
+
+    The manifest stores a key summarizing the settings, a fingerprint
+    for every local file that was read, for every remote file
+    (through the file holding its cached copy) and for every generated file.
+    As long as none of them changed, the generated files are up to date.
+    """
+
+    path: Path
+
+    def is_fresh(
+        self,
+        key: str,
+        outputs: list[Path],
+        remote_copy: Callable[[str], Path | None],
+    ) -> bool:
+        """Tell if the outputs were generated from the current inputs.
+
+        The remote_copy callable returns the path of the up to date copy
+        of a remote file, or None if it cannot tell.
+        """
+        try:
+            entry = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return False
+        if not isinstance(entry, dict):
+            return False
+        if entry.get("version") != MANIFEST_FORMAT_VERSION or entry.get("key") != key:
+            return False
+        recorded_outputs = entry.get("outputs") or {}
+        if sorted(recorded_outputs) != sorted(str(path) for path in outputs):
+            return False
+        for path, fingerprint in {
+            **recorded_outputs,
+            **(entry.get("inputs") or {}),
+        }.items():
+            if not fingerprint_matches(Path(path), fingerprint):
+                return False
+        for url, fingerprint in (entry.get("urls") or {}).items():
+            copy = remote_copy(url)
+            if copy is None or not fingerprint_matches(copy, fingerprint):
+                return False
+        return True
+
+    def store(
+        self,
+        key: str,
+        inputs: Iterable[Path],
+        urls: dict[str, Path],
+        outputs: list[Path],
+    ) -> None:
+        """Record the inputs and the outputs of a generation"""
+        entry = {
+            "version": MANIFEST_FORMAT_VERSION,
+            "key": key,
+            "inputs": {
+                str(path): file_fingerprint(path) for path in sorted(set(inputs))
+            },
+            "urls": {url: file_fingerprint(copy) for url, copy in sorted(urls.items())},
+            "outputs": {str(path): file_fingerprint(path) for path in outputs},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entry, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,59 @@
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import TypeVar
+
+
+T = TypeVar("T")
+
+
+def stat_stamp(path: Path) -> tuple[int, int] | None:
+    """The modification time and size of a file, None if it does not exist"""
+    try:
+        stat = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ParseCache:
+    """Remember the values computed from some files during a run.
+
+    Each value is stored with the modification time and size of the files
+    it depends on and it is computed again as soon as one of them changed,
+    e.g. because plonex itself wrote it in the meantime.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Any, tuple[list[tuple[Path, Any]], Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        key: Any,
+        compute: Callable[[], T],
+        dependencies: Callable[[T], Iterable[Path]],
+    ) -> T:
+        """Return the value cached for key or compute it.
+
+        The dependencies callable returns the files the computed value
+        depends on, which are only known after parsing a file with includes.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            stamps, value = entry
+            if all(stat_stamp(path) == stamp for path, stamp in stamps):
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = compute()
+        self._entries[key] = (
+            [(path, stat_stamp(path)) for path in dependencies(value)],
+            value,
+        )
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
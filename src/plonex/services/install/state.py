@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+import json
+import os
+
+
+STATE_FORMAT_VERSION = 1
+
+
+@dataclass(kw_only=True)
+class InstalledState:
+    """Record what was installed in the virtualenv by the last successful run.
+
+    The state stores a key summarizing the requirements and the constraints,
+    the distributions found in the virtualenv after the installation,
+    the constraints that were found missing and if the virtualenv
+    was synchronized.
+    """
+
+    path: Path
+
+    def load(self) -> dict:
+        try:
+            entry = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not isinstance(entry, dict) or entry.get("version") != STATE_FORMAT_VERSION:
+            return {}
+        return entry
+
+    def drift(
+        self, key: str | None, distributions: list[str], sync: bool = False
+    ) -> list[str]:
+        """Describe how the virtualenv differs from the recorded state.
+
+        An empty list means that the virtualenv is up to date.
+        A synchronized virtualenv also satisfies a plain installation,
+        but not the other way around.
+        """
+        entry = self.load()
+        if not entry:
+            return ["no installation was recorded"]
+        reasons = []
+        if key is None or entry.get("key") != key:
+            reasons.append("the requirements or the constraints changed")
+        if sync and not entry.get("sync"):
+            reasons.append("the virtualenv was not synchronized")
+        recorded = set(entry.get("distributions") or [])
+        current = set(distributions)
+        for label, names in (
+            ("added", current - recorded),
+            ("removed", recorded - current),
+        ):
+            if names:
+                reasons.append(
+                    f"{label} distributions: "
+                    + ", ".join(sorted(Path(name).stem for name in names))
+                )
+        return reasons
+
+    @property
+    def missing(self) -> list[str]:
+        """The missing constraints found by the last successful run"""
+        return list(self.load().get("missing") or [])
+
+    def store(
+        self, key: str, distributions: list[str], missing: set[str], sync: bool
+    ) -> None:
+        """Record a successful installation"""
+        entry = {
+            "version": STATE_FORMAT_VERSION,
+            "key": key,
+            "sync": sync,
+            "distributions": distributions,
+            "missing": sorted(missing),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entry, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
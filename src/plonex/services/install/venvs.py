@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import os
+
+
+@dataclass(kw_only=True)
+class Virtualenvs:
+    """The virtualenvs built side by side in the .venvs folder of a project.
+
+    `.venv` is a symlink to the current one and `.venvs/previous`
+    a symlink to the one it replaced. Both symlinks are replaced atomically,
+    so a process starting `.venv/bin/...` always finds a complete virtualenv.
+    """
+
+    target: Path
+
+    @property
+    def link(self) -> Path:
+        return self.target / ".venv"
+
+    @property
+    def folder(self) -> Path:
+        return self.target / ".venvs"
+
+    @property
+    def previous_link(self) -> Path:
+        return self.folder / "previous"
+
+    def path_for(self, key: str) -> Path:
+        return self.folder / key
+
+    @staticmethod
+    def _destination(link: Path) -> Path | None:
+        if not link.is_symlink():
+            return None
+        return (link.parent / os.readlink(link)).resolve()
+
+    def current(self) -> Path | None:
+        """The virtualenv .venv points to, None if .venv is not a symlink"""
+        return self._destination(self.link)
+
+    def previous(self) -> Path | None:
+        """The virtualenv replaced by the last switch, if it still exists"""
+        previous = self._destination(self.previous_link)
+        if previous is None or not (previous / "bin" / "activate").exists():
+            return None
+        return previous
+
+    @staticmethod
+    def _tmp_link(link: Path, destination: Path) -> Path:
+        """A new symlink to destination, next to link"""
+        tmp_link = link.with_name(f"{link.name}.{os.getpid()}.tmp")
+        tmp_link.unlink(missing_ok=True)
+        tmp_link.symlink_to(os.path.relpath(destination, link.parent))
+        return tmp_link
+
+    @classmethod
+    def _replace_link(cls, link: Path, destination: Path) -> None:
+        """Point link to destination, replacing the existing link atomically"""
+        os.replace(cls._tmp_link(link, destination), link)
+
+    def adopt(self) -> Path | None:
+        """Move a .venv folder in .venvs and make .venv a symlink to it.
+
+        The scripts of the moved virtualenv keep working through the symlink,
+        because their shebangs use the .venv path.
+        A folder cannot be atomically replaced by a symlink, so .venv
+        is missing between the move and the replacement of the symlink,
+        which is ready before the move. If plonex is interrupted right then,
+        recover puts .venv back the next time.
+        """
+        self.recover()
+        if self.link.is_symlink() or not self.link.is_dir():
+            return None
+        self.folder.mkdir(parents=True, exist_ok=True)
+        destination = self.path_for(
+            f"adopted-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        )
+        tmp_link = self._tmp_link(self.link, destination)
+        self.link.rename(destination)
+        os.replace(tmp_link, self.link)
+        return destination
+
+    def recover(self) -> Path | None:
+        """Point a missing .venv to the last adopted virtualenv.
+
+        This only happens when plonex was interrupted while adopting
+        a .venv folder, see adopt.
+        """
+        if self.link.exists() or self.link.is_symlink():
+            return None
+        adopted = sorted(
+            path
+            for path in self.folder.glob("adopted-*")
+            if (path / "bin" / "activate").exists()
+        )
+        if not adopted:
+            return None
+        self._replace_link(self.link, adopted[-1])
+        return adopted[-1]
+
+    def switch(self, path: Path) -> None:
+        """Make .venv point to path and remember the current virtualenv"""
+        self.adopt()
+        current = self.current()
+        path = path.resolve()
+        if current == path:
+            return
+        self._replace_link(self.link, path)
+        if current is not None and current.exists():
+            self._replace_link(self.previous_link, current)
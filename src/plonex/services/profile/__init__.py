@@ -1,17 +1,45 @@
 from dataclasses import dataclass
+from dataclasses import field
 from functools import cached_property
+from hashlib import sha256
 from pathlib import Path
 from plonex.base import BaseService
+from typing import Callable
+from typing import ClassVar
 from urllib.parse import urlparse
 
+import copy
+import os
+import sh  # type: ignore[import-untyped]
+import shutil
+import time
+
+
+def default_cache_folder() -> Path:
+    """Return the folder where the remote profiles are cached"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "plonex" / "profiles"
+
 
 @dataclass(kw_only=True)
 class ProfileService(BaseService):
-    """Resolve a local or remote profile folder."""
+    """Resolve a local or remote profile folder.
+
+    Remote profiles are cloned once in a cache folder shared by all
+    the projects and fetched again only when the clone is older than
+    `cache_ttl` seconds or when a refresh is requested.
+    A remote source can pin a branch or a tag with a `#ref` suffix.
+    """
 
     name: str = "profile"
     source: Path | str
 
+    cache_folder: ClassVar[Path | None] = None
+    cache_ttl: ClassVar[float] = 3600
+    refresh: ClassVar[bool] = False
+    # Profiles already fetched by this process when refresh is requested
+    _refreshed: ClassVar[set[Path]] = set()
+
     @property
     def is_remote_source(self) -> bool:
         if isinstance(self.source, Path):
@@ -25,6 +53,29 @@ class ProfileService(BaseService):
             "ssh",
         } or self.source.startswith("git@")
 
+    @property
+    def remote_url(self) -> str:
+        return str(self.source).partition("#")[0]
+
+    @property
+    def remote_ref(self) -> str | None:
+        return str(self.source).partition("#")[2] or None
+
+    @cached_property
+    def cache_path(self) -> Path:
+        """The folder holding the clone of a remote profile.
+
+        The name is derived from the URL and the ref,
+        so different refs of the same repository do not clash.
+        """
+        cache_folder = self.cache_folder or default_cache_folder()
+        key = sha256(f"{self.remote_url}#{self.remote_ref or ''}".encode())
+        return cache_folder / key.hexdigest()[:16]
+
+    @property
+    def fetched_marker(self) -> Path:
+        return self.cache_path.with_name(f"{self.cache_path.name}.fetched")
+
     def _resolve_local_source(self) -> Path:
         source_path = Path(self.source).expanduser().absolute()
         if not source_path.exists():
@@ -33,16 +84,158 @@ class ProfileService(BaseService):
             raise ValueError(f"Profile {source_path} is not a directory")
         return source_path
 
-    def _clone_remote_source(self) -> Path:
-        clone_target = self.mkdtemp()
+    def _is_stale(self) -> bool:
+        if self.refresh:
+            return self.cache_path not in self._refreshed
+        try:
+            fetched = self.fetched_marker.stat().st_mtime
+        except FileNotFoundError:
+            return True
+        return time.time() - fetched > self.cache_ttl
+
+    def _mark_fetched(self) -> None:
+        self.fetched_marker.write_text(f"{self.source}\n")
+        if self.refresh:
+            self._refreshed.add(self.cache_path)
+
+    def _clone(self) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        clone_target = self.mkdtemp(dir=self.cache_path.parent)
+        command = ["git", "clone", "--depth", "1"]
+        if self.remote_ref:
+            command += ["--branch", self.remote_ref]
         self.logger.info("Cloning profile %s", self.source)
-        self.execute_command(
-            ["git", "clone", "--depth", "1", str(self.source), clone_target]
-        )
-        return clone_target
+        try:
+            self.execute_command([*command, self.remote_url, clone_target])
+            # Another process might have cloned the profile in the meantime
+            if not self.cache_path.exists():
+                os.replace(clone_target, self.cache_path)
+        finally:
+            shutil.rmtree(clone_target, ignore_errors=True)
+        self._mark_fetched()
+
+    def _fetch(self) -> None:
+        self.logger.info("Updating profile %s", self.source)
+        try:
+            self.execute_command(
+                [
+                    "git",
+                    "fetch",
+                    "--depth",
+                    "1",
+                    "origin",
+                    self.remote_ref or "HEAD",
+                ],
+                cwd=self.cache_path,
+            )
+            self.execute_command(
+                ["git", "reset", "--hard", "FETCH_HEAD"],
+                cwd=self.cache_path,
+            )
+        except sh.ErrorReturnCode as exc:
+            self.logger.warning(
+                "Could not update profile %s, using the cached copy: %s",
+                self.source,
+                exc,
+            )
+            return
+        self._mark_fetched()
+
+    def _clone_remote_source(self) -> Path:
+        """Return the cached clone of the remote profile.
+
+        The clone is created or updated as needed,
+        in offline mode the cached copy is always used as is.
+        """
+        if not self.cache_path.exists():
+            if self.offline:
+                raise FileNotFoundError(
+                    f"Profile {self.source} is not cached and plonex is offline"
+                )
+            self._clone()
+        elif not self.offline and self._is_stale():
+            self._fetch()
+        return self.cache_path
 
     @cached_property
     def source_path(self) -> Path:
         if self.is_remote_source:
             return self._clone_remote_source()
         return self._resolve_local_source()
+
+
+@dataclass(kw_only=True)
+class ProfileNode:
+    """A profile folder and the options read from its etc/plonex.yml file"""
+
+    source: Path | str
+    root: Path
+    remote: bool = False
+    options: dict = field(default_factory=dict)
+    profiles: list[Path] = field(default_factory=list)
+
+
+@dataclass(kw_only=True)
+class ProfileGraph:
+    """The profiles of a project, each one loaded once.
+
+    Nodes are keyed by the resolved profile root, so a profile reachable
+    through several paths (or through a cycle) is read only once.
+    The profiles attribute lists the roots of the profiles declared
+    in the project etc/plonex.yml, in declaration order.
+    """
+
+    profiles: list[Path] = field(default_factory=list)
+    nodes: dict[Path, ProfileNode] = field(default_factory=dict)
+
+    @property
+    def remote(self) -> bool:
+        return any(node.remote for node in self.nodes.values())
+
+    @property
+    def roots(self) -> list[Path]:
+        """The profile roots from the lowest to the highest precedence.
+
+        Nested profiles come before the profile that declares them.
+        """
+        roots: list[Path] = []
+        seen: set[Path] = set()
+
+        def visit(root: Path) -> None:
+            if root in seen:
+                return
+            seen.add(root)
+            for nested in self.nodes[root].profiles:
+                visit(nested)
+            roots.append(root)
+
+        for root in self.profiles:
+            visit(root)
+        return roots
+
+    def _merged_node_options(
+        self,
+        root: Path,
+        merge: Callable[[dict, dict], dict],
+        seen: set[Path],
+    ) -> dict:
+        if root in seen:
+            return {}
+        seen.add(root)
+        node = self.nodes[root]
+        options: dict = {}
+        for nested in node.profiles:
+            options = merge(options, self._merged_node_options(nested, merge, seen))
+        # The merge function may extend the lists and dicts it receives
+        return merge(options, copy.deepcopy(node.options))
+
+    def merged_options(self, merge: Callable[[dict, dict], dict]) -> dict:
+        """Merge the options of the profiles with the given merge function.
+
+        Each profile declared by the project is merged on top of the previous
+        ones after its own nested profiles.
+        """
+        merged: dict = {}
+        for root in self.profiles:
+            merged = merge(merged, self._merged_node_options(root, merge, set()))
+        return merged
@@ -1,16 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from dataclasses import field
 from fnmatch import fnmatch
+from functools import cached_property
+from functools import partial
 from pathlib import Path
+from plonex import yaml_io
 from plonex.base import BaseService
+from plonex.services.sources.git import GitCheckout
+from plonex.services.sources.reference import ReferenceCache
+from plonex.services.sources.status import CheckoutStatus
+from plonex.services.sources.status import collect_status
+from plonex.services.sources.status import StatusIndex
+from plonex.timings import in_current_context
 from rich.console import Console
 from rich.table import Table
 from typing import Any
+from typing import Callable
+from typing import ClassVar
+from typing import Iterable
 from typing import Sequence
 
 import logging
+import re
 import sh  # type: ignore[import-untyped]
-import yaml
 
 
 @dataclass(kw_only=True)
@@ -20,6 +33,9 @@ class SourcesService(BaseService):
     name: str = "sources"
     assume_yes: bool = False
 
+    # Number of checkouts inspected at the same time
+    status_workers: ClassVar[int] = 8
+
     var_folder: Path = field(init=False)
     gitman_file: Path = field(init=False)
 
@@ -119,21 +135,35 @@ class SourcesService(BaseService):
         executable = str(gitman_bin) if gitman_bin.exists() else "gitman"
         return [executable]
 
-    def compile_config(self, sources_dict: dict[str, Any] | None = None) -> Path | None:
+    def compile_config(
+        self,
+        sources_dict: dict[str, Any] | None = None,
+        gitman_file: Path | None = None,
+    ) -> Path | None:
         """Compile gitman config from sources dict.
 
         Args:
             sources_dict: Sources dict to compile. If None, uses self.sources_options.
+            gitman_file: Where to write the config. If None, uses self.gitman_file.
         """
         options = self._get_compiled_gitman_options(sources_dict)
         if options is None:
             return None
         if not self._validate_sources_for_gitman(sources_dict):
             return None
-        self.gitman_file.write_text(
-            yaml.dump(options, sort_keys=True), encoding="utf-8"
-        )
-        return self.gitman_file
+        gitman_file = gitman_file or self.gitman_file
+        gitman_file.parent.mkdir(parents=True, exist_ok=True)
+        gitman_file.write_text(yaml_io.dump(options, sort_keys=True), encoding="utf-8")
+        return gitman_file
+
+    def _source_gitman_file(self, source_name: str) -> Path:
+        """The gitman config of a source updated alongside the other ones.
+
+        gitman reads the gitman.yml file of its working directory,
+        so each source gets its own folder.
+        """
+        folder_name = re.sub(r"[^\w.-]", "_", source_name)
+        return self.var_folder / "gitman" / folder_name / "gitman.yml"
 
     def _normalize_glob(self, glob_pattern: str | None) -> str | None:
         """Normalize glob pattern: if no * is present, add * at beginning and end.
@@ -214,56 +244,57 @@ class SourcesService(BaseService):
         managed = set(self.configured_checkouts().values())
         return [path for path in self.existing_checkouts() if path not in managed]
 
-    def _git_remote_url(self, checkout: Path) -> str | None:
-        try:
-            result = self.execute_command(
-                ["git", "-C", str(checkout), "remote", "get-url", "origin"]
-            ).strip()
-        except sh.ErrorReturnCode:
-            return None
-        return result or None
+    def checkout_status(self, checkout: Path) -> CheckoutStatus:
+        return collect_status(checkout, self.execute_command)
 
-    def _git_revision(self, checkout: Path) -> str | None:
-        try:
-            branch = self.execute_command(
-                ["git", "-C", str(checkout), "branch", "--show-current"]
-            ).strip()
-            if branch:
-                return branch
-            commit = self.execute_command(
-                ["git", "-C", str(checkout), "rev-parse", "HEAD"]
-            ).strip()
-            return commit or None
-        except sh.ErrorReturnCode:
-            return None
+    @property
+    def status_index(self) -> StatusIndex:
+        return StatusIndex(path=self.var_folder / "cache" / "sources-status.json")
 
-    def _git_current_branch(self, checkout: Path) -> str | None:
-        try:
-            branch = self.execute_command(
-                ["git", "-C", str(checkout), "branch", "--show-current"]
-            ).strip()
-        except sh.ErrorReturnCode:
-            return None
-        return branch or None
+    def checkout_statuses(
+        self,
+        checkouts: Iterable[Path],
+        cached: bool = False,
+        refresh: bool = False,
+    ) -> dict[Path, CheckoutStatus]:
+        """Collect the status of the checkouts concurrently.
 
-    def _has_modifications(self, checkout: Path) -> bool:
-        try:
-            status = self.execute_command(
-                ["git", "-C", str(checkout), "status", "--porcelain"]
-            ).strip()
-        except sh.ErrorReturnCode:
-            return False
-        return bool(status)
+        Args:
+            cached: Reuse the statuses of the checkouts that did not change
+                since they were stored in the status index.
+            refresh: Collect all the statuses again and update the index.
+        """
+        checkouts = list(dict.fromkeys(checkouts))
+        index = self.status_index if cached else None
+        statuses: dict[Path, CheckoutStatus] = {}
+        if index is not None and not refresh:
+            for checkout in checkouts:
+                status = index.get(checkout)
+                if status is not None:
+                    statuses[checkout] = status
+        pending = [checkout for checkout in checkouts if checkout not in statuses]
+        if len(pending) == 1:
+            statuses[pending[0]] = self.checkout_status(pending[0])
+        elif pending:
+            checkout_status = in_current_context(self.checkout_status)
+            with ThreadPoolExecutor(max_workers=self.status_workers) as executor:
+                statuses.update(zip(pending, executor.map(checkout_status, pending)))
+        if index is not None and pending:
+            for checkout in pending:
+                index.put(statuses[checkout])
+            index.save()
+        return {checkout: statuses[checkout] for checkout in checkouts}
 
     def suggested_sources_mapping(self) -> dict[str, Any]:
         suggestions: dict[str, Any] = {}
-        for checkout in self.unmanaged_existing_checkouts():
+        statuses = self.checkout_statuses(self.unmanaged_existing_checkouts())
+        for checkout, status in statuses.items():
             source_name = checkout.name
             source_options: dict[str, Any] = {}
-            repo = self._git_remote_url(checkout)
+            repo = status.remote_url
             if repo:
                 source_options["repo"] = repo
-            rev = self._git_revision(checkout)
+            rev = status.revision
             if rev:
                 source_options["rev"] = rev
             relative = checkout.relative_to(self.checkout_root).as_posix()
@@ -280,7 +311,7 @@ class SourcesService(BaseService):
         location = self.checkout_root.relative_to(self.target).as_posix()
         if location != "src":
             payload["sources_location"] = location
-        return yaml.dump(payload, sort_keys=True)
+        return yaml_io.dump(payload, sort_keys=True)
 
     def _apply_suggestions(self, destination: Path) -> bool:
         suggestions = self.suggested_sources_mapping()
@@ -291,7 +322,7 @@ class SourcesService(BaseService):
         destination.parent.mkdir(parents=True, exist_ok=True)
         existing_payload: Any = {}
         if destination.exists():
-            existing_payload = yaml.safe_load(destination.read_text()) or {}
+            existing_payload = yaml_io.safe_load(destination.read_text()) or {}
 
         if not isinstance(existing_payload, dict):
             self.logger.error("Cannot update %r: expected a YAML mapping", destination)
@@ -308,7 +339,7 @@ class SourcesService(BaseService):
             existing_payload.setdefault("sources_location", sources_location)
 
         destination.write_text(
-            yaml.dump(
+            yaml_io.dump(
                 existing_payload,
                 sort_keys=False,
                 default_flow_style=False,
@@ -333,21 +364,16 @@ class SourcesService(BaseService):
 
     def list_tainted(self, glob: str | None = None) -> list[Path]:
         tainted: list[Path] = []
-        sources = self._filter_sources(self.sources, glob)
-        for source_name, source_options in sources.items():
-            checkout = self._checkout_path(str(source_name), source_options)
-            if not checkout.exists():
-                continue
-            if not (checkout / ".git").exists():
-                continue
-            try:
-                status = self.execute_command(
-                    ["git", "-C", str(checkout), "status", "--porcelain"]
-                ).strip()
-            except sh.ErrorReturnCode:
+        checkouts = [
+            checkout
+            for checkout in self.configured_checkouts(glob).values()
+            if (checkout / ".git").exists()
+        ]
+        for checkout, status in self.checkout_statuses(checkouts).items():
+            if status.error:
                 self.logger.warning("Unable to inspect checkout %r", checkout)
                 continue
-            if status:
+            if status.modified:
                 tainted.append(checkout)
         return tainted
 
@@ -369,50 +395,154 @@ class SourcesService(BaseService):
         if checkout.exists() and not (checkout / ".git").exists():
             return f"{self._display_path(checkout)} exists but is not a git checkout"
         if (
-            (checkout / ".git").exists()
-            and self._has_modifications(checkout)
-            and not force
+            not force
+            and (checkout / ".git").exists()
+            and self.checkout_status(checkout).modified
         ):
             return "local changes detected (use force-update to override)"
         return None
 
     @staticmethod
-    def _error_reason(exc: sh.ErrorReturnCode) -> str:
-        stderr = str(getattr(exc, "stderr", "") or "").strip()
-        stdout = str(getattr(exc, "stdout", "") or "").strip()
+    def _error_reason(exc: sh.ErrorReturnCode, tool: str = "gitman") -> str:
+        def as_text(output: Any) -> str:
+            if isinstance(output, bytes):
+                return output.decode(errors="replace").strip()
+            return str(output or "").strip()
+
+        stderr = as_text(getattr(exc, "stderr", ""))
+        stdout = as_text(getattr(exc, "stdout", ""))
         combined = stderr or stdout
         if not combined:
-            return f"gitman failed with exit code {exc.exit_code}"
+            return f"{tool} failed with exit code {exc.exit_code}"
         for line in combined.splitlines():
             clean = line.strip()
             if clean:
                 return clean
-        return f"gitman failed with exit code {exc.exit_code}"
+        return f"{tool} failed with exit code {exc.exit_code}"
 
     def _run_gitman_update_once(
         self,
         command: Sequence[str],
         source_name: str,
         source_options: Any,
+        gitman_file: Path | None = None,
     ) -> tuple[bool, str]:
-        compiled = self.compile_config(sources_dict={source_name: source_options})
+        compiled = self.compile_config(
+            sources_dict={source_name: source_options}, gitman_file=gitman_file
+        )
         if compiled is None:
             return False, "invalid source configuration"
         try:
-            self.execute_command(
-                command, cwd=self.gitman_file.parent, stream_output=False
-            )
+            self.execute_command(command, cwd=compiled.parent, stream_output=False)
         except sh.ErrorReturnCode as exc:
             return False, self._error_reason(exc)
         return True, "updated"
 
+    def _run_git_update_once(
+        self,
+        source_name: str,
+        source_options: dict[str, Any],
+        force: bool,
+    ) -> tuple[bool, str]:
+        rev = source_options.get("rev", "main")
+        path = self._checkout_path(source_name, source_options)
+        repo = source_options["repo"]
+        # Only a new clone uses the mirror, do not refresh it otherwise
+        reference = None if (path / ".git").exists() else self._reference_for(repo)
+        checkout = GitCheckout(
+            path=path,
+            repo=repo,
+            rev=rev if isinstance(rev, str) and rev.strip() else "main",
+            execute=self.execute_command,
+            reference=reference,
+        )
+        try:
+            return True, checkout.update(force=force)
+        except sh.ErrorReturnCode as exc:
+            return False, self._error_reason(exc, tool="git")
+
+    def _update_source(
+        self,
+        command: Sequence[str],
+        source_name: str,
+        source_options: Any,
+        force: bool,
+        gitman_file: Path | None = None,
+    ) -> tuple[bool, str]:
+        blocker = self._source_update_blocker(source_name, source_options, force)
+        if blocker is not None:
+            return False, blocker
+        if self.update_engine == "git" and source_options.get("type", "git") == "git":
+            return self._run_git_update_once(source_name, source_options, force)
+        return self._run_gitman_update_once(
+            command, source_name, source_options, gitman_file=gitman_file
+        )
+
+    @cached_property
+    def update_engine(self) -> str:
+        """Update the sources with gitman (the default) or by running git"""
+        engine = self.options.get("sources_engine") or "gitman"
+        if engine not in ("gitman", "git"):
+            self.logger.warning(
+                "Unknown sources_engine %r, updating the sources with gitman", engine
+            )
+            return "gitman"
+        return engine
+
+    @cached_property
+    def reference_cache(self) -> ReferenceCache | None:
+        """The shared mirrors the new checkouts borrow their objects from.
+
+        Set the `sources_reference_cache` option to a folder shared
+        by the projects on the same host to enable it.
+        """
+        folder = self.options.get("sources_reference_cache")
+        if not folder:
+            return None
+        path = Path(folder).expanduser()
+        if not path.is_absolute():
+            path = self.target / path
+        return ReferenceCache(folder=path, execute=self.execute_command)
+
+    def _reference_for(self, repo: str) -> Path | None:
+        """Create or refresh the mirror of repo, None if there is none to use"""
+        if self.reference_cache is None:
+            return None
+        mirror = self.reference_cache.ensure(repo)
+        if mirror is None:
+            self.logger.warning(
+                "Cannot mirror %r in %s, cloning without reference",
+                repo,
+                self.reference_cache.folder,
+            )
+        return mirror
+
+    @property
+    def update_jobs(self) -> int:
+        """How many sources are updated at the same time by default"""
+        try:
+            return max(1, int(self.options.get("sources_update_jobs") or 1))
+        except (TypeError, ValueError):
+            self.logger.warning(
+                "Invalid sources_update_jobs %r, updating one source at a time",
+                self.options.get("sources_update_jobs"),
+            )
+            return 1
+
     @BaseService.entered_only
     def run_update(
         self,
         force: bool = False,
         assume_yes: bool | None = None,
         glob: str | None = None,
+        jobs: int | None = None,
     ) -> None:
+        """Update the sources with gitman, one source per gitman run.
+
+        With more than one job, the sources are updated concurrently,
+        each one with its own gitman config, and the report is still
+        printed in the order of the source names.
+        """
         if not self.has_sources:
             self.logger.info("Skipping sources update: no sources configured")
             return
@@ -448,27 +578,48 @@ class SourcesService(BaseService):
         if show_live_report:
             self.print("[bold]Sources update report[/bold]")
 
-        for source_name, source_options in sorted(filtered_sources.items()):
-            if show_live_report:
-                self.print(f"[cyan]⏳[/cyan] {source_name}: updating...")
-            blocker = self._source_update_blocker(
-                str(source_name), source_options, force
-            )
-            if blocker is not None:
-                results.append((str(source_name), False, blocker))
+        jobs = max(1, jobs or self.update_jobs)
+        sorted_sources = [
+            (str(source_name), source_options)
+            for source_name, source_options in sorted(filtered_sources.items())
+        ]
+        executor = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        updates: list[Callable[[], tuple[bool, str]]]
+        try:
+            if executor is None:
+                updates = [
+                    partial(
+                        self._update_source, command, source_name, source_options, force
+                    )
+                    for source_name, source_options in sorted_sources
+                ]
+            else:
+                update_source = in_current_context(self._update_source)
+                updates = [
+                    executor.submit(
+                        update_source,
+                        command,
+                        source_name,
+                        source_options,
+                        force,
+                        # Concurrent gitman runs must not share the config file
+                        self._source_gitman_file(source_name),
+                    ).result
+                    for source_name, source_options in sorted_sources
+                ]
+            for (source_name, _), update in zip(sorted_sources, updates):
                 if show_live_report:
-                    self.print(f"[red]❌[/red] {source_name}: {blocker}")
-                continue
-            ok, reason = self._run_gitman_update_once(
-                command,
-                str(source_name),
-                source_options,
-            )
-            results.append((str(source_name), ok, reason))
-            if show_live_report:
-                glyph = "✅" if ok else "❌"
-                style = "green" if ok else "red"
-                self.print(f"[{style}]{glyph}[/{style}] {source_name}: {reason}")
+                    self.print(f"[cyan]⏳[/cyan] {source_name}: updating...")
+                ok, reason = update()
+                results.append((source_name, ok, reason))
+                if show_live_report:
+                    glyph = "✅" if ok else "❌"
+                    style = "green" if ok else "red"
+                    self.print(f"[{style}]{glyph}[/{style}] {source_name}: {reason}")
+        finally:
+            if executor is not None:
+                # After an interrupt or an error, do not start the pending updates
+                executor.shutdown(cancel_futures=True)
 
         if not results:
             self.print("No sources to update.")
@@ -480,9 +631,13 @@ class SourcesService(BaseService):
                 "Sources update completed with %d failure(s)",
                 len(failed),
             )
+            if show_live_report and len(results) > 1:
+                self.print("[bold]Failed sources[/bold]")
+                for source_name, _, reason in failed:
+                    self.print(f"[red]❌[/red] {source_name}: {reason}")
 
     @BaseService.entered_only
-    def run_list(self, glob: str | None = None) -> None:
+    def run_list(self, glob: str | None = None, refresh: bool = False) -> None:
         checkouts = self.configured_checkouts(glob)
         if not checkouts:
             self.print("No configured sources checkouts.")
@@ -496,6 +651,9 @@ class SourcesService(BaseService):
         table.add_column("Health", justify="center", no_wrap=True)
         table.add_column("Details")
 
+        statuses = self.checkout_statuses(
+            checkouts.values(), cached=True, refresh=refresh
+        )
         for source_name, path in sorted(checkouts.items()):
             source_options = self.sources.get(source_name)
             configured_repo = None
@@ -504,22 +662,23 @@ class SourcesService(BaseService):
                 configured_repo = source_options.get("repo")
                 configured_rev = source_options.get("rev")
 
+            status = statuses[path]
             detected_repo = None
             details: list[str] = []
             severity = 0  # 0=ok, 1=warning, 2=error
             health_badge = "[bold green]✓[/bold green]"
-            if not path.exists():
+            if not status.exists:
                 health_badge = "[bold red]✗[/bold red]"
                 details.append("missing")
                 severity = 2
-            elif not (path / ".git").exists():
+            elif not status.is_git:
                 health_badge = "[bold yellow]⚠[/bold yellow]"
                 details.append("not-git")
                 severity = 1
             else:
-                detected_repo = self._git_remote_url(path)
-                branch = self._git_current_branch(path)
-                if self._has_modifications(path):
+                detected_repo = status.remote_url
+                branch = status.branch
+                if status.modified:
                     health_badge = "[bold yellow]⚠[/bold yellow]"
                     details.append("modified")
                     severity = max(severity, 1)
@@ -536,6 +695,10 @@ class SourcesService(BaseService):
                 else:
                     details.append("[yellow]detached[/yellow]")
                     severity = max(severity, 1)
+                if status.ahead:
+                    details.append(f"[dim]ahead:{status.ahead}[/dim]")
+                if status.behind:
+                    details.append(f"[dim]behind:{status.behind}[/dim]")
 
                 if (
                     isinstance(configured_repo, str)
@@ -617,7 +780,13 @@ class SourcesService(BaseService):
             destination = self._checkout_path(source_name, source_options)
             destination.parent.mkdir(parents=True, exist_ok=True)
             self.logger.info("Cloning %r into %r", source_name, destination)
-            self.run_command(["git", "clone", repo, str(destination)])
+            reference = self._reference_for(repo)
+            reference_options = (
+                ["--reference-if-able", str(reference)] if reference else []
+            )
+            self.run_command(
+                ["git", "clone", *reference_options, repo, str(destination)]
+            )
             rev = source_options.get("rev")
             if isinstance(rev, str) and rev.strip():
                 self.run_command(["git", "-C", str(destination), "checkout", rev])
@@ -672,7 +841,7 @@ class SourcesService(BaseService):
                     "No etc/plonex.yml found; cannot determine a profile to write to"
                 )
                 return
-            raw_local = yaml.safe_load(plonex_yml.read_text()) or {}
+            raw_local = yaml_io.load_file(plonex_yml) or {}
             raw_profiles = raw_local.get("profiles") or []
             if isinstance(raw_profiles, str):
                 raw_profiles = [raw_profiles]
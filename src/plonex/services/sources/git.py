@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import re
+import sh  # type: ignore[import-untyped]
+
+
+# An abbreviated or full commit hash
+COMMIT = re.compile(r"^[0-9a-f]{7,40}$")
+
+
+@dataclass(kw_only=True)
+class GitCheckout:
+    """Clone or update a source checkout by running git directly.
+
+    New checkouts are partial clones (`--filter=blob:none`), so the file
+    contents are only downloaded for the revisions that are checked out.
+    With a reference mirror (see ReferenceCache) the clone borrows its objects
+    instead and it is a full clone, because the objects are already local.
+    An update fetches only the configured revision and does not touch
+    the network when the checkout is already at the pinned commit.
+    """
+
+    path: Path
+    repo: str
+    rev: str
+    # BaseService.execute_command or a compatible callable
+    execute: Callable[..., str]
+    # A bare mirror of the repository to borrow the objects from
+    reference: Path | None = None
+
+    @property
+    def pinned(self) -> bool:
+        """True if the revision is a commit hash rather than a branch or a tag"""
+        return bool(COMMIT.match(self.rev))
+
+    def git(self, *args: str) -> str:
+        return self.execute(
+            ["git", "-C", str(self.path), *args], stream_output=False
+        ).strip()
+
+    def _succeeds(self, *args: str) -> bool:
+        try:
+            self.git(*args)
+        except sh.ErrorReturnCode:
+            return False
+        return True
+
+    def head(self) -> str | None:
+        try:
+            return self.git("rev-parse", "HEAD") or None
+        except sh.ErrorReturnCode:
+            return None
+
+    def _clone_options(self) -> list[str]:
+        if self.reference is None:
+            return ["--filter=blob:none"]
+        return ["--reference-if-able", str(self.reference)]
+
+    def clone(self) -> str:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.pinned:
+            self.execute(
+                [
+                    "git",
+                    "clone",
+                    *self._clone_options(),
+                    "--no-checkout",
+                    self.repo,
+                    str(self.path),
+                ],
+                stream_output=False,
+            )
+            self._checkout_commit(force=False)
+        else:
+            self.execute(
+                [
+                    "git",
+                    "clone",
+                    *self._clone_options(),
+                    "--branch",
+                    self.rev,
+                    self.repo,
+                    str(self.path),
+                ],
+                stream_output=False,
+            )
+        return "cloned"
+
+    def _checkout_commit(self, force: bool) -> None:
+        if not self._succeeds("cat-file", "-e", f"{self.rev}^{{commit}}"):
+            self.git("fetch", "origin", self.rev)
+        self.git("checkout", *(["--force"] if force else []), "--detach", self.rev)
+
+    def update(self, force: bool = False) -> str:
+        """Bring the checkout to the configured revision and describe what was done.
+
+        Raises sh.ErrorReturnCode when a git command fails.
+        """
+        if not (self.path / ".git").exists():
+            return self.clone()
+        force_option = ["--force"] if force else []
+        if self.pinned:
+            head = self.head()
+            if head is not None and head.startswith(self.rev):
+                return f"already at {self.rev}"
+            self._checkout_commit(force)
+            return "updated"
+        # A partial clone applies its filter to the fetch by itself
+        self.git("fetch", "origin", self.rev)
+        if self._succeeds(
+            "show-ref", "--verify", "--quiet", f"refs/remotes/origin/{self.rev}"
+        ):
+            self.git("checkout", *force_option, self.rev)
+            if force:
+                self.git("reset", "--hard", "FETCH_HEAD")
+            else:
+                self.git("merge", "--ff-only", "FETCH_HEAD")
+        else:
+            # A tag
+            self.git("checkout", *force_option, "--detach", "FETCH_HEAD")
+        return "updated"
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from threading import Lock
+from typing import Callable
+
+import hashlib
+import re
+import sh  # type: ignore[import-untyped]
+import shutil
+import tempfile
+
+
+@dataclass(kw_only=True)
+class ReferenceCache:
+    """Bare mirrors of the source repositories shared by several projects.
+
+    The checkouts are cloned with `--reference-if-able`, so they borrow
+    the objects of the mirror through the git alternates mechanism
+    and only download what the mirror does not have yet.
+    The mirrors are never pruned or garbage collected by plonex,
+    because the checkouts depend on their objects.
+    """
+
+    folder: Path
+    # BaseService.execute_command or a compatible callable
+    execute: Callable[..., str]
+    # One lock per mirror, for the sources of this process sharing a repository
+    _locks: dict[Path, Lock] = field(default_factory=dict, init=False, repr=False)
+    _locks_lock: Lock = field(default_factory=Lock, init=False, repr=False)
+
+    def mirror_path(self, repo: str) -> Path:
+        """A folder name that is readable and unique for each repository URL"""
+        name = re.sub(r"\.git$", "", repo.rstrip("/")).rsplit("/", 1)[-1]
+        name = re.sub(r"[^\w.-]", "_", name.rsplit(":", 1)[-1]) or "repo"
+        digest = hashlib.sha256(repo.encode()).hexdigest()[:12]
+        return self.folder / f"{name}-{digest}.git"
+
+    def _create(self, repo: str, mirror: Path) -> None:
+        # Clone next to the final folder, so that a concurrent clone
+        # of the same repository never sees a partial mirror
+        tmp_mirror = Path(
+            tempfile.mkdtemp(dir=self.folder, prefix=f"{mirror.name}.", suffix=".tmp")
+        )
+        try:
+            self.execute(
+                ["git", "clone", "--mirror", "--quiet", repo, str(tmp_mirror)],
+                stream_output=False,
+            )
+            self.execute(
+                ["git", "--git-dir", str(tmp_mirror), "config", "gc.auto", "0"],
+                stream_output=False,
+            )
+            try:
+                tmp_mirror.rename(mirror)
+            except OSError:
+                # Another process created the mirror in the meantime
+                if not mirror.exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp_mirror, ignore_errors=True)
+
+    def ensure(self, repo: str) -> Path | None:
+        """Create or update the mirror of a repository.
+
+        Returns None if the mirror cannot be used, the clone then works
+        as if there was no reference cache.
+        """
+        mirror = self.mirror_path(repo)
+        with self._locks_lock:
+            lock = self._locks.setdefault(mirror, Lock())
+        with lock:
+            try:
+                if mirror.exists():
+                    self.execute(
+                        ["git", "--git-dir", str(mirror), "fetch", "--quiet", "origin"],
+                        stream_output=False,
+                    )
+                else:
+                    self.folder.mkdir(parents=True, exist_ok=True)
+                    self._create(repo, mirror)
+            except (sh.ErrorReturnCode, OSError):
+                if not mirror.exists():
+                    return None
+        return mirror
@@ -0,0 +1,251 @@
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from plonex.options_cache import file_fingerprint
+from plonex.options_cache import fingerprint_matches
+from typing import Any
+from typing import Callable
+
+import json
+import os
+import re
+import sh  # type: ignore[import-untyped]
+
+
+REMOTE_SECTION = re.compile(r'^\s*\[\s*remote\s+"(?P<name>[^"]+)"\s*\]')
+SECTION = re.compile(r"^\s*\[")
+URL_KEY = re.compile(r"^\s*url\s*=\s*(?P<url>.*?)\s*$", re.IGNORECASE)
+INDEX_FORMAT_VERSION = 1
+
+
+@dataclass(kw_only=True, frozen=True)
+class CheckoutStatus:
+    """What `sources list`, `tainted`, `suggest-existing` and `describe`
+    need to know about a checkout
+    """
+
+    path: Path
+    exists: bool = True
+    is_git: bool = True
+    remote_url: str | None = None
+    # The commit checked out, None for a repository without commits
+    head: str | None = None
+    # None when the HEAD is detached
+    branch: str | None = None
+    upstream: str | None = None
+    ahead: int = 0
+    behind: int = 0
+    modified: bool = False
+    # Set when git status failed
+    error: str | None = None
+
+    @property
+    def revision(self) -> str | None:
+        """The branch, or the commit when the HEAD is detached"""
+        return self.branch or self.head
+
+
+def git_dir(checkout: Path) -> Path | None:
+    """The git folder of a checkout, following the `gitdir:` file of worktrees
+    and submodules
+    """
+    dot_git = checkout / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    try:
+        content = dot_git.read_text()
+    except OSError:
+        return None
+    if content.startswith("gitdir:"):
+        return (checkout / content.partition(":")[2].strip()).resolve()
+    return None
+
+
+def common_dir(git_folder: Path) -> Path:
+    """The git folder holding the config and the refs.
+
+    The private git folder of a worktree only has its own HEAD and index,
+    its `commondir` file points to the git folder of the main checkout.
+    """
+    try:
+        content = (git_folder / "commondir").read_text().strip()
+    except OSError:
+        return git_folder
+    if not content:
+        return git_folder
+    return (git_folder / content).resolve()
+
+
+def read_remote_url(git_folder: Path, remote: str = "origin") -> str | None:
+    """Read the URL of a remote from the git config file"""
+    try:
+        lines = (git_folder / "config").read_text().splitlines()
+    except OSError:
+        return None
+    in_remote = False
+    for line in lines:
+        if SECTION.match(line):
+            match = REMOTE_SECTION.match(line)
+            in_remote = match is not None and match["name"] == remote
+            continue
+        if in_remote and (match := URL_KEY.match(line)):
+            url = match["url"]
+            if len(url) > 1 and url[0] == url[-1] == '"':
+                url = url[1:-1]
+            return url or None
+    return None
+
+
+def read_head(git_folder: Path) -> tuple[str | None, str | None]:
+    """Read the branch and the detached commit from the HEAD file"""
+    try:
+        head = (git_folder / "HEAD").read_text().strip()
+    except OSError:
+        return None, None
+    if head.startswith("ref:"):
+        return head.partition(":")[2].strip().removeprefix("refs/heads/"), None
+    return None, head or None
+
+
+def parse_status(output: str) -> dict:
+    """Parse the output of `git status --porcelain=v2 --branch`"""
+    result: dict = {"modified": False}
+    for line in output.splitlines():
+        if not line.startswith("# "):
+            if line.strip():
+                result["modified"] = True
+            continue
+        key, _, value = line[2:].partition(" ")
+        if key == "branch.oid" and value != "(initial)":
+            result["head"] = value
+        elif key == "branch.head" and value != "(detached)":
+            result["branch"] = value
+        elif key == "branch.upstream":
+            result["upstream"] = value
+        elif key == "branch.ab":
+            ahead, _, behind = value.partition(" ")
+            result["ahead"] = abs(int(ahead))
+            result["behind"] = abs(int(behind))
+    return result
+
+
+def collect_status(checkout: Path, execute: Callable[..., str]) -> CheckoutStatus:
+    """Collect the status of a checkout with a single git process.
+
+    The remote URL and the HEAD are read from the files in the git folder,
+    everything else comes from `git status --porcelain=v2 --branch`.
+    """
+    if not checkout.exists():
+        return CheckoutStatus(path=checkout, exists=False, is_git=False)
+    if not (checkout / ".git").exists():
+        return CheckoutStatus(path=checkout, is_git=False)
+    git_folder = git_dir(checkout)
+    remote_url = read_remote_url(common_dir(git_folder)) if git_folder else None
+    branch, head = read_head(git_folder) if git_folder else (None, None)
+    try:
+        output = execute(
+            ["git", "-C", str(checkout), "status", "--porcelain=v2", "--branch"],
+            stream_output=False,
+        )
+    except sh.ErrorReturnCode as exc:
+        return CheckoutStatus(
+            path=checkout,
+            remote_url=remote_url,
+            head=head,
+            branch=branch,
+            error=f"git status failed with exit code {exc.exit_code}",
+        )
+    status = {"head": head, "branch": branch, **parse_status(str(output))}
+    return CheckoutStatus(path=checkout, remote_url=remote_url, **status)
+
+
+def status_markers(checkout: Path, status: CheckoutStatus) -> list[Path]:
+    """The files that change when the status of a checkout might have changed.
+
+    Switching branch or commit changes HEAD, committing moves the branch ref,
+    staging or refreshing the working tree rewrites the index,
+    fetching moves the upstream ref.
+    """
+    git_folder = git_dir(checkout)
+    if git_folder is None:
+        return []
+    # The HEAD and the index belong to the worktree, the rest is shared
+    shared_folder = common_dir(git_folder)
+    markers = [
+        git_folder / "HEAD",
+        git_folder / "index",
+        shared_folder / "config",
+        shared_folder / "packed-refs",
+    ]
+    if (checkout / ".git").is_file():
+        # A worktree or a submodule pointing to its git folder
+        markers.append(checkout / ".git")
+    if status.branch:
+        markers.append(shared_folder / "refs" / "heads" / status.branch)
+    if status.upstream:
+        markers.append(shared_folder / "refs" / "remotes" / status.upstream)
+    return markers
+
+
+@dataclass(kw_only=True)
+class StatusIndex:
+    """Remember the status of the checkouts between two commands.
+
+    Each status is stored with the fingerprints of its markers
+    (see status_markers) and it is returned as long as none of them moved.
+    Editing a file does not touch the markers until git looks at
+    the working tree again, so the index is only used to display the sources.
+    """
+
+    path: Path
+    _entries: dict[str, Any] | None = field(default=None, init=False, repr=False)
+
+    @property
+    def entries(self) -> dict[str, Any]:
+        if self._entries is None:
+            try:
+                data = json.loads(self.path.read_text())
+            except (FileNotFoundError, ValueError):
+                data = {}
+            if not isinstance(data, dict) or data.get("version") != (
+                INDEX_FORMAT_VERSION
+            ):
+                data = {}
+            self._entries = data.get("checkouts") or {}
+        return self._entries
+
+    def get(self, checkout: Path) -> CheckoutStatus | None:
+        entry = self.entries.get(str(checkout))
+        if not entry:
+            return None
+        for marker, fingerprint in entry["markers"].items():
+            if not fingerprint_matches(Path(marker), fingerprint):
+                return None
+        return CheckoutStatus(path=checkout, **entry["status"])
+
+    def put(self, status: CheckoutStatus) -> None:
+        if not status.is_git or status.error:
+            self.entries.pop(str(status.path), None)
+            return
+        data = asdict(status)
+        del data["path"]
+        self.entries[str(status.path)] = {
+            "status": data,
+            "markers": {
+                str(marker): file_fingerprint(marker, content_hash=False)
+                for marker in status_markers(status.path, status)
+            },
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {"version": INDEX_FORMAT_VERSION, "checkouts": self.entries},
+                indent=2,
+                sort_keys=True,
+            )
+        )
+        os.replace(tmp_path, self.path)
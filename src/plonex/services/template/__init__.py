@@ -8,6 +8,7 @@ from jinja2 import Environment
 from jinja2 import StrictUndefined
 from pathlib import Path
 from plonex.base import BaseService
+from plonex.timings import timings
 
 
 @dataclass(kw_only=True)
@@ -54,7 +55,8 @@ class TemplateService(BaseService):
         if not self.target_path.parent.exists():
             self.target_path.parent.mkdir(parents=True)
 
-        self.target_path.write_text(self.render_template())
+        with timings.span(f"render {self.source_path.name}"):
+            self.target_path.write_text(self.render_template())
         self.target_path.chmod(self.mode)
 
         try:
@@ -0,0 +1,306 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from contextvars import copy_context
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from time import time_ns
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import TypeVar
+
+import json
+import os
+import secrets
+
+
+T = TypeVar("T")
+
+
+def cpu_time() -> float:
+    """The CPU time used by this process and by its terminated children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+# Constants of the OpenTelemetry protocol
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+def otel_value(value: Any) -> dict[str, Any]:
+    """Convert a value to an OTLP JSON AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64 bit integers are encoded as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [otel_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def otel_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    """Convert a mapping to a list of OTLP JSON KeyValue"""
+    return [
+        {"key": key, "value": otel_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+@dataclass(kw_only=True)
+class Span:
+    """A timed phase of a command"""
+
+    name: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+    start: float = field(default_factory=perf_counter)
+    wall: float = 0.0
+    cpu: float = 0.0
+    children: list["Span"] = field(default_factory=list)
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    start_ns: int = field(default_factory=time_ns)
+    end_ns: int = 0
+    error: str | None = None
+    _cpu_start: float = field(default_factory=cpu_time, repr=False)
+
+    def finish(self) -> None:
+        self.wall = perf_counter() - self.start
+        self.cpu = cpu_time() - self._cpu_start
+        self.end_ns = time_ns()
+
+    def as_dict(self, origin: float) -> dict[str, Any]:
+        """Return a JSON serializable representation of the span.
+
+        The start time is relative to origin, all the times are in seconds.
+        """
+        return {
+            "name": self.name,
+            "attributes": self.attributes,
+            "start": self.start - origin,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "children": [child.as_dict(origin) for child in self.children],
+        }
+
+    def otel_spans(self, trace_id: str, parent_id: str = "") -> Iterator[dict]:
+        """Yield the span and its descendants in the OTLP JSON format"""
+        status: dict[str, Any] = {"code": STATUS_CODE_OK}
+        if self.error is not None:
+            status = {"code": STATUS_CODE_ERROR, "message": self.error}
+        yield {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": parent_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": otel_attributes(
+                {**self.attributes, "plonex.cpu_time": self.cpu}
+            ),
+            "status": status,
+        }
+        for child in self.children:
+            yield from child.otel_spans(trace_id, self.span_id)
+
+
+class TimingsRecorder:
+    """Record the wall and CPU time of the phases of a command.
+
+    Nothing is recorded until start is called, so that spans cost nothing
+    when plonex is used as a library or in the tests.
+
+    The open spans are kept in a context variable, so each thread has
+    its own stack. A thread started by plonex records its spans as children
+    of the span that was current when the work was handed to it,
+    see in_current_context.
+    """
+
+    def __init__(self) -> None:
+        self.root: Span | None = None
+        self.trace_id = ""
+        # Also collect the details only written in the trace,
+        # like the resource usage of the commands
+        self.tracing = False
+        # The root of the recording in progress, None when stopped
+        self._recording: Span | None = None
+        self._stack: ContextVar[tuple[Span, ...]] = ContextVar(
+            f"plonex_timings_{id(self)}", default=()
+        )
+
+    def _open_spans(self) -> tuple[Span, ...]:
+        """The open spans of the current context, empty when not recording"""
+        stack = self._stack.get()
+        if not stack or stack[0] is not self._recording:
+            return ()
+        return stack
+
+    @property
+    def active(self) -> bool:
+        return bool(self._open_spans())
+
+    @property
+    def current(self) -> Span | None:
+        """The innermost open span"""
+        stack = self._open_spans()
+        return stack[-1] if stack else None
+
+    def start(self, name: str, **attributes: Any) -> Span:
+        """Start recording a new tree of spans"""
+        self.root = Span(name=name, attributes=attributes)
+        self.trace_id = secrets.token_hex(16)
+        self._recording = self.root
+        self._stack.set((self.root,))
+        return self.root
+
+    def stop(self) -> Span | None:
+        """Stop recording and return the root span, None if not recording"""
+        root = self._recording
+        if root is not None:
+            root.finish()
+        self._recording = None
+        self.tracing = False
+        self._stack.set(())
+        return root
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        """Time the enclosed block as a child of the current span"""
+        stack = self._open_spans()
+        if not stack:
+            yield None
+            return
+        span = Span(name=name, attributes=attributes)
+        stack[-1].children.append(span)
+        self._stack.set((*stack, span))
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            span.finish()
+            # The recording might have been stopped or restarted meanwhile
+            current = self._stack.get()
+            if current and current[-1] is span:
+                self._stack.set(stack)
+
+    def render(self, root: Span):
+        """Return a rich renderable tree of the spans"""
+        from rich.markup import escape
+        from rich.tree import Tree
+
+        def label(span: Span) -> str:
+            # Show the whole command line rather than the executable name
+            name = span.name
+            if "process.command_line" in span.attributes:
+                name = f"command {span.attributes['process.command_line']}"
+            return (
+                f"{escape(name)} "
+                f"[dim]{span.wall * 1000:.1f} ms wall, "
+                f"{span.cpu * 1000:.1f} ms cpu[/dim]"
+            )
+
+        def add(tree: Tree, span: Span) -> None:
+            for child in span.children:
+                add(tree.add(label(child)), child)
+
+        tree = Tree(label(root))
+        add(tree, root)
+        return tree
+
+    def write_json(self, root: Span, folder: Path) -> Path:
+        """Write the spans in a new JSON file in folder and return its path"""
+        folder.mkdir(parents=True, exist_ok=True)
+        now = datetime.now()
+        path = folder / f"{now:%Y%m%d-%H%M%S}-{os.getpid()}.json"
+        payload = {
+            "created": now.isoformat(timespec="seconds"),
+            **root.as_dict(root.start),
+        }
+        path.write_text(json.dumps(payload, indent=2, default=str))
+        return path
+
+    def write_trace(
+        self,
+        root: Span,
+        path: Path,
+        resource: dict[str, Any] | None = None,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+    ) -> None:
+        """Append the spans to a JSONL file in the OTLP JSON format.
+
+        Each line is an ExportTraceServiceRequest holding the spans of
+        one command, as written by the file exporter of the OpenTelemetry
+        collector. The file is rotated like a log file when it grows larger
+        than max_bytes, keeping backup_count old files.
+        """
+        from importlib.metadata import version
+
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": otel_attributes(
+                            {"service.name": "plonex", **(resource or {})}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "plonex", "version": version("plonex")},
+                            "spans": list(root.otel_spans(self.trace_id)),
+                        }
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(request, separators=(",", ":"), default=str) + "\n"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rotate(path, max_bytes, backup_count)
+        # A single append per command keeps the lines of concurrent
+        # invocations from interleaving
+        with path.open("a") as stream:
+            stream.write(line)
+
+
+def in_current_context(function: Callable[..., T]) -> Callable[..., T]:
+    """Wrap function to run it, e.g. in a thread pool, in the current context.
+
+    Each call runs in its own copy of the context, so the spans recorded
+    by concurrent calls are siblings below the span that is current now.
+    """
+    context = copy_context()
+
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
+
+
+def rotate(path: Path, max_bytes: int, backup_count: int) -> None:
+    """Rotate path to path.1, path.2, ... if it is larger than max_bytes"""
+    try:
+        if path.stat().st_size < max_bytes:
+            return
+    except FileNotFoundError:
+        return
+    for index in range(backup_count - 1, 0, -1):
+        backup = path.with_name(f"{path.name}.{index}")
+        if backup.exists():
+            os.replace(backup, path.with_name(f"{path.name}.{index + 1}"))
+    if backup_count:
+        os.replace(path, path.with_name(f"{path.name}.1"))
+    else:
+        path.unlink()
+
+
+timings = TimingsRecorder()
@@ -0,0 +1,59 @@
+from pathlib import Path
+from plonex.options_cache import file_fingerprint
+from plonex.options_cache import fingerprint_matches
+from typing import Any
+
+import copy
+import yaml
+
+
+# The libyaml based loader and dumper are several times faster
+# than the pure Python ones, but PyYAML might be built without libyaml
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeDumper  # type: ignore[assignment]
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+
+# Parsed files by absolute path, with the fingerprint of the parsed version
+_parsed_files: dict[str, tuple[dict[str, Any] | None, Any]] = {}
+
+
+def safe_load(text: str) -> Any:
+    """Parse a YAML document"""
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def dump(data: Any, **kwargs: Any) -> str:
+    """Serialize data as a YAML document.
+
+    The keyword arguments are passed to yaml.dump (e.g. sort_keys or indent).
+    """
+    return yaml.dump(data, Dumper=SafeDumper, **kwargs)
+
+
+def load_file(path: Path) -> Any:
+    """Parse a YAML file.
+
+    The result is cached for the lifetime of the process and reused
+    as long as the size and modification time of the file do not change.
+    Callers get their own copy, so they are free to modify it.
+    """
+    key = path.absolute().as_posix()
+    cached = _parsed_files.get(key)
+    if cached is not None and fingerprint_matches(path, cached[0]):
+        return copy.deepcopy(cached[1])
+
+    # Take the fingerprint before reading, so that a concurrent change
+    # invalidates the entry instead of being hidden by it
+    fingerprint = file_fingerprint(path, content_hash=False)
+    data = safe_load(path.read_text())
+    _parsed_files[key] = (fingerprint, data)
+    return copy.deepcopy(data)
+
+
+def clear_cache() -> None:
+    """Forget the parsed files"""
+    _parsed_files.clear()
@@ -5,12 +5,15 @@ from dataclasses import field
 from pathlib import Path
 from plonex.base import BaseService
 from plonex.services.profile import ProfileService
+from plonex.timings import timings
 from textwrap import dedent
 from unittest import mock
 
 import inspect
 import io
 import os
+import resource
+import sh  # type: ignore[import-untyped]
 import sys
 import unittest
 
@@ -479,6 +482,76 @@ class TestBaseService(unittest.TestCase):
         self.assertEqual("", mock_stdout.getvalue())
         self.assertEqual("", mock_stderr.getvalue())
 
+    # --- tracing ---
+
+    def _record(self):
+        root = timings.start("test")
+        timings.tracing = True
+        self.addCleanup(timings.stop)
+        return root
+
+    def test_lifecycle_spans(self):
+        root = self._record()
+
+        @dataclass(kw_only=True)
+        class EchoService(DummyService):
+            name: str = "echo"
+
+            @property
+            def command(self):
+                return ["echo", "hello"]
+
+            def run(self):
+                # The call through super() is part of the same span
+                super().run()
+
+        BaseService.command_output_enabled = False
+        with EchoService() as service:
+            service.run()
+        timings.stop()
+
+        self.assertListEqual(
+            [span.name for span in root.children],
+            ["enter echo", "run echo", "exit echo"],
+        )
+        (run_command,) = root.children[1].children
+        self.assertEqual(run_command.name, "run_command echo")
+        (command,) = run_command.children
+        self.assertEqual(command.name, "command echo")
+        self.assertEqual(command.attributes["process.command_line"], "echo hello")
+        self.assertEqual(command.attributes["process.exit_code"], 0)
+        self.assertEqual(command.attributes["process.output.bytes"], 6)
+        for name in ("maxrss", "utime", "stime"):
+            self.assertIn(f"process.child.{name}", command.attributes)
+        self.assertEqual(root.children[0].attributes, {"plonex.service": "echo"})
+
+    def test_failed_command_span(self):
+        root = self._record()
+        BaseService.command_output_enabled = False
+        with self.assertRaises(sh.ErrorReturnCode):
+            BaseService.execute_command(["sh", "-c", "echo oops >&2; exit 3"])
+        (command,) = root.children
+        self.assertEqual(command.attributes["process.exit_code"], 3)
+        self.assertEqual(command.attributes["process.output.bytes"], 5)
+        self.assertIn("ErrorReturnCode_3", command.error)
+
+    def test_command_details_only_when_tracing(self):
+        root = timings.start("test")
+        self.addCleanup(timings.stop)
+        BaseService.command_output_enabled = False
+        with mock.patch(
+            "plonex.base.resource.getrusage", wraps=resource.getrusage
+        ) as mock_getrusage:
+            BaseService.execute_command(["echo", "hello"])
+        mock_getrusage.assert_not_called()
+        (command,) = root.children
+        self.assertEqual(command.attributes, {"process.command_line": "echo hello"})
+
+    def test_no_spans_when_not_recording(self):
+        with DummyService() as service:
+            self.assertSetEqual(service._traced_phases, set())
+        self.assertFalse(timings.active)
+
     # --- __enter__ / __exit__ ---
 
     def test_enter_with_environment_vars(self):
@@ -559,27 +632,145 @@ class TestBaseService(unittest.TestCase):
             any("does not exist" in str(w) for w in service.logger.warnings)
         )
 
-    def test_options_logs_too_many_iterations(self):
-        """options logs an error when template resolution does not converge"""
+    def test_options_resolves_variables(self):
+        """options renders the Jinja expressions using the other options"""
+        service = DummyService(
+            cli_options={
+                "name": "foo",
+                "label": "{{ name }}-bar",
+                "nested": {"url": "https://{{ host }}/{{ label }}"},
+                "host": "example.com",
+            }
+        )
+        self.assertEqual(service.options["label"], "foo-bar")
+        self.assertEqual(
+            service.options["nested"]["url"], "https://example.com/foo-bar"
+        )
 
-        class _Template:
+    def test_options_logs_circular_references(self):
+        """options logs the exact cycle when options reference each other"""
+        service = DummyService(
+            cli_options={"a": "{{ b }}", "b": "{{ a }}", "c": "{{ target }}"}
+        )
+        options = service.options
+        self.assertEqual(options["a"], "{{ b }}")
+        self.assertEqual(options["c"], str(self.temp_dir))
+        self.assertEqual(
+            service.logger.errors,
+            [("Circular reference while resolving options: a -> b -> a",)],
+        )
 
-            def __init__(self):
-                self.counter = 0
+    # --- options cache ---
 
-            def render(self, **kwargs):
-                self.counter += 1
-                return f"counter: {self.counter}\n"
+    def _enable_options_cache(self):
+        self.addCleanup(
+            setattr,
+            BaseService,
+            "options_cache_enabled",
+            BaseService.options_cache_enabled,
+        )
+        BaseService.options_cache_enabled = True
 
-        fake_env = mock.Mock()
-        fake_env.from_string.return_value = _Template()
+    def test_options_cache_disabled_by_default(self):
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        (etc_path / "plonex.yml").write_text("key: value\n")
         service = DummyService()
-        with mock.patch("plonex.base.Environment", return_value=fake_env):
-            options = service.options
-        self.assertEqual(options, {"counter": 10})
-        self.assertTrue(
-            any("Too many iterations" in str(error) for error in service.logger.errors)
+        self.assertIsNone(service.options_cache)
+        self.assertEqual(service.options["key"], "value")
+        self.assertFalse((self.temp_dir / "var").exists())
+
+    def test_options_cache_skips_yaml_parsing_when_warm(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        (etc_path / "plonex.yml").write_text("name: foo\nlabel: '{{ name }}-bar'\n")
+        (etc_path / "plonex.local.yml").write_text("extra: 1\n")
+        cold = DummyService().options
+        self.assertEqual(cold["label"], "foo-bar")
+        self.assertTrue(DummyService().options_cache.path.exists())
+
+        with mock.patch("plonex.yaml_io.safe_load") as mock_load:
+            warm = DummyService().options
+        mock_load.assert_not_called()
+        self.assertDictEqual(warm, cold)
+
+    def test_options_cache_invalidated_by_file_changes(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        (etc_path / "plonex.yml").write_text("key: old\n")
+        self.assertEqual(DummyService().options["key"], "old")
+
+        (etc_path / "plonex.yml").write_text("key: newer\n")
+        self.assertEqual(DummyService().options["key"], "newer")
+
+        (etc_path / "plonex.local.yml").write_text("key: local\n")
+        self.assertEqual(DummyService().options["key"], "local")
+
+    def test_options_cache_invalidated_by_profile_changes(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        profile = self.temp_dir / "profiles" / "base"
+        (profile / "etc").mkdir(parents=True)
+        (profile / "etc" / "plonex.yml").write_text("from_profile: 1\n")
+        (etc_path / "plonex.yml").write_text("profiles:\n  - profiles/base\n")
+        self.assertEqual(DummyService().options["from_profile"], 1)
+
+        (profile / "etc" / "plonex.yml").write_text("from_profile: 22\n")
+        self.assertEqual(DummyService().options["from_profile"], 22)
+
+    def test_options_cache_same_content_with_new_mtime_is_a_hit(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        plonex_yml = etc_path / "plonex.yml"
+        plonex_yml.write_text("key: value\n")
+        _ = DummyService().options
+        os.utime(plonex_yml, ns=(0, 0))
+        with mock.patch("plonex.yaml_io.safe_load") as mock_load:
+            self.assertEqual(DummyService().options["key"], "value")
+        mock_load.assert_not_called()
+
+    def test_options_cache_keyed_by_cli_options(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        (etc_path / "plonex.yml").write_text("key: value\n")
+        first = DummyService(cli_options={"key": "one"})
+        second = DummyService(cli_options={"key": "two"})
+        self.assertNotEqual(first.options_cache.path, second.options_cache.path)
+        self.assertEqual(first.options["key"], "one")
+        self.assertEqual(second.options["key"], "two")
+
+    def test_options_cache_not_written_for_remote_profiles(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        cloned_profile = self.temp_dir / "cloned-profile"
+        (cloned_profile / "etc").mkdir(parents=True)
+        (cloned_profile / "etc" / "plonex.yml").write_text("remote: true\n")
+        (etc_path / "plonex.yml").write_text(
+            "profiles:\n  - https://github.com/example/plonex-profile.git\n"
         )
+        with mock.patch.object(
+            ProfileService,
+            "_clone_remote_source",
+            return_value=cloned_profile,
+        ):
+            service = DummyService()
+            self.assertTrue(service.options["remote"])
+        self.assertFalse(service.options_cache.path.exists())
+
+    def test_options_cache_not_written_for_non_json_values(self):
+        self._enable_options_cache()
+        etc_path = self.temp_dir / "etc"
+        etc_path.mkdir()
+        (etc_path / "plonex.yml").write_text("ports:\n  8080: main\n")
+        service = DummyService()
+        self.assertEqual(service.options["ports"], {8080: "main"})
+        self.assertFalse(service.options_cache.path.exists())
 
     def test_options_normalize_supervisor_graceful_interval(self):
         service = DummyService(cli_options={"supervisor_graceful_interval": "2.5"})
@@ -614,6 +805,15 @@ class TestBaseService(unittest.TestCase):
         service = BaseService()
         self.assertEqual(service.virtualenv_dir, (self.temp_dir / ".venv").absolute())
 
+    def test_virtualenv_dir_through_a_symlink(self):
+        """virtualenv_dir keeps the .venv path when it is a symlink"""
+        venv_bin = self.temp_dir / ".venvs" / "abc" / "bin"
+        venv_bin.mkdir(parents=True)
+        (venv_bin / "activate").touch()
+        (self.temp_dir / ".venv").symlink_to(".venvs/abc")
+        service = BaseService()
+        self.assertEqual(service.virtualenv_dir, (self.temp_dir / ".venv").absolute())
+
     # --- console property ---
 
     def test_console_property(self):
@@ -1,5 +1,7 @@
 from .utils import temp_cwd
 from argparse import ArgumentParser
+from collections import Counter
+from dataclasses import fields
 from importlib.metadata import version
 from pathlib import Path
 from plonex.base import BaseService
@@ -7,12 +9,16 @@ from plonex.cli import _configure_logging
 from plonex.cli import _resolve_target
 from plonex.cli import build_parser
 from plonex.cli import main
+from plonex.cli.dependencies import _SERVICE_REGISTRY
 from plonex.cli.dependencies import _service_from_config
+from plonex.services.profile import ProfileService
 from runpy import run_path
 from types import SimpleNamespace
 from unittest import mock
 
+import json
 import logging
+import subprocess
 import sys
 import unittest
 
@@ -88,6 +94,30 @@ class TestBuildParser(unittest.TestCase):
         self.assertEqual(args.supervisor_action, "status")
         self.assertTrue(args.quiet)
 
+    def test_network_flags(self):
+        args = self.parser.parse_args(["compile"])
+        self.assertFalse(args.offline)
+        self.assertFalse(args.refresh_profiles)
+
+        args = self.parser.parse_args(["--offline", "compile"])
+        self.assertTrue(args.offline)
+
+        args = self.parser.parse_args(["compile", "--offline", "--refresh-profiles"])
+        self.assertTrue(args.offline)
+        self.assertTrue(args.refresh_profiles)
+
+    def test_timings_flags(self):
+        args = self.parser.parse_args(["compile"])
+        self.assertFalse(args.timings)
+        self.assertFalse(args.timings_json)
+
+        args = self.parser.parse_args(["--timings", "compile", "--timings-json"])
+        self.assertTrue(args.timings)
+        self.assertTrue(args.timings_json)
+
+        args = self.parser.parse_args(["compile", "--trace"])
+        self.assertTrue(args.trace)
+
     def test_target_flag(self):
         args = self.parser.parse_args(["-t", "/some/path", "compile"])
         self.assertEqual(args.target, "/some/path")
@@ -267,6 +297,27 @@ class TestBuildParser(unittest.TestCase):
         self.assertEqual(args.action, "dependencies")
         self.assertTrue(args.sync)
 
+    def test_action_dependencies_prefetch(self):
+        args = self.parser.parse_args(["dependencies", "--prefetch"])
+        self.assertEqual(args.action, "dependencies")
+        self.assertTrue(args.prefetch)
+
+    def test_action_dependencies_check(self):
+        args = self.parser.parse_args(["dependencies", "--check"])
+        self.assertEqual(args.action, "dependencies")
+        self.assertTrue(args.check)
+
+    def test_action_dependencies_build_new(self):
+        args = self.parser.parse_args(["dependencies", "--build-new"])
+        self.assertEqual(args.action, "dependencies")
+        self.assertTrue(args.build_new)
+        self.assertFalse(args.rollback)
+
+    def test_action_dependencies_rollback(self):
+        args = self.parser.parse_args(["dependencies", "--rollback"])
+        self.assertEqual(args.action, "dependencies")
+        self.assertTrue(args.rollback)
+
     def test_action_sources_default(self):
         args = self.parser.parse_args(["sources"])
         self.assertEqual(args.action, "sources")
@@ -289,6 +340,12 @@ class TestBuildParser(unittest.TestCase):
         self.assertEqual(args.action, "sources")
         self.assertEqual(args.sources_action, "force-update")
         self.assertTrue(args.sources_yes)
+        self.assertIsNone(args.sources_jobs)
+
+    def test_action_sources_update_jobs(self):
+        args = self.parser.parse_args(["sources", "update", "-j", "4"])
+        self.assertEqual(args.sources_action, "update")
+        self.assertEqual(args.sources_jobs, 4)
 
     def test_action_sources_tainted(self):
         args = self.parser.parse_args(["sources", "tainted"])
@@ -458,6 +515,17 @@ class TestMain(unittest.TestCase):
     def setUp(self):
         super().setUp()
         self.temp_dir = self.enterContext(temp_cwd())
+        self.addCleanup(
+            setattr,
+            BaseService,
+            "options_cache_enabled",
+            BaseService.options_cache_enabled,
+        )
+        self.addCleanup(setattr, BaseService, "offline", BaseService.offline)
+        self.addCleanup(
+            setattr, BaseService, "http_cache_enabled", BaseService.http_cache_enabled
+        )
+        self.addCleanup(setattr, ProfileService, "refresh", ProfileService.refresh)
 
     def _run(self, argv):
         with mock.patch.object(sys, "argv", ["plonex"] + argv):
@@ -468,6 +536,12 @@ class TestMain(unittest.TestCase):
             self._run(["-V"])
         mock_print.assert_called_once_with(version("plonex"))
 
+    def test_network_flags_are_applied(self):
+        with mock.patch("builtins.print"):
+            self._run(["--offline", "--refresh-profiles", "-V"])
+        self.assertTrue(BaseService.offline)
+        self.assertTrue(ProfileService.refresh)
+
     def test_no_action_prints_help_by_default(self):
         with mock.patch("plonex.cli._resolve_target") as mock_rt:
             with mock.patch("plonex.cli._configure_logging"):
@@ -548,6 +622,47 @@ class TestMain(unittest.TestCase):
         MockSvc.assert_called_once_with(target=self.temp_dir)
         MockSvc.return_value.run.assert_called_once()
 
+    def test_command_reads_each_config_file_once(self):
+        """All the services built by one command share the loaded options"""
+        from plonex import logger as plonex_logger
+
+        self.addCleanup(plonex_logger.setLevel, plonex_logger.level)
+        self.addCleanup(
+            setattr,
+            BaseService,
+            "command_output_enabled",
+            BaseService.command_output_enabled,
+        )
+        etc = self.temp_dir / "etc"
+        etc.mkdir()
+        profile = self.temp_dir / "profiles" / "base"
+        (profile / "etc").mkdir(parents=True)
+        config_files = [
+            profile / "etc" / "plonex.yml",
+            etc / "plonex.yml",
+            etc / "plonex.local.yml",
+        ]
+        config_files[0].write_text("http_port: 8080\nlog_level: info\n")
+        config_files[1].write_text("profiles:\n  - profiles/base\n")
+        config_files[2].write_text("http_port: 8081\n")
+
+        reads: Counter = Counter()
+        read_text = Path.read_text
+
+        def counting_read_text(path, *args, **kwargs):
+            reads[path.resolve()] += 1
+            return read_text(path, *args, **kwargs)
+
+        with mock.patch.object(Path, "read_text", counting_read_text):
+            self._run(["-t", str(self.temp_dir), "compile"])
+
+        compiled = (self.temp_dir / "var" / "plonex.yml").read_text()
+        self.assertIn("http_port: 8081", compiled)
+        self.assertEqual(
+            {path.resolve(): 1 for path in config_files},
+            {path.resolve(): reads[path.resolve()] for path in config_files},
+        )
+
     def _run_with_target(self, argv):
         """Helper: set up a valid target dir and run main with that --target."""
         etc = self.temp_dir / "etc"
@@ -573,6 +688,54 @@ class TestMain(unittest.TestCase):
         svc = self._run_service(["compile"], "plonex.cli.CompileService")
         svc.return_value.run.assert_called_once()
 
+    def test_timings_flag_prints_the_tree(self):
+        with mock.patch("plonex.cli.Console") as MockConsole:
+            self._run_service(["compile", "--timings"], "plonex.cli.CompileService")
+        MockConsole.assert_called_once_with(stderr=True)
+        (tree,), _ = MockConsole.return_value.print.call_args
+        labels = [child.label for child in tree.children]
+        self.assertIn("action compile", " ".join(labels))
+        self.assertFalse((self.temp_dir / "var" / "log" / "timings").exists())
+
+    def test_trace_flag_appends_the_spans(self):
+        self._run_service(["compile", "--trace"], "plonex.cli.CompileService")
+        self._run_service(["--trace", "compile"], "plonex.cli.CompileService")
+        trace = self.temp_dir / "var" / "log" / "plonex-trace.jsonl"
+        first, second = map(json.loads, trace.read_text().splitlines())
+        (resource_spans,) = first["resourceSpans"]
+        spans = resource_spans["scopeSpans"][0]["spans"]
+        self.assertIn("action compile", [span["name"] for span in spans])
+        self.assertNotEqual(
+            spans[0]["traceId"],
+            second["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"],
+        )
+
+    def test_no_timings_by_default(self):
+        with (
+            mock.patch("plonex.cli.timings.start") as mock_start,
+            mock.patch("plonex.cli._project_options", return_value={}) as mock_options,
+        ):
+            self._run_service(["compile"], "plonex.cli.CompileService")
+        mock_start.assert_not_called()
+        mock_options.assert_called_once_with(self.temp_dir.resolve())
+
+    def test_timings_json_option(self):
+        etc = self.temp_dir / "etc"
+        etc.mkdir()
+        (etc / "plonex.yml").write_text("timings_json: true\n")
+        with mock.patch("plonex.cli.Console") as MockConsole:
+            with mock.patch("plonex.cli._configure_logging"):
+                with mock.patch("plonex.cli.CompileService"):
+                    with mock.patch.object(
+                        sys, "argv", ["plonex", "-t", str(self.temp_dir), "compile"]
+                    ):
+                        main()
+        MockConsole.assert_not_called()
+        (path,) = (self.temp_dir / "var" / "log" / "timings").iterdir()
+        data = json.loads(path.read_text())
+        self.assertEqual(data["name"], f"plonex -t {self.temp_dir} compile")
+        self.assertIn("action compile", [child["name"] for child in data["children"]])
+
     def test_action_describe(self):
         svc = self._run_service(["describe"], "plonex.cli.DescribeService")
         svc.return_value.run.assert_called_once()
@@ -583,11 +746,12 @@ class TestMain(unittest.TestCase):
                 return_value=MockSvc.return_value
             )
             MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
-            self._run_with_target(["describe", "--html", "--browse"])
+            self._run_with_target(["describe", "--html", "--browse", "--refresh"])
         MockSvc.assert_called_once_with(
             target=self.temp_dir.resolve(),
             generate_html=True,
             browse_html=True,
+            refresh_sources=True,
         )
         MockSvc.return_value.run.assert_called_once()
 
@@ -777,6 +941,59 @@ class TestMain(unittest.TestCase):
             sync=True,
         )
 
+    def test_action_dependencies_prefetch(self):
+        with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
+            with mock.patch("plonex.cli.InstallService") as MockSvc:
+                MockSvc.return_value.__enter__ = mock.Mock(
+                    return_value=MockSvc.return_value
+                )
+                MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
+                self._run_with_target(["dependencies", "--prefetch"])
+        mock_deps.assert_called_once_with(self.temp_dir.resolve(), "dependencies")
+        MockSvc.return_value.prefetch.assert_called_once_with()
+        MockSvc.return_value.run.assert_not_called()
+
+    def test_action_dependencies_check(self):
+        with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
+            with mock.patch("plonex.cli.InstallService") as MockSvc:
+                MockSvc.return_value.check.return_value = True
+                self._run_with_target(["dependencies", "--check", "--sync"])
+        mock_deps.assert_not_called()
+        MockSvc.return_value.check.assert_called_once_with(sync=True)
+        MockSvc.return_value.run.assert_not_called()
+
+    def test_action_dependencies_build_new(self):
+        with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
+            with mock.patch("plonex.cli.InstallService") as MockSvc:
+                MockSvc.return_value.__enter__ = mock.Mock(
+                    return_value=MockSvc.return_value
+                )
+                MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
+                self._run_with_target(["dependencies", "--build-new"])
+        mock_deps.assert_called_once_with(self.temp_dir.resolve(), "dependencies")
+        MockSvc.return_value.build_new.assert_called_once_with()
+        MockSvc.return_value.run.assert_not_called()
+
+    def test_action_dependencies_rollback(self):
+        with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
+            with mock.patch("plonex.cli.InstallService") as MockSvc:
+                MockSvc.return_value.rollback.return_value = False
+                with self.assertRaises(SystemExit) as cm:
+                    self._run_with_target(["dependencies", "--rollback"])
+        self.assertEqual(cm.exception.code, 1)
+        mock_deps.assert_not_called()
+        MockSvc.return_value.rollback.assert_called_once_with()
+        MockSvc.return_value.run.assert_not_called()
+
+    def test_action_dependencies_check_out_of_date_exits(self):
+        with mock.patch("plonex.cli._run_service_dependencies"):
+            with mock.patch("plonex.cli.InstallService") as MockSvc:
+                MockSvc.return_value.check.return_value = False
+                with self.assertRaises(SystemExit) as cm:
+                    self._run_with_target(["dependencies", "--check"])
+        self.assertEqual(cm.exception.code, 1)
+        MockSvc.return_value.run.assert_not_called()
+
     def test_action_sources_update(self):
         with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
             with mock.patch("plonex.cli.SourcesService") as MockSvc:
@@ -786,7 +1003,7 @@ class TestMain(unittest.TestCase):
                 MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
                 self._run_with_target(["sources", "update"])
         mock_deps.assert_called_once_with(self.temp_dir.resolve(), "sources")
-        MockSvc.return_value.run_update.assert_called_once_with(glob=None)
+        MockSvc.return_value.run_update.assert_called_once_with(glob=None, jobs=None)
 
     def test_action_sources_update_with_glob(self):
         with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
@@ -795,9 +1012,9 @@ class TestMain(unittest.TestCase):
                     return_value=MockSvc.return_value
                 )
                 MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
-                self._run_with_target(["sources", "update", "foo"])
+                self._run_with_target(["sources", "update", "foo", "--jobs", "8"])
         mock_deps.assert_called_once_with(self.temp_dir.resolve(), "sources")
-        MockSvc.return_value.run_update.assert_called_once_with(glob="foo")
+        MockSvc.return_value.run_update.assert_called_once_with(glob="foo", jobs=8)
 
     def test_action_sources_force_update(self):
         with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
@@ -812,6 +1029,7 @@ class TestMain(unittest.TestCase):
             force=True,
             assume_yes=True,
             glob=None,
+            jobs=None,
         )
 
     def test_action_sources_tainted(self):
@@ -834,7 +1052,17 @@ class TestMain(unittest.TestCase):
                 MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
                 self._run_with_target(["sources", "list"])
         mock_deps.assert_called_once_with(self.temp_dir.resolve(), "sources")
-        MockSvc.return_value.run_list.assert_called_once_with(glob=None)
+        MockSvc.return_value.run_list.assert_called_once_with(glob=None, refresh=False)
+
+    def test_action_sources_list_refresh(self):
+        with mock.patch("plonex.cli._run_service_dependencies"):
+            with mock.patch("plonex.cli.SourcesService") as MockSvc:
+                MockSvc.return_value.__enter__ = mock.Mock(
+                    return_value=MockSvc.return_value
+                )
+                MockSvc.return_value.__exit__ = mock.Mock(return_value=False)
+                self._run_with_target(["sources", "list", "--refresh"])
+        MockSvc.return_value.run_list.assert_called_once_with(glob=None, refresh=True)
 
     def test_action_sources_missing(self):
         with mock.patch("plonex.cli._run_service_dependencies") as mock_deps:
@@ -1037,6 +1265,13 @@ class TestServiceFromConfig(unittest.TestCase):
             service = _service_from_config(spec, cwd, dependency_for="supervisor")
             self.assertIsNotNone(service)
 
+    def test_registry_matches_the_service_names(self):
+        for service_name, service_class in _SERVICE_REGISTRY.items():
+            if service_name == "template":
+                continue
+            defaults = {item.name: item.default for item in fields(service_class)}
+            self.assertEqual(defaults["name"], service_name)
+
     def test_unknown_service_raises(self):
         with temp_cwd() as cwd:
             with self.assertRaisesRegex(ValueError, "Unknown service"):
@@ -1050,3 +1285,34 @@ class TestServiceFromConfig(unittest.TestCase):
             with mock.patch("builtins.print") as mock_print:
                 run_path(str(cli_path), run_name="__main__")
         mock_print.assert_called_once_with(version("plonex"))
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_version_does_not_import_the_services(self):
+        script = (
+            "import sys\n"
+            "from plonex.cli import main\n"
+            "sys.argv = ['plonex', '--version']\n"
+            "main()\n"
+            "print(*sorted(sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        version_line, modules_line = result.stdout.splitlines()
+        self.assertEqual(version_line, version("plonex"))
+        modules = set(modules_line.split())
+        for module in (
+            "jinja2",
+            "pip_requirements_parser",
+            "plonex.services.describe",
+            "plonex.services.install",
+            "requests",
+            "setuptools",
+            "webbrowser",
+        ):
+            self.assertNotIn(module, modules)
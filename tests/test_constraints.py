@@ -0,0 +1,84 @@
+from .utils import temp_cwd
+from pip_requirements_parser import RequirementsFile  # type: ignore
+from plonex.services.install import constraints
+from plonex.services.install.constraints import parse_constraints
+from plonex.services.install.constraints import parse_constraints_file
+from textwrap import dedent
+from unittest import mock
+
+import unittest
+
+
+SAMPLE = dedent(
+    """\
+    # Plone constraints
+    -c https://dist.plone.org/release/6.1-latest/zope-constraints.txt
+    --constraint=more.txt
+    -r requirements.txt
+    -cjoined.txt
+    Products.CMFPlone==6.1.0  # the main package
+    Foo_Bar==1.0
+    foo[test, b]==2.0 ; python_version >= '3.10'
+    bar == 1.0;python_version<"3.12" and sys_platform=='linux'
+    qux===1.0
+    unpinned
+    baz>=1.0,<2
+    zope.interface==5.0 \\
+        --hash=sha256:abc
+    my.package @ git+https://github.com/example/my.package.git@main
+    -e ./src/my.package
+    --index-url https://pypi.org/simple
+    """
+)
+
+
+class TestConstraintsParser(unittest.TestCase):
+
+    def test_same_constraints_as_the_full_parser(self):
+        with temp_cwd() as cwd:
+            path = cwd / "constraints.txt"
+            path.write_text(SAMPLE)
+            expected = [
+                (requirement.name, str(requirement.marker), requirement.dumps())
+                for requirement in RequirementsFile.from_file(
+                    str(path), include_nested=False
+                ).requirements
+                if requirement.name
+            ]
+            parsed = parse_constraints_file(path)
+
+        self.assertListEqual(
+            [
+                (requirement.name, str(requirement.marker), requirement.dumps())
+                for requirement in parsed.requirements
+            ],
+            expected,
+        )
+        self.assertListEqual(
+            parsed.includes,
+            [
+                (
+                    "constraints",
+                    "https://dist.plone.org/release/6.1-latest/zope-constraints.txt",
+                ),
+                ("constraints", "more.txt"),
+                ("requirements", "requirements.txt"),
+                ("constraints", "joined.txt"),
+            ],
+        )
+
+    def test_only_exotic_lines_use_the_full_parser(self):
+        with mock.patch.object(
+            constraints,
+            "requirements_from_string",
+            wraps=constraints.requirements_from_string,
+        ) as mock_full_parser:
+            parse_constraints(SAMPLE)
+        self.assertListEqual(
+            [call.args[0] for call in mock_full_parser.call_args_list],
+            [
+                "baz>=1.0,<2",
+                "zope.interface==5.0     --hash=sha256:abc",
+                "my.package @ git+https://github.com/example/my.package.git@main",
+            ],
+        )
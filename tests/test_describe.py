@@ -23,6 +23,7 @@ class TestDescribeService(PloneXTestCase):
                 "describe_template",
                 "generate_html",
                 "browse_html",
+                "refresh_sources",
             ],
         )
 
@@ -187,6 +188,24 @@ class TestDescribeService(PloneXTestCase):
                 "https://dist.plone.org/release/6.1.2/constraints.txt",
             )
 
+    def test_profiles(self):
+        """Nested profiles are listed by increasing precedence"""
+        with temp_cwd() as cwd:
+            for name, profiles in (
+                ("base", ""),
+                ("development", "profiles:\n  - ../base\n"),
+            ):
+                (cwd / "profiles" / name / "etc").mkdir(parents=True)
+                (cwd / "profiles" / name / "etc" / "plonex.yml").write_text(profiles)
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "profiles:\n  - profiles/development\n"
+            )
+            svc = DescribeService()
+            self.assertListEqual(
+                svc.profiles, ["profiles/base", "profiles/development"]
+            )
+
     def test_supervisor_status(self):
         """Test the supervisor_status property with mocked Supervisor"""
         with temp_cwd() as cwd:
@@ -1,9 +1,12 @@
 from .utils import PloneXTestCase
 from .utils import temp_cwd
+from concurrent.futures import ThreadPoolExecutor
 from plonex.services.sources import SourcesService
+from plonex.services.sources.status import CheckoutStatus
 from unittest import mock
 
 import sh
+import threading
 
 
 class TestSourcesService(PloneXTestCase):
@@ -270,6 +273,165 @@ class TestSourcesService(PloneXTestCase):
             self.assertIn("foo.package: updating", rendered)
             self.assertIn("bar.package: updating", rendered)
 
+    def test_run_update_with_jobs_uses_a_config_per_source(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "sources:\n"
+                "    a.package:\n"
+                "      repo: https://github.com/example/a.package.git\n"
+                "    b.package:\n"
+                "      repo: https://github.com/example/b.package.git\n"
+                "    c.package:\n"
+                "      repo: https://github.com/example/c.package.git\n"
+            )
+            last_started = threading.Event()
+            configs = {}
+
+            def fake_execute(command, cwd=None, stream_output=None):
+                rendered = (cwd / "gitman.yml").read_text()
+                configs[cwd.name] = rendered
+                if "a.package" in rendered:
+                    # The first source finishes after the last one started
+                    self.assertTrue(last_started.wait(timeout=10))
+                if "c.package" in rendered:
+                    last_started.set()
+                if "b.package" in rendered:
+                    raise sh.ErrorReturnCode_1(
+                        full_cmd=["gitman", "update"], stdout=b"", stderr=b"boom\n"
+                    )
+                return ""
+
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(svc.logger, "isEnabledFor", return_value=True),
+                    mock.patch.object(svc, "execute_command", side_effect=fake_execute),
+                    mock.patch.object(svc.console, "print") as mock_print,
+                ):
+                    svc.run_update(jobs=3)
+
+            self.assertListEqual(
+                sorted(configs), ["a.package", "b.package", "c.package"]
+            )
+            for name, rendered in configs.items():
+                self.assertIn(f"- name: {name}", rendered)
+                self.assertEqual(rendered.count("- name:"), 1)
+            self.assertFalse((cwd / "var" / "gitman.yml").exists())
+            lines = [
+                str(call.args[0]) for call in mock_print.call_args_list if call.args
+            ]
+            self.assertListEqual(
+                lines,
+                [
+                    "[bold]Sources update report[/bold]",
+                    "[cyan]⏳[/cyan] a.package: updating...",
+                    "[green]✅[/green] a.package: updated",
+                    "[cyan]⏳[/cyan] b.package: updating...",
+                    "[red]❌[/red] b.package: boom",
+                    "[cyan]⏳[/cyan] c.package: updating...",
+                    "[green]✅[/green] c.package: updated",
+                    "[bold]Failed sources[/bold]",
+                    "[red]❌[/red] b.package: boom",
+                ],
+            )
+
+    def write_four_sources(self, cwd):
+        (cwd / "etc").mkdir()
+        (cwd / "etc" / "plonex.yml").write_text(
+            "sources:\n"
+            + "".join(
+                f"    {name}.package:\n"
+                f"      repo: https://github.com/example/{name}.package.git\n"
+                for name in "abcd"
+            )
+        )
+
+    def interrupt_when_updating(self, source_name):
+        def fake_print(message, *args, **kwargs):
+            if message == f"[cyan]⏳[/cyan] {source_name}: updating...":
+                raise KeyboardInterrupt
+
+        return fake_print
+
+    def test_interrupt_stops_the_pending_updates(self):
+        with temp_cwd() as cwd:
+            self.write_four_sources(cwd)
+            updated = []
+
+            def fake_update(command, source_name, *args):
+                updated.append(source_name)
+                return True, "updated"
+
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(svc.logger, "isEnabledFor", return_value=True),
+                    mock.patch.object(svc, "_update_source", side_effect=fake_update),
+                    mock.patch.object(
+                        svc.console,
+                        "print",
+                        side_effect=self.interrupt_when_updating("b.package"),
+                    ),
+                    self.assertRaises(KeyboardInterrupt),
+                ):
+                    svc.run_update(jobs=1)
+            self.assertListEqual(updated, ["a.package"])
+
+    def test_interrupt_stops_the_pending_concurrent_updates(self):
+        with temp_cwd() as cwd:
+            self.write_four_sources(cwd)
+            updated = []
+            both_started = threading.Barrier(3)
+            cancelled = threading.Event()
+
+            def fake_update(command, source_name, *args):
+                updated.append(source_name)
+                both_started.wait(timeout=10)
+                # Keep both workers busy until the queued updates are cancelled
+                self.assertTrue(cancelled.wait(timeout=10))
+                return True, "updated"
+
+            real_shutdown = ThreadPoolExecutor.shutdown
+
+            def shutdown(executor, wait=True, *, cancel_futures=False):
+                real_shutdown(executor, wait=False, cancel_futures=cancel_futures)
+                cancelled.set()
+                real_shutdown(executor, wait=wait)
+
+            def fake_print(message, *args, **kwargs):
+                if message == "[cyan]⏳[/cyan] a.package: updating...":
+                    both_started.wait(timeout=10)
+                    raise KeyboardInterrupt
+
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(svc.logger, "isEnabledFor", return_value=True),
+                    mock.patch.object(svc, "_update_source", side_effect=fake_update),
+                    mock.patch.object(svc.console, "print", side_effect=fake_print),
+                    mock.patch.object(ThreadPoolExecutor, "shutdown", shutdown),
+                    self.assertRaises(KeyboardInterrupt),
+                ):
+                    svc.run_update(jobs=2)
+            self.assertListEqual(sorted(updated), ["a.package", "b.package"])
+
+    def test_run_update_jobs_from_the_options(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "sources_update_jobs: 4\n"
+                "sources:\n"
+                "    my.package:\n"
+                "      repo: https://github.com/example/my.package.git\n"
+            )
+            with SourcesService() as svc:
+                self.assertEqual(svc.update_jobs, 4)
+                with mock.patch.object(svc, "execute_command") as mock_exec:
+                    svc.run_update()
+            mock_exec.assert_called_once_with(
+                ["gitman", "update"],
+                cwd=cwd / "var" / "gitman" / "my.package",
+                stream_output=False,
+            )
+
     def test_run_update_quiet_does_not_print_report(self):
         with temp_cwd() as cwd:
             (cwd / "etc").mkdir()
@@ -389,21 +551,16 @@ class TestSourcesService(PloneXTestCase):
                 with (
                     mock.patch.object(
                         svc,
-                        "_has_modifications",
-                        side_effect=lambda path: path == managed,
-                    ),
-                    mock.patch.object(
-                        svc,
-                        "_git_current_branch",
-                        return_value="main",
-                    ),
-                    mock.patch.object(
-                        svc,
-                        "_git_remote_url",
-                        side_effect=lambda path: (
-                            "https://github.com/example/managed.package.git"
-                            if path == managed
-                            else "https://github.com/example/extra.package.git"
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url=(
+                                "https://github.com/example/managed.package.git"
+                                if path == managed
+                                else "https://github.com/example/extra.package.git"
+                            ),
+                            branch="main",
+                            modified=path == managed,
                         ),
                     ),
                     mock.patch("plonex.services.sources.Console") as MockConsole,
@@ -447,10 +604,13 @@ class TestSourcesService(PloneXTestCase):
                     ),
                     mock.patch.object(
                         svc,
-                        "_git_remote_url",
-                        return_value="https://github.com/example/extra.package.git",
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url="https://github.com/example/extra.package.git",
+                            branch="main",
+                        ),
                     ),
-                    mock.patch.object(svc, "_git_revision", return_value="main"),
                 ):
                     svc.run_suggest_existing(apply=True)
             result = (cwd / "etc" / "plonex.yml").read_text()
@@ -476,10 +636,13 @@ class TestSourcesService(PloneXTestCase):
                     ),
                     mock.patch.object(
                         svc,
-                        "_git_remote_url",
-                        return_value="https://github.com/example/extra.package.git",
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url="https://github.com/example/extra.package.git",
+                            branch="main",
+                        ),
                     ),
-                    mock.patch.object(svc, "_git_revision", return_value="main"),
                 ):
                     svc.run_suggest_existing(apply=True)
             result = (cwd / "etc" / "plonex.yml").read_text()
@@ -502,10 +665,13 @@ class TestSourcesService(PloneXTestCase):
                     ),
                     mock.patch.object(
                         svc,
-                        "_git_remote_url",
-                        return_value="https://github.com/example/extra.package.git",
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url="https://github.com/example/extra.package.git",
+                            branch="main",
+                        ),
                     ),
-                    mock.patch.object(svc, "_git_revision", return_value="main"),
                 ):
                     svc.run_suggest_existing(apply_local=True)
             local_file = cwd / "etc" / "plonex-sources.local.yml"
@@ -532,10 +698,13 @@ class TestSourcesService(PloneXTestCase):
                     ),
                     mock.patch.object(
                         svc,
-                        "_git_remote_url",
-                        return_value="https://github.com/example/extra.package.git",
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url="https://github.com/example/extra.package.git",
+                            branch="main",
+                        ),
                     ),
-                    mock.patch.object(svc, "_git_revision", return_value="main"),
                 ):
                     svc.run_suggest_existing(apply_profile=True)
             profile_file = profile_dir / "etc" / "plonex.yml"
@@ -558,10 +727,13 @@ class TestSourcesService(PloneXTestCase):
                     ),
                     mock.patch.object(
                         svc,
-                        "_git_remote_url",
-                        return_value="https://github.com/example/extra.package.git",
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url="https://github.com/example/extra.package.git",
+                            branch="main",
+                        ),
                     ),
-                    mock.patch.object(svc, "_git_revision", return_value="main"),
                     mock.patch.object(svc.logger, "error") as mock_error,
                 ):
                     svc.run_suggest_existing(apply_profile=True)
@@ -603,10 +775,13 @@ class TestSourcesService(PloneXTestCase):
                     mock.patch.object(svc, "existing_checkouts", return_value=[nested]),
                     mock.patch.object(
                         svc,
-                        "_git_remote_url",
-                        return_value="https://github.com/example/extra.package.git",
+                        "checkout_status",
+                        side_effect=lambda path: CheckoutStatus(
+                            path=path,
+                            remote_url="https://github.com/example/extra.package.git",
+                            branch="main",
+                        ),
                     ),
-                    mock.patch.object(svc, "_git_revision", return_value="main"),
                 ):
                     rendered = svc.render_suggestions_yaml()
             self.assertIn("path: src/nested/extra.package", rendered)
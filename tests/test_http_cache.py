@@ -0,0 +1,115 @@
+from .utils import PloneXTestCase
+from .utils import serve_files
+from .utils import temp_cwd
+from plonex.http_cache import HttpCache
+from plonex.http_cache import is_immutable
+from plonex.http_cache import session
+from unittest import mock
+
+import requests
+
+
+class TestHttpCache(PloneXTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = self.enterContext(temp_cwd())
+        self.files = {
+            "/release/6.1-latest/constraints.txt": "plone==6.1.3\n",
+            "/release/6.1.3/constraints.txt": "plone==6.1.3\n",
+        }
+        self.base_url, self.log = self.enterContext(serve_files(self.files))
+
+    def cache(self) -> HttpCache:
+        """A cache sharing the folder with the other instances, like a new process"""
+        return HttpCache(folder=self.temp_dir / "cache")
+
+    def test_is_immutable(self):
+        self.assertTrue(is_immutable("https://dist.plone.org/release/6.0.11/c.txt"))
+        self.assertTrue(is_immutable("https://dist.plone.org/release/6.1.0rc1/c.txt"))
+        self.assertFalse(
+            is_immutable("https://dist.plone.org/release/6.1-latest/c.txt")
+        )
+        self.assertFalse(is_immutable("https://dist.plone.org/release/6.1/c.txt"))
+        self.assertFalse(is_immutable("https://example.org/constraints-6.0.11.txt"))
+
+    def test_warm_run_revalidates_without_downloading(self):
+        url = f"{self.base_url}/release/6.1-latest/constraints.txt"
+        path = self.cache().fetch(url)
+        self.assertEqual(path.read_text(), "plone==6.1.3\n")
+
+        cache = self.cache()
+        self.assertEqual(cache.fetch(url), path)
+        self.assertEqual(cache.fetch(url), path)
+        self.assertEqual(cache.downloads, 0)
+        # One revalidation per process
+        self.assertListEqual(
+            self.log,
+            [
+                ("/release/6.1-latest/constraints.txt", 200),
+                ("/release/6.1-latest/constraints.txt", 304),
+            ],
+        )
+
+    def test_changed_file_is_downloaded_again(self):
+        url = f"{self.base_url}/release/6.1-latest/constraints.txt"
+        self.cache().fetch(url)
+        self.files["/release/6.1-latest/constraints.txt"] = "plone==6.1.4\n"
+        cache = self.cache()
+        self.assertEqual(cache.fetch(url).read_text(), "plone==6.1.4\n")
+        self.assertEqual(cache.downloads, 1)
+
+    def test_immutable_url_is_not_revalidated(self):
+        url = f"{self.base_url}/release/6.1.3/constraints.txt"
+        self.cache().fetch(url)
+        self.cache().fetch(url)
+        self.assertListEqual(self.log, [("/release/6.1.3/constraints.txt", 200)])
+
+    def test_offline(self):
+        url = f"{self.base_url}/release/6.1-latest/constraints.txt"
+        with self.assertRaisesRegex(FileNotFoundError, "offline"):
+            self.cache().fetch(url, offline=True)
+        path = self.cache().fetch(url)
+        self.assertEqual(self.cache().fetch(url, offline=True), path)
+        self.assertEqual(len(self.log), 1)
+
+    def test_unreachable_server_uses_the_cached_copy(self):
+        url = f"{self.base_url}/release/6.1-latest/constraints.txt"
+        path = self.cache().fetch(url)
+        with mock.patch.object(
+            requests.Session, "get", side_effect=requests.ConnectionError
+        ):
+            self.assertEqual(self.cache().fetch(url), path)
+            with self.assertRaises(requests.ConnectionError):
+                self.cache().fetch(f"{self.base_url}/other.txt")
+
+    def test_slow_server_uses_the_cached_copy(self):
+        url = f"{self.base_url}/release/6.1-latest/constraints.txt"
+        path = self.cache().fetch(url)
+        with mock.patch.object(
+            requests.Session, "get", side_effect=requests.ReadTimeout
+        ):
+            self.assertEqual(self.cache().fetch(url), path)
+            with self.assertRaises(requests.Timeout):
+                self.cache().fetch(f"{self.base_url}/other.txt")
+
+    def test_server_error_uses_the_cached_copy(self):
+        url = f"{self.base_url}/release/6.1-latest/constraints.txt"
+        path = self.cache().fetch(url)
+        response = requests.Response()
+        response.status_code = 503
+        with mock.patch.object(requests.Session, "get", return_value=response):
+            cache = self.cache()
+            self.assertEqual(cache.fetch(url), path)
+            self.assertEqual(path.read_text(), "plone==6.1.3\n")
+            self.assertEqual(cache.downloads, 0)
+            with self.assertRaises(requests.HTTPError):
+                self.cache().fetch(f"{self.base_url}/other.txt")
+
+    def test_missing_file(self):
+        with self.assertRaises(requests.HTTPError):
+            self.cache().fetch(f"{self.base_url}/missing.txt")
+        self.assertListEqual(list((self.temp_dir / "cache").glob("*")), [])
+
+    def test_session_is_shared(self):
+        self.assertIs(session(), session())
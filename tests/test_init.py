@@ -162,8 +162,8 @@ class TestInit(PloneXTestCase):
             (cwd / ".venv" / "bin").mkdir(parents=True)
             (cwd / ".venv" / "bin" / "activate").touch()
             with (
-                mock.patch("plonex.services.init.InstallService") as MockInstall,
-                mock.patch("plonex.services.init.Supervisor") as MockSupervisor,
+                mock.patch("plonex.services.install.InstallService") as MockInstall,
+                mock.patch("plonex.services.supervisor.Supervisor") as MockSupervisor,
             ):
                 MockInstall.return_value.__enter__ = mock.Mock(
                     return_value=MockInstall.return_value
@@ -186,8 +186,8 @@ class TestInit(PloneXTestCase):
             (cwd / ".venv" / "bin" / "activate").touch()
             (cwd / ".gitignore").write_text("existing\n")
             with (
-                mock.patch("plonex.services.init.InstallService") as MockInstall,
-                mock.patch("plonex.services.init.Supervisor") as MockSupervisor,
+                mock.patch("plonex.services.install.InstallService") as MockInstall,
+                mock.patch("plonex.services.supervisor.Supervisor") as MockSupervisor,
             ):
                 MockInstall.return_value.__enter__ = mock.Mock(
                     return_value=MockInstall.return_value
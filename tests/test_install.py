@@ -1,15 +1,29 @@
 from .utils import PloneXTestCase
 from .utils import ReadExpected
+from .utils import serve_files
 from .utils import temp_cwd
 from contextlib import contextmanager
 from pathlib import Path
+from pip_requirements_parser import RequirementsFile  # type: ignore
+from plonex.base import BaseService
+from plonex.http_cache import HttpCache
+from plonex.http_cache import session
 from plonex.services.install import InstallService
 from plonex.services.install import name_as_pep503
+from plonex.services.install.constraints import parse_constraints_file
+from plonex.services.install.distributions import installed_distributions
+from plonex.services.install.distributions import read_distribution
+from plonex.services.install.distributions import scan_distributions
+from plonex.services.install.state import InstalledState
 from textwrap import dedent
 from types import SimpleNamespace
 from unittest import mock
 
 import inspect
+import json
+import sh  # type: ignore[import-untyped]
+import sys
+import zipfile
 
 
 read_expected = ReadExpected(Path(__file__).parent / "expected" / "install")
@@ -26,6 +40,50 @@ def stub_virtualenv(install):
         yield
 
 
+def install_distribution(
+    target: Path, name: str, version: str, direct_url: dict | None = None
+) -> Path:
+    """Create the metadata of a distribution installed in the .venv stub"""
+    dist_info = (
+        target
+        / ".venv"
+        / "lib"
+        / "python3.12"
+        / "site-packages"
+        / f"{name_as_pep503(name).replace('-', '_')}-{version}.dist-info"
+    )
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text(
+        f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n\n"
+        "Name: not a header\n"
+    )
+    if direct_url is not None:
+        (dist_info / "direct_url.json").write_text(json.dumps(direct_url))
+    return dist_info
+
+
+def make_wheel(folder: Path, name: str, version: str) -> Path:
+    """Create a minimal pure Python wheel"""
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        f"{name}/__init__.py": "",
+        f"{dist_info}/METADATA": (
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+        ),
+        f"{dist_info}/WHEEL": (
+            "Wheel-Version: 1.0\nGenerator: plonex\n"
+            "Root-Is-Purelib: true\nTag: py3-none-any\n"
+        ),
+    }
+    record = "".join(f"{path},,\n" for path in files) + f"{dist_info}/RECORD,,\n"
+    path = folder / f"{name}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(path, "w") as wheel:
+        for filename, content in files.items():
+            wheel.writestr(filename, content)
+        wheel.writestr(f"{dist_info}/RECORD", record)
+    return path
+
+
 @contextmanager
 def temp_install(**kwargs):
     with temp_cwd():
@@ -46,7 +104,8 @@ def mock_remote_constraints(mapping=None):
         response.raise_for_status = mock.Mock()
         return response
 
-    with mock.patch("plonex.services.install.requests.get", side_effect=fake_get):
+    with mock.patch("plonex.services.install.session") as mock_session:
+        mock_session.return_value.get.side_effect = fake_get
         yield
 
 
@@ -404,6 +463,24 @@ class TestInit(PloneXTestCase):
             self.assertTrue((venv_bin / "activate").exists())
             self.assertGreaterEqual(mock_run.call_count, 2)
 
+    def test_ensure_virtualenv_restores_an_adopted_virtualenv(self):
+        with temp_cwd() as cwd:
+            install = InstallService(dont_ask=True)
+            # Left by an adoption interrupted before .venv was replaced
+            adopted = cwd / ".venvs" / "adopted-20240101-000000"
+            (adopted / "bin").mkdir(parents=True)
+            (adopted / "bin" / "activate").touch()
+            (adopted / "bin" / "uv").touch()
+
+            with (
+                mock.patch.object(install, "execute_command") as mock_execute,
+                mock.patch.object(install.logger, "warning") as mock_warning,
+            ):
+                install.ensure_virtualenv()
+            mock_execute.assert_not_called()
+            mock_warning.assert_called_once()
+            self.assertEqual(install.virtualenvs.current(), adopted)
+
     def test_ensure_virtualenv_prompts_for_python_when_needed(self):
         with temp_cwd() as cwd:
             install = InstallService(dont_ask=False)
@@ -430,6 +507,90 @@ class TestInit(PloneXTestCase):
                         install.ensure_virtualenv()
             MockConsole.return_value.input.assert_called_once()
 
+    def test_ensure_virtualenv_with_the_host_uv(self):
+        with temp_cwd() as cwd:
+            install = InstallService(
+                dont_ask=True,
+                cli_options={
+                    "python": "/usr/bin/python3.12",
+                    "uv": "/usr/local/bin/uv",
+                    "uv_cache_dir": "~/.cache/plonex-uv",
+                    "uv_link_mode": "hardlink",
+                },
+            )
+            venv = cwd / ".venv"
+
+            def fake_execute(command, cwd=None):
+                if command[1] == "venv":
+                    (venv / "bin").mkdir(parents=True)
+                    (venv / "bin" / "activate").touch()
+                return ""
+
+            with mock.patch.object(
+                install, "execute_command", side_effect=fake_execute
+            ) as mock_execute:
+                install.ensure_virtualenv()
+
+            cache_options = [
+                "--cache-dir",
+                str(Path("~/.cache/plonex-uv").expanduser()),
+                "--link-mode",
+                "hardlink",
+            ]
+            self.assertListEqual(
+                [call.args[0] for call in mock_execute.call_args_list],
+                [
+                    [
+                        "/usr/local/bin/uv",
+                        "venv",
+                        "--seed",
+                        "--python",
+                        "/usr/bin/python3.12",
+                        *cache_options,
+                        str(venv),
+                    ],
+                    [
+                        "/usr/local/bin/uv",
+                        "pip",
+                        "install",
+                        "--python",
+                        str(venv / "bin" / "python"),
+                        *cache_options,
+                        "uv",
+                    ],
+                ],
+            )
+
+    def test_host_uv_from_which(self):
+        with temp_cwd():
+            install = InstallService(dont_ask=True)
+            error = sh.ErrorReturnCode_1("which uv", b"", b"")
+            with mock.patch.object(install, "execute_command", side_effect=error):
+                self.assertIsNone(install.host_uv)
+            install = InstallService(dont_ask=True, cli_options={"uv": False})
+            self.assertIsNone(install.host_uv)
+
+    def test_uv_commands_share_the_cache(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: null\n"
+                "uv_cache_dir: var/uv-cache\n"
+                "uv_link_mode: clone\n"
+            )
+            install = InstallService(dont_ask=True)
+            with stub_virtualenv(install), install:
+                pass
+            cache_options = ["--cache-dir", str(cwd / "var" / "uv-cache")]
+            link_options = ["--link-mode", "clone"]
+            self.assertListEqual(install.command[3:7], cache_options + link_options)
+            self.assertListEqual(
+                install.sync_command[3:7], cache_options + link_options
+            )
+            # Nothing is installed when compiling
+            self.assertListEqual(install.compile_command[3:5], cache_options)
+            self.assertNotIn("--link-mode", install.compile_command)
+
     def test_add_packages(self):
         with temp_install() as install:
             with mock.patch("plonex.services.install.datetime") as mock_datetime:
@@ -650,15 +811,10 @@ class TestInit(PloneXTestCase):
                 mock.patch.object(InstallService, "make_requirements_txt"),
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command") as mock_run_command,
-                mock.patch.object(
-                    install, "execute_command", return_value=""
-                ) as mock_execute,
+                mock.patch.object(install, "execute_command") as mock_execute,
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
             ):
                 with install:
@@ -669,7 +825,8 @@ class TestInit(PloneXTestCase):
             self.assertEqual(mock_run_command.call_count, 2)
             mock_run_command.assert_any_call(install.compile_command)
             mock_run_command.assert_any_call(install.sync_command)
-            mock_execute.assert_called_once()
+            # The installed distributions are read without running pip freeze
+            mock_execute.assert_not_called()
 
     def test_run_with_persist(self):
         with temp_cwd() as cwd:
@@ -683,21 +840,15 @@ class TestInit(PloneXTestCase):
             requirements_file = install.var_folder / "requirements.txt"
             constraints_file.write_text("# header\n")
             requirements_file.write_text("# header\n")
-            installed_req = self._fake_requirement(dumps="foo==1.0.0")
+            install_distribution(cwd, "foo", "1.0.0")
             with (
                 mock.patch.object(InstallService, "ensure_virtualenv"),
                 mock.patch.object(InstallService, "make_requirements_txt"),
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command"),
-                mock.patch.object(
-                    install, "execute_command", return_value="foo==1.0.0\n"
-                ),
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[installed_req]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
                 mock.patch("plonex.services.install.datetime") as mock_datetime,
             ):
@@ -723,7 +874,7 @@ class TestInit(PloneXTestCase):
             requirements_file = install.var_folder / "requirements.txt"
             constraints_file.write_text("# header\n")
             requirements_file.write_text("# header\n")
-            installed_req = self._fake_requirement(dumps="foo==1.0.0")
+            install_distribution(cwd, "foo", "1.0.0")
             existing = (
                 cwd / "etc" / "constraints.d" / "999-20260321-100002-autoinstalled.txt"
             )
@@ -733,15 +884,9 @@ class TestInit(PloneXTestCase):
                 mock.patch.object(InstallService, "make_requirements_txt"),
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command"),
-                mock.patch.object(
-                    install, "execute_command", return_value="foo==1.0.0\n"
-                ),
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[installed_req]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
                 mock.patch("plonex.services.install.datetime") as mock_datetime,
             ):
@@ -766,21 +911,15 @@ class TestInit(PloneXTestCase):
             requirements_file = install.var_folder / "requirements.txt"
             constraints_file.write_text("# header\n")
             requirements_file.write_text("# header\n")
-            installed_req = self._fake_requirement(dumps="foo==1.0.0")
+            install_distribution(cwd, "foo", "1.0.0")
             with (
                 mock.patch.object(InstallService, "ensure_virtualenv"),
                 mock.patch.object(InstallService, "make_requirements_txt"),
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command"),
-                mock.patch.object(
-                    install, "execute_command", return_value="foo==1.0.0\n"
-                ),
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[installed_req]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
             ):
                 with install:
@@ -809,21 +948,15 @@ class TestInit(PloneXTestCase):
             requirements_file = install.var_folder / "requirements.txt"
             constraints_file.write_text("# header\n")
             requirements_file.write_text("# header\n")
-            installed_req = self._fake_requirement(dumps="foo==1.0.0")
+            install_distribution(cwd, "foo", "1.0.0")
             with (
                 mock.patch.object(InstallService, "ensure_virtualenv"),
                 mock.patch.object(InstallService, "make_requirements_txt"),
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command"),
-                mock.patch.object(
-                    install, "execute_command", return_value="foo==1.0.0\n"
-                ),
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[installed_req]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
                 mock.patch("plonex.services.install.datetime") as mock_datetime,
             ):
@@ -853,22 +986,16 @@ class TestInit(PloneXTestCase):
             requirements_file = install.var_folder / "requirements.txt"
             constraints_file.write_text("# header\n")
             requirements_file.write_text("# header\n")
-            installed_req = self._fake_requirement(dumps="foo==1.0.0")
+            install_distribution(cwd, "foo", "1.0.0")
             with mock.patch.object(install.logger, "warning") as mock_warning:
                 with (
                     mock.patch.object(InstallService, "ensure_virtualenv"),
                     mock.patch.object(InstallService, "make_requirements_txt"),
                     mock.patch.object(InstallService, "make_constraints_txt"),
                     mock.patch.object(install, "run_command"),
-                    mock.patch.object(
-                        install, "execute_command", return_value="foo==1.0.0\n"
-                    ),
                     mock.patch(
                         "plonex.services.install.RequirementsFile.from_file",
-                        side_effect=[
-                            SimpleNamespace(requirements=[], options=[]),
-                            SimpleNamespace(requirements=[installed_req]),
-                        ],
+                        return_value=SimpleNamespace(requirements=[], options=[]),
                     ),
                     mock.patch("plonex.services.install.Console") as MockConsole,
                 ):
@@ -903,20 +1030,16 @@ class TestInit(PloneXTestCase):
             remote_response.raise_for_status = mock.Mock()
 
             (install.etc_folder / "plonex.yml").write_text("{}\n")
+            install_distribution(cwd, "foo", "1.0.0")
+            install_distribution(cwd, "bar", "2.0.0")
 
             with mock.patch.object(install.logger, "warning") as mock_warning:
-                with mock.patch(
-                    "plonex.services.install.requests.get", return_value=remote_response
-                ):
+                with mock.patch("plonex.services.install.session") as mock_session:
+                    mock_session.return_value.get.return_value = remote_response
                     with mock.patch.object(InstallService, "ensure_virtualenv"):
                         with mock.patch.object(install, "run_command"):
-                            with mock.patch.object(
-                                install,
-                                "execute_command",
-                                return_value="foo==1.0.0\nbar==2.0.0\n",
-                            ):
-                                with install:
-                                    install.run()
+                            with install:
+                                install.run()
 
             self.assertFalse(
                 any(
@@ -971,6 +1094,192 @@ class TestInit(PloneXTestCase):
             self.assertEqual(resolved["bar"], "bar==1.0.0")
             self.assertEqual(resolved["foo"], "foo==3.0.0")
 
+    def _enter_install(self) -> mock.Mock:
+        """Enter a new install service, return a mock tracking the regenerations"""
+        install = InstallService(dont_ask=True)
+        make_constraints_txt = mock.Mock(side_effect=install.make_constraints_txt)
+        with stub_virtualenv(install):
+            with mock.patch.object(
+                install, "make_constraints_txt", make_constraints_txt
+            ):
+                with install:
+                    pass
+        return make_constraints_txt
+
+    def test_unchanged_inputs_do_not_regenerate_the_files(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc" / "constraints.d").mkdir(parents=True)
+            (cwd / "etc" / "constraints.d" / "pins.txt").write_text("foo==1.0\n")
+            (cwd / "etc" / "plonex.yml").write_text("plonex_base_constraint: null\n")
+            self._enter_install().assert_called_once()
+            outputs = [
+                cwd / "var" / "requirements.txt",
+                cwd / "var" / "constraints.txt",
+            ]
+            mtimes = [path.stat().st_mtime_ns for path in outputs]
+
+            self._enter_install().assert_not_called()
+            self.assertListEqual([path.stat().st_mtime_ns for path in outputs], mtimes)
+
+    def test_changed_inputs_regenerate_the_files(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc" / "constraints.d").mkdir(parents=True)
+            (cwd / "etc" / "requirements.d").mkdir(parents=True)
+            (cwd / "etc" / "plonex.yml").write_text("plonex_base_constraint: null\n")
+            pins = cwd / "etc" / "constraints.d" / "pins.txt"
+            pins.write_text("-c nested.txt\nfoo==1.0\n")
+            nested = cwd / "etc" / "constraints.d" / "nested.txt"
+            nested.write_text("bar==1.0\n")
+            package = cwd / "src" / "my.package"
+            package.mkdir(parents=True)
+            (cwd / "etc" / "requirements.d" / "dev.txt").write_text(f"-e {package}\n")
+            self._enter_install().assert_called_once()
+
+            def changes_regenerate(change):
+                change()
+                self._enter_install().assert_called_once()
+                self._enter_install().assert_not_called()
+
+            changes_regenerate(lambda: pins.write_text("foo==2.0\n-c nested.txt\n"))
+            changes_regenerate(lambda: nested.write_text("bar==2.0\n"))
+            changes_regenerate(
+                lambda: (cwd / "etc" / "requirements.d" / "more.txt").write_text(
+                    "baz\n"
+                )
+            )
+            changes_regenerate(
+                lambda: (package / "pyproject.toml").write_text(
+                    '[project]\nname = "my-package"\n'
+                )
+            )
+            changes_regenerate(
+                lambda: (cwd / "etc" / "plonex.yml").write_text(
+                    "plonex_base_constraint: null\npip_requirements:\n  - qux\n"
+                )
+            )
+            changes_regenerate(
+                lambda: (cwd / "var" / "constraints.txt").write_text("edited\n")
+            )
+            self.assertIn("foo==2.0", (cwd / "var" / "constraints.txt").read_text())
+
+    def test_changed_remote_constraints_regenerate_the_files(self):
+        files = {"/release/6.2-latest/constraints.txt": "plone==6.2.0\n"}
+        self.addCleanup(
+            setattr, BaseService, "http_cache_enabled", BaseService.http_cache_enabled
+        )
+        BaseService.http_cache_enabled = True
+        with temp_cwd() as cwd, serve_files(files) as (base_url, log):
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: "
+                f"{base_url}/release/6.2-latest/constraints.txt\n"
+            )
+
+            def enter():
+                with mock.patch(
+                    "plonex.services.install.http_cache",
+                    HttpCache(folder=cwd / "cache"),
+                ):
+                    return self._enter_install()
+
+            enter().assert_called_once()
+            enter().assert_not_called()
+            files["/release/6.2-latest/constraints.txt"] = "plone==6.2.1\n"
+            enter().assert_called_once()
+            self.assertIn("plone==6.2.1", (cwd / "var" / "constraints.txt").read_text())
+        self.assertListEqual([status for _, status in log], [200, 304, 200])
+
+    def test_includes_without_the_cache_share_the_session(self):
+        files = {
+            "/constraints.txt": "-c base.txt\n-c extra.txt\nplone==6.2.0\n",
+            "/base.txt": "zope==5.13\n",
+            "/extra.txt": "requests==2.32.0\n",
+        }
+        self.addCleanup(
+            setattr, BaseService, "http_cache_enabled", BaseService.http_cache_enabled
+        )
+        BaseService.http_cache_enabled = False
+        with temp_cwd(), serve_files(files) as (base_url, log):
+            install = InstallService()
+            with mock.patch(
+                "plonex.services.install.session", wraps=session
+            ) as mock_session:
+                install._prefetch_remote_sources([f"{base_url}/constraints.txt"])
+            self.assertEqual(mock_session.call_count, 3)
+        self.assertListEqual(
+            sorted(path for path, _ in log),
+            ["/base.txt", "/constraints.txt", "/extra.txt"],
+        )
+
+    def test_warm_run_does_not_download_the_remote_constraints(self):
+        files = {
+            "/release/6.2-latest/constraints.txt": "-c base.txt\nplone==6.2.0\n",
+            "/release/6.2-latest/base.txt": "zope==5.13\n",
+        }
+        self.addCleanup(
+            setattr, BaseService, "http_cache_enabled", BaseService.http_cache_enabled
+        )
+        BaseService.http_cache_enabled = True
+        with temp_cwd() as cwd, serve_files(files) as (base_url, log):
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: "
+                f"{base_url}/release/6.2-latest/constraints.txt\n"
+            )
+            for _ in range(2):
+                # A new cache instance behaves like a new plonex process
+                cache = HttpCache(folder=cwd / "cache")
+                with mock.patch("plonex.services.install.http_cache", cache):
+                    install = InstallService(dont_ask=True)
+                    install.make_constraints_txt()
+                self.assertListEqual(
+                    install.constrainst_txt.read_text().splitlines(),
+                    [
+                        "# This file is generated by plonex",
+                        "plone==6.2.0",
+                        "zope==5.13",
+                    ],
+                )
+        self.assertEqual(cache.downloads, 0)
+        self.assertListEqual([status for _, status in log], [200, 200, 304, 304])
+
+    def test_remote_includes_are_fetched_breadth_first_once(self):
+        files = {
+            "/constraints.txt": "-c a.txt\n-c b.txt\nplone==6.2.0\n",
+            "/a.txt": "-c c.txt\nzope==5.13\nshared==1.0\n",
+            "/b.txt": "-c c.txt\nshared==2.0\n",
+            "/c.txt": "deep==1.0\nshared==3.0\n",
+        }
+        self.addCleanup(
+            setattr, BaseService, "http_cache_enabled", BaseService.http_cache_enabled
+        )
+        BaseService.http_cache_enabled = True
+        with temp_cwd() as cwd, serve_files(files) as (base_url, log):
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                f"plonex_base_constraint: {base_url}/constraints.txt\n"
+            )
+            cache = HttpCache(folder=cwd / "cache")
+            with mock.patch("plonex.services.install.http_cache", cache):
+                install = InstallService(dont_ask=True)
+                install.make_constraints_txt()
+            constraints = install.constrainst_txt.read_text().splitlines()
+        paths = [path for path, _ in log]
+        self.assertEqual(paths[0], "/constraints.txt")
+        self.assertEqual(sorted(paths[1:3]), ["/a.txt", "/b.txt"])
+        self.assertListEqual(paths[3:], ["/c.txt"])
+        # The first include wins, as when the files are read one by one
+        self.assertListEqual(
+            constraints,
+            [
+                "# This file is generated by plonex",
+                "deep==1.0",
+                "plone==6.2.0",
+                "shared==3.0",
+                "zope==5.13",
+            ],
+        )
+
     def test_run_with_git_constraint_does_not_report_missing(self):
         with temp_cwd() as cwd:
             install = InstallService(dont_ask=True)
@@ -984,23 +1293,22 @@ class TestInit(PloneXTestCase):
                 "my.package @ " "git+https://github.com/example/my.package.git@main\n"
             )
             (install.etc_folder / "plonex.yml").write_text("{}\n")
+            install_distribution(
+                cwd,
+                "my.package",
+                "1.0",
+                direct_url={
+                    "url": "https://github.com/example/my.package.git",
+                    "vcs_info": {"vcs": "git", "commit_id": "0123456789abcdef"},
+                },
+            )
 
             with mock.patch.object(install.logger, "warning") as mock_warning:
                 with mock_remote_constraints():
                     with mock.patch.object(InstallService, "ensure_virtualenv"):
                         with mock.patch.object(install, "run_command"):
-                            with mock.patch.object(
-                                install,
-                                "execute_command",
-                                return_value=(
-                                    "my.package @ "
-                                    "git+https://github.com/example/"
-                                    "my.package.git@"
-                                    "0123456789abcdef\n"
-                                ),
-                            ):
-                                with install:
-                                    install.run()
+                            with install:
+                                install.run()
 
             self.assertFalse(
                 any(
@@ -1038,13 +1346,9 @@ class TestInit(PloneXTestCase):
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command"),
                 mock.patch("plonex.services.install.SourcesService") as MockGitman,
-                mock.patch.object(install, "execute_command", return_value=""),
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
             ):
                 MockGitman.return_value.__enter__ = mock.Mock(
@@ -1089,13 +1393,9 @@ class TestInit(PloneXTestCase):
                 mock.patch.object(InstallService, "make_constraints_txt"),
                 mock.patch.object(install, "run_command"),
                 mock.patch.object(install, "update_gitman_sources") as mock_update,
-                mock.patch.object(install, "execute_command", return_value=""),
                 mock.patch(
                     "plonex.services.install.RequirementsFile.from_file",
-                    side_effect=[
-                        SimpleNamespace(requirements=[], options=[]),
-                        SimpleNamespace(requirements=[]),
-                    ],
+                    return_value=SimpleNamespace(requirements=[], options=[]),
                 ),
             ):
                 with install:
@@ -1104,3 +1404,448 @@ class TestInit(PloneXTestCase):
                     install.run(update_sources=None)
 
             mock_update.assert_called_once()
+
+    def _run_install(self, **kwargs) -> mock.Mock:
+        """Run a new install service, return the mock of run_command"""
+        install = InstallService(dont_ask=True)
+        with (
+            stub_virtualenv(install),
+            mock.patch.object(install, "run_command") as mock_run_command,
+            mock.patch("plonex.services.install.Console"),
+        ):
+            with install:
+                install.run(**kwargs)
+        return mock_run_command
+
+    def _make_project(self, cwd: Path) -> Path:
+        """Create a project with a virtualenv holding one distribution"""
+        (cwd / "etc" / "constraints.d").mkdir(parents=True)
+        (cwd / "etc" / "constraints.d" / "pins.txt").write_text("foo==1.0\n")
+        (cwd / "etc" / "plonex.yml").write_text("plonex_base_constraint: null\n")
+        return install_distribution(cwd, "foo", "1.0").parent
+
+    def test_run_is_a_no_op_when_nothing_changed(self):
+        with temp_cwd() as cwd:
+            self._make_project(cwd)
+            self._run_install().assert_called_once()
+            self._run_install().assert_not_called()
+
+            # Something was installed behind our back
+            install_distribution(cwd, "bar", "2.0")
+            self._run_install().assert_called_once()
+            self._run_install().assert_not_called()
+
+            # The constraints changed
+            (cwd / "etc" / "constraints.d" / "pins.txt").write_text("foo==1.1\n")
+            self._run_install().assert_called_once()
+            self._run_install().assert_not_called()
+
+            # A plain installation does not make the virtualenv synchronized
+            self.assertEqual(self._run_install(sync=True).call_count, 2)
+            self._run_install(sync=True).assert_not_called()
+            self._run_install().assert_not_called()
+
+    def test_no_op_run_reports_the_recorded_missing_constraints(self):
+        with temp_cwd() as cwd:
+            self._make_project(cwd)
+            install_distribution(cwd, "bar", "2.0")
+            self._run_install()
+            with mock.patch(
+                "plonex.services.install.scan_distributions"
+            ) as mock_scan_distributions:
+                mock_run_command = self._run_install(persist_local=True)
+            mock_run_command.assert_not_called()
+            mock_scan_distributions.assert_not_called()
+            saved = cwd / "etc" / "constraints.d" / "999-autoinstalled.local.txt"
+            self.assertEqual(saved.read_text(), "bar==2.0\n")
+
+    def test_failed_install_is_not_recorded(self):
+        with temp_cwd() as cwd:
+            self._make_project(cwd)
+            self._run_install()
+            (cwd / "etc" / "constraints.d" / "pins.txt").write_text("foo==1.1\n")
+            install = InstallService(dont_ask=True)
+            with (
+                stub_virtualenv(install),
+                mock.patch.object(install, "run_command", side_effect=RuntimeError),
+            ):
+                with install:
+                    with self.assertRaises(RuntimeError):
+                        install.run()
+            self._run_install().assert_called_once()
+
+    def test_check_reports_drift_without_installing(self):
+        with temp_cwd() as cwd:
+            site_packages = self._make_project(cwd)
+
+            def check(**kwargs) -> bool:
+                install = InstallService(dont_ask=True)
+                with (
+                    mock.patch.object(install, "ensure_virtualenv") as mock_ensure,
+                    mock.patch.object(install, "run_command") as mock_run_command,
+                    mock.patch.object(install.logger, "warning") as mock_warning,
+                ):
+                    result = install.check(**kwargs)
+                mock_ensure.assert_not_called()
+                mock_run_command.assert_not_called()
+                self.assertEqual(mock_warning.call_count, 0 if result else 1)
+                return result
+
+            self.assertFalse(check())
+            (cwd / ".venv" / "bin").mkdir()
+            (cwd / ".venv" / "bin" / "activate").touch()
+            self.assertFalse(check())
+            # Checking never generates the requirements
+            self.assertFalse((cwd / "var" / "requirements.txt").exists())
+            self._run_install()
+            self.assertTrue(check())
+            self.assertFalse(check(sync=True))
+            (site_packages / "foo-1.0.dist-info").rename(
+                site_packages / "foo-1.1.dist-info"
+            )
+            self.assertFalse(check())
+            (site_packages / "foo-1.1.dist-info").rename(
+                site_packages / "foo-1.0.dist-info"
+            )
+            self.assertTrue(check())
+            constraints = (cwd / "var" / "constraints.txt").read_text()
+            (cwd / "etc" / "constraints.d" / "pins.txt").write_text("foo==1.1\n")
+            self.assertFalse(check())
+            self.assertEqual((cwd / "var" / "constraints.txt").read_text(), constraints)
+
+    def test_installed_state_describes_the_drift(self):
+        with temp_cwd() as cwd:
+            site_packages = cwd / ".venv" / "lib" / "python3.12" / "site-packages"
+            (site_packages / "foo-1.0.dist-info").mkdir(parents=True)
+            (site_packages / "bar-2.0.dist-info").mkdir()
+            (site_packages / "foo").mkdir()
+            distributions = installed_distributions(cwd / ".venv")
+            self.assertListEqual(
+                distributions,
+                [
+                    "lib/python3.12/site-packages/bar-2.0.dist-info",
+                    "lib/python3.12/site-packages/foo-1.0.dist-info",
+                ],
+            )
+            state = InstalledState(path=cwd / "state.json")
+            self.assertListEqual(
+                state.drift("key", distributions), ["no installation was recorded"]
+            )
+            state.store("key", distributions, {"bar==2.0"}, sync=False)
+            self.assertListEqual(state.drift("key", distributions), [])
+            self.assertListEqual(state.missing, ["bar==2.0"])
+            self.assertListEqual(
+                state.drift("other", distributions[:1] + ["baz-3.0.dist-info"]),
+                [
+                    "the requirements or the constraints changed",
+                    "added distributions: baz-3.0",
+                    "removed distributions: foo-1.0",
+                ],
+            )
+
+    def test_scan_distributions_reads_the_metadata(self):
+        with temp_cwd() as cwd:
+            install_distribution(cwd, "Foo_Bar", "1.0")
+            install_distribution(
+                cwd,
+                "baz",
+                "2.0",
+                direct_url={
+                    "url": "https://github.com/example/baz.git",
+                    "vcs_info": {"vcs": "git", "commit_id": "abc123"},
+                    "subdirectory": "src",
+                },
+            )
+            install_distribution(
+                cwd,
+                "qux",
+                "3.0",
+                direct_url={
+                    "url": "https://example.org/qux-3.0.tar.gz",
+                    "archive_info": {"hash": "sha256=0123"},
+                },
+            )
+            install_distribution(
+                cwd,
+                "my.package",
+                "0.1.dev0",
+                direct_url={
+                    "url": "file:///src/my.package",
+                    "dir_info": {"editable": True},
+                },
+            )
+            site_packages = cwd / ".venv" / "lib" / "python3.12" / "site-packages"
+            (site_packages / "legacy-4.0-py3.12.egg-info").write_text(
+                "Metadata-Version: 1.0\nName: legacy\nVersion: 4.0\n"
+            )
+            (site_packages / "broken-1.0.dist-info").mkdir()
+
+            self.assertIsNone(read_distribution(site_packages / "broken-1.0.dist-info"))
+            self.assertListEqual(
+                sorted(
+                    distribution.dumps()
+                    for distribution in scan_distributions(cwd / ".venv")
+                ),
+                [
+                    "--editable file:///src/my.package",
+                    "Foo_Bar==1.0",
+                    "baz@git+https://github.com/example/baz.git@abc123"
+                    "#subdirectory=src",
+                    "legacy==4.0",
+                    "qux@https://example.org/qux-3.0.tar.gz#sha256=0123",
+                ],
+            )
+
+    def test_sources_are_parsed_once_per_run(self):
+        with temp_cwd() as cwd:
+            package = cwd / "src" / "my.package"
+            package.mkdir(parents=True)
+            (package / "setup.cfg").write_text("[metadata]\nname = my.package\n")
+            (cwd / "etc" / "requirements.d").mkdir(parents=True)
+            (cwd / "etc" / "requirements.d" / "dev.txt").write_text(f"-e {package}\n")
+            (cwd / "etc" / "constraints.d").mkdir(parents=True)
+            pins = cwd / "etc" / "constraints.d" / "pins.txt"
+            pins.write_text("foo==1.0\nmy.package==1.0\n")
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: null\npip_requirements:\n  - bar\n"
+            )
+            install = InstallService(dont_ask=True)
+
+            import setuptools.config
+
+            with (
+                mock.patch(
+                    "plonex.services.install.RequirementsFile.from_file",
+                    wraps=RequirementsFile.from_file,
+                ) as mock_from_file,
+                mock.patch(
+                    "plonex.services.install.parse_constraints_file",
+                    wraps=parse_constraints_file,
+                ) as mock_parse_constraints,
+                mock.patch(
+                    "setuptools.config.read_configuration",
+                    wraps=setuptools.config.read_configuration,
+                ) as mock_read_configuration,
+            ):
+                install.make_constraints_txt()
+                install.make_constraints_txt()
+                self.assertSetEqual(install.developed_packages(), {"my-package"})
+                self.assertSetEqual(
+                    install.developed_packages_and_paths(),
+                    {f"my-package → {package}"},
+                )
+                _, constraints = install._collect_constraint_entries(pins)
+                # dev.txt and the pip_requirements option
+                self.assertEqual(mock_from_file.call_count, 2)
+                self.assertEqual(mock_parse_constraints.call_count, 1)
+                self.assertEqual(mock_read_configuration.call_count, 1)
+
+                # A changed file is parsed again
+                pins.write_text("foo==2.0\n")
+                _, constraints = install._collect_constraint_entries(pins)
+                self.assertEqual(mock_parse_constraints.call_count, 2)
+                self.assertListEqual(
+                    [requirement.dumps() for requirement in constraints.values()],
+                    ["foo==2.0"],
+                )
+
+    def test_offline_commands_install_from_the_wheelhouse(self):
+        self.addCleanup(setattr, BaseService, "offline", BaseService.offline)
+        BaseService.offline = True
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: null\n"
+                "wheelhouse: /srv/wheelhouse\n"
+                "uv: false\n"
+            )
+            install = InstallService(dont_ask=True)
+            with stub_virtualenv(install), install:
+                pass
+            offline_options = [
+                "--offline",
+                "--no-index",
+                "--find-links",
+                "/srv/wheelhouse",
+            ]
+            for command in (
+                install.command,
+                install.compile_command,
+                install.sync_command,
+            ):
+                self.assertListEqual(command[3:7], offline_options)
+
+            (cwd / ".venv" / "bin" / "uv").unlink()
+            with mock.patch.object(install, "execute_command") as mock_execute:
+                install.ensure_virtualenv()
+            mock_execute.assert_called_once_with(
+                [
+                    str(cwd / ".venv" / "bin" / "pip"),
+                    "install",
+                    *offline_options[1:],
+                    "uv",
+                ]
+            )
+
+    def test_wheelhouse_defaults_to_the_var_folder(self):
+        with temp_cwd() as cwd:
+            install = InstallService(dont_ask=True)
+            self.assertEqual(install.wheelhouse, cwd / "var" / "wheelhouse")
+            self.assertListEqual(install._uv_offline_options(), [])
+
+    def test_prefetch_fills_the_wheelhouse_from_an_index(self):
+        with temp_cwd() as cwd:
+            # A local folder stands in for the package index
+            index = cwd / "index"
+            index.mkdir()
+            for name in ("demo", "other", "pip", "uv", "setuptools", "wheel"):
+                make_wheel(index, name, "1.0")
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text("plonex_base_constraint: null\n")
+            install = InstallService(dont_ask=True)
+            with stub_virtualenv(install), install:
+                pip = cwd / ".venv" / "bin" / "pip"
+                pip.write_text(f'#!/bin/sh\nexec {sys.executable} -m pip "$@"\n')
+                pip.chmod(0o755)
+                install.wheelhouse.mkdir()
+                make_wheel(install.wheelhouse, "other", "1.0")
+                install.compiled_requirements_txt.write_text(
+                    "# This file was autogenerated by uv\n"
+                    "-e file:///src/my.package\n"
+                    "demo==1.0\n"
+                    "    # via -r var/requirements.txt\n"
+                    "other==1.0\n"
+                )
+                environment = {
+                    "PIP_NO_INDEX": "1",
+                    "PIP_FIND_LINKS": str(index),
+                    "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+                }
+                with (
+                    mock.patch.object(install, "run_command") as mock_run_command,
+                    mock.patch.object(
+                        install, "_download_wheels", wraps=install._download_wheels
+                    ) as mock_download,
+                    mock.patch.dict("os.environ", environment),
+                ):
+                    install.prefetch()
+                    install.prefetch()
+
+            mock_run_command.assert_called_with(install.compile_command)
+            # The second run finds everything in the wheelhouse
+            self.assertListEqual(
+                sorted(
+                    requirement
+                    for call in mock_download.call_args_list
+                    for requirement in call.args[0]
+                ),
+                ["demo==1.0", "pip", "setuptools", "uv", "wheel"],
+            )
+            self.assertListEqual(
+                sorted(wheel.name for wheel in install.wheelhouse.iterdir()),
+                [
+                    f"{name}-1.0-py3-none-any.whl"
+                    for name in ("demo", "other", "pip", "setuptools", "uv", "wheel")
+                ],
+            )
+
+    def test_prefetch_is_refused_offline(self):
+        self.addCleanup(setattr, BaseService, "offline", BaseService.offline)
+        BaseService.offline = True
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text("plonex_base_constraint: null\n")
+            install = InstallService(dont_ask=True)
+            with stub_virtualenv(install), install:
+                with (
+                    mock.patch.object(install, "run_command") as mock_run_command,
+                    mock.patch.object(install.logger, "error") as mock_error,
+                ):
+                    install.prefetch()
+            mock_run_command.assert_not_called()
+            mock_error.assert_called_once()
+
+    def test_build_new_virtualenv_and_rollback(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: null\n"
+                "python: /usr/bin/python3\n"
+                "uv: /usr/local/bin/uv\n"
+            )
+            install = InstallService(dont_ask=True)
+
+            def fake_run_command(command):
+                if command[2] == "compile":
+                    install.compiled_requirements_txt.write_text("demo==1.0\n")
+                elif command[2] == "sync":
+                    site_packages = (
+                        Path(command[4]).parent.parent / "lib" / "python3.12"
+                    ) / "site-packages"
+                    (site_packages / "demo-1.0.dist-info").mkdir(parents=True)
+
+            def fake_execute_command(command, cwd=None):
+                if command[1] == "venv":
+                    (Path(command[-1]) / "bin").mkdir(parents=True)
+                    (Path(command[-1]) / "bin" / "activate").touch()
+                elif command[-1] == "uv":
+                    (Path(command[4]).parent / "uv").touch()
+                return ""
+
+            with stub_virtualenv(install), install:
+                with (
+                    mock.patch.object(
+                        install, "run_command", side_effect=fake_run_command
+                    ),
+                    mock.patch.object(
+                        install, "execute_command", side_effect=fake_execute_command
+                    ) as mock_execute,
+                ):
+                    path = install.build_new()
+                    self.assertEqual(mock_execute.call_count, 2)
+                    # The same requirements reuse the same virtualenv
+                    self.assertEqual(install.build_new(), path)
+                    self.assertEqual(mock_execute.call_count, 2)
+
+            self.assertEqual(path.parent, cwd / ".venvs")
+            self.assertEqual(install.virtualenvs.current(), path.resolve())
+            self.assertEqual(install.virtualenv_dir, cwd / ".venv")
+            self.assertTrue(install.check(sync=True))
+            self.assertIn(
+                "lib/python3.12/site-packages/demo-1.0.dist-info",
+                install.installed_state.load()["distributions"],
+            )
+            adopted = install.virtualenvs.previous()
+            self.assertTrue((adopted / "bin" / "uv").exists())
+
+            self.assertTrue(install.rollback())
+            self.assertEqual(install.virtualenvs.current(), adopted)
+            self.assertEqual(install.virtualenvs.previous(), path.resolve())
+
+    def test_build_new_failure_keeps_the_current_virtualenv(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "plonex_base_constraint: null\npython: /usr/bin/python3\nuv: false\n"
+            )
+            install = InstallService(dont_ask=True)
+
+            def fake_run_command(command):
+                if command[2] == "compile":
+                    install.compiled_requirements_txt.write_text("demo==1.0\n")
+                else:
+                    sys.exit(1)
+
+            with stub_virtualenv(install), install:
+                with (
+                    mock.patch.object(
+                        install, "run_command", side_effect=fake_run_command
+                    ),
+                    mock.patch.object(install, "execute_command"),
+                    self.assertRaises(SystemExit),
+                ):
+                    install.build_new()
+
+            self.assertListEqual(list((cwd / ".venvs").iterdir()), [])
+            self.assertFalse((cwd / ".venv").is_symlink())
+            self.assertFalse(install.rollback())
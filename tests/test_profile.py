@@ -0,0 +1,195 @@
+from .utils import PloneXTestCase
+from .utils import temp_cwd
+from pathlib import Path
+from plonex.base import BaseService
+from plonex.services.profile import ProfileService
+from unittest import mock
+
+import os
+import sh  # type: ignore[import-untyped]
+import time
+
+
+REMOTE = "https://github.com/example/plonex-profile.git"
+
+
+class TestProfileService(PloneXTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = self.enterContext(temp_cwd())
+        self.cache_folder = self.temp_dir / "cache"
+        for cls, name in (
+            (ProfileService, "cache_folder"),
+            (ProfileService, "refresh"),
+            (BaseService, "offline"),
+        ):
+            self.addCleanup(setattr, cls, name, getattr(cls, name))
+        self.addCleanup(ProfileService._refreshed.clear)
+        ProfileService.cache_folder = self.cache_folder
+        self.commands: list[list[str]] = []
+
+    def fake_git(self, command, cwd=None, stream_output=None):
+        """Record the git commands and fake a clone"""
+        command = list(map(str, command))
+        self.commands.append(command)
+        if command[1] == "clone":
+            clone_target = Path(command[-1])
+            (clone_target / "etc").mkdir(parents=True)
+            (clone_target / "etc" / "plonex.yml").write_text("remote: true\n")
+        return ""
+
+    def source_path(self, source: str = REMOTE) -> Path:
+        with mock.patch.object(
+            ProfileService, "execute_command", side_effect=self.fake_git
+        ):
+            return ProfileService(source=source).source_path
+
+    def test_local_source(self):
+        (self.temp_dir / "profile").mkdir()
+        self.assertEqual(
+            self.source_path(str(self.temp_dir / "profile")),
+            self.temp_dir / "profile",
+        )
+        self.assertListEqual(self.commands, [])
+
+    def test_remote_source_is_cloned_once(self):
+        first = self.source_path()
+        second = self.source_path()
+        self.assertEqual(first, second)
+        self.assertTrue(first.is_relative_to(self.cache_folder))
+        self.assertTrue((first / "etc" / "plonex.yml").exists())
+        self.assertEqual(len(self.commands), 1)
+        self.assertEqual(self.commands[0][:4], ["git", "clone", "--depth", "1"])
+        # Only the clone is left in the cache folder
+        self.assertListEqual(
+            sorted(path.name for path in self.cache_folder.iterdir()),
+            [first.name, f"{first.name}.fetched"],
+        )
+
+    def test_ref_is_part_of_the_cache_key(self):
+        main = self.source_path(REMOTE)
+        tag = self.source_path(f"{REMOTE}#v1.0")
+        self.assertNotEqual(main, tag)
+        self.assertEqual(
+            self.commands[1][:7],
+            ["git", "clone", "--depth", "1", "--branch", "v1.0", REMOTE],
+        )
+
+    def test_stale_clone_is_fetched(self):
+        cache_path = self.source_path()
+        marker = cache_path.with_name(f"{cache_path.name}.fetched")
+        expired = time.time() - ProfileService.cache_ttl - 1
+        os.utime(marker, (expired, expired))
+        self.assertEqual(self.source_path(), cache_path)
+        self.assertListEqual(
+            [command[1] for command in self.commands], ["clone", "fetch", "reset"]
+        )
+        self.assertGreater(marker.stat().st_mtime, expired)
+
+    def test_refresh_fetches_once_per_process(self):
+        self.source_path()
+        ProfileService.refresh = True
+        self.source_path()
+        self.source_path()
+        self.assertListEqual(
+            [command[1] for command in self.commands], ["clone", "fetch", "reset"]
+        )
+
+    def test_failed_fetch_uses_the_cached_copy(self):
+        cache_path = self.source_path()
+        ProfileService.refresh = True
+        error = sh.ErrorReturnCode_128("git fetch", b"", b"")
+        with mock.patch.object(ProfileService, "execute_command", side_effect=error):
+            service = ProfileService(source=REMOTE)
+            service.logger = mock.Mock()
+            self.assertEqual(service.source_path, cache_path)
+        service.logger.warning.assert_called_once()
+
+    def test_offline_uses_the_stale_clone(self):
+        cache_path = self.source_path()
+        BaseService.offline = True
+        ProfileService.refresh = True
+        self.assertEqual(self.source_path(), cache_path)
+        self.assertEqual(len(self.commands), 1)
+
+    def test_offline_without_a_cached_clone(self):
+        BaseService.offline = True
+        with self.assertRaisesRegex(FileNotFoundError, "offline"):
+            self.source_path()
+        self.assertListEqual(self.commands, [])
+
+
+class TestProfileGraph(PloneXTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = self.enterContext(temp_cwd())
+
+    def write_profile(self, name: str, text: str) -> Path:
+        root = self.temp_dir / "profiles" / name
+        (root / "etc").mkdir(parents=True)
+        (root / "etc" / "plonex.yml").write_text(text)
+        return root
+
+    def write_diamond(self) -> None:
+        """Write a project whose two profiles extend the same base profile"""
+        self.write_profile("base", "value: base\nitems:\n  - base\n")
+        self.write_profile(
+            "left", "profiles:\n  - ../base\nvalue: left\n+items:\n  - left\n"
+        )
+        self.write_profile("right", "profiles:\n  - ../base\nright: true\n")
+        self.write_profile(
+            "top",
+            "profiles:\n  - ../left\n  - ../right\n+items:\n  - top\n",
+        )
+        (self.temp_dir / "etc").mkdir()
+        (self.temp_dir / "etc" / "plonex.yml").write_text(
+            "profiles:\n  - profiles/top\n"
+        )
+
+    def test_diamond_reads_each_profile_once(self):
+        self.write_diamond()
+        service = BaseService()
+        with mock.patch.object(
+            BaseService,
+            "_load_yaml_mapping",
+            autospec=True,
+            side_effect=BaseService._load_yaml_mapping,
+        ) as load_yaml_mapping:
+            graph = service.profile_graph
+        loaded = [call.args[1] for call in load_yaml_mapping.call_args_list]
+        self.assertEqual(len(loaded), len(set(loaded)))
+        self.assertEqual(len(graph.nodes), 4)
+
+    def test_roots_by_increasing_precedence(self):
+        self.write_diamond()
+        profiles = self.temp_dir.resolve() / "profiles"
+        self.assertListEqual(
+            BaseService().profile_roots,
+            [profiles / name for name in ("base", "left", "right", "top")],
+        )
+
+    def test_merged_options(self):
+        self.write_diamond()
+        options = BaseService().plonex_options
+        self.assertEqual(options["value"], "left")
+        self.assertTrue(options["right"])
+        self.assertListEqual(options["items"], ["base", "left", "top"])
+
+    def test_merged_options_does_not_change_the_graph(self):
+        self.write_diamond()
+        service = BaseService()
+        graph = service.profile_graph
+        merge = service._merge_options_with_prefixes
+        self.assertEqual(graph.merged_options(merge), graph.merged_options(merge))
+
+    def test_cycles(self):
+        self.write_profile("a", "profiles:\n  - ../b\na: true\n")
+        self.write_profile("b", "profiles:\n  - ../a\nb: true\n")
+        (self.temp_dir / "etc").mkdir()
+        (self.temp_dir / "etc" / "plonex.yml").write_text("profiles:\n  - profiles/a\n")
+        service = BaseService()
+        self.assertEqual(len(service.profile_roots), 2)
+        self.assertTrue(service.plonex_options["a"])
+        self.assertTrue(service.plonex_options["b"])
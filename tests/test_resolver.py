@@ -0,0 +1,114 @@
+from plonex.resolver import format_option_path
+from plonex.resolver import OptionsResolutionError
+from plonex.resolver import OptionsResolver
+from plonex.resolver import resolve_options
+from unittest import mock
+
+import unittest
+
+
+class TestResolver(unittest.TestCase):
+
+    def test_no_templates(self):
+        options = {"a": 1, "b": ["x", {"c": True}]}
+        resolved = resolve_options(options)
+        self.assertEqual(resolved, options)
+        self.assertIsNot(resolved, options)
+
+    def test_chained_references(self):
+        resolved = resolve_options(
+            {"a": "{{ b }}-x", "b": "{{ c }}", "c": 1, "d": ["{{ a }}"]}
+        )
+        self.assertEqual(resolved, {"a": "1-x", "b": "1", "c": 1, "d": ["1-x"]})
+
+    def test_nested_references(self):
+        resolved = resolve_options(
+            {
+                "sources": {
+                    "foo": {"repo": "{{ base_url }}/foo.git"},
+                    "bar": {"repo": "{{ sources.foo.repo }}"},
+                },
+                "environment_vars": {"REPO": "{{ sources['bar'].repo }}"},
+                "base_url": "https://{{ host }}",
+                "host": "example.com",
+            }
+        )
+        self.assertEqual(
+            resolved["sources"]["bar"]["repo"], "https://example.com/foo.git"
+        )
+        self.assertEqual(
+            resolved["environment_vars"]["REPO"], "https://example.com/foo.git"
+        )
+
+    def test_does_not_change_value_types(self):
+        resolved = resolve_options({"port": 8080, "url": "http://x:{{ port }}"})
+        self.assertEqual(resolved, {"port": 8080, "url": "http://x:8080"})
+
+    def test_templated_keys(self):
+        resolved = resolve_options(
+            {
+                "name": "{{ namespace }}.theme",
+                "namespace": "collective",
+                "sources": {"{{ name }}": {"repo": "https://x/{{ name }}.git"}},
+                "{{ namespace }}_port": 8080,
+            }
+        )
+        self.assertEqual(
+            resolved["sources"],
+            {"collective.theme": {"repo": "https://x/collective.theme.git"}},
+        )
+        self.assertEqual(resolved["collective_port"], 8080)
+        self.assertNotIn("{{ namespace }}_port", resolved)
+        self.assertEqual(
+            resolve_options({"a": "x", "b": [{"{{ a }}": 1}]}),
+            {"a": "x", "b": [{"x": 1}]},
+        )
+
+    def test_undefined_variables_render_empty(self):
+        self.assertEqual(resolve_options({"a": "x{{ missing }}y"}), {"a": "xy"})
+
+    def test_loop_variables_are_not_dependencies(self):
+        resolved = resolve_options(
+            {
+                "items": ["a", "b"],
+                "joined": "{% for item in items %}{{ item }}{% endfor %}",
+            }
+        )
+        self.assertEqual(resolved["joined"], "ab")
+
+    def test_value_can_reference_its_own_option(self):
+        resolved = resolve_options({"items": ["x", "{{ items | length }}"]})
+        self.assertEqual(resolved["items"], ["x", "2"])
+
+    def test_each_template_rendered_once(self):
+        options = {f"key{i}": f"{{{{ key{i + 1} }}}}" for i in range(50)}
+        options["key50"] = "end"
+        resolver = OptionsResolver()
+        with mock.patch.object(
+            resolver, "_render", wraps=resolver._render
+        ) as mock_render:
+            resolved = resolver.resolve(options)
+        self.assertEqual(resolved["key0"], "end")
+        self.assertEqual(mock_render.call_count, 50)
+
+    def test_cycle_reports_path(self):
+        with self.assertRaises(OptionsResolutionError) as cm:
+            resolve_options(
+                {
+                    "a": {"b": ["{{ c }}"]},
+                    "c": "{{ a.b[0] }}",
+                    "d": "{{ c }}",
+                    "e": "ok {{ f }}",
+                    "f": 1,
+                }
+            )
+        self.assertEqual(
+            str(cm.exception),
+            "Circular reference while resolving options: a.b[0] -> c -> a.b[0]",
+        )
+        # Values that do not depend on the cycle are still resolved
+        self.assertEqual(cm.exception.options["e"], "ok 1")
+        self.assertEqual(cm.exception.options["d"], "{{ c }}")
+
+    def test_format_option_path(self):
+        self.assertEqual(format_option_path(("a", "b", 0, "c")), "a.b[0].c")
@@ -0,0 +1,115 @@
+from .utils import commit
+from .utils import git
+from .utils import make_upstream
+from .utils import temp_cwd
+from plonex.base import BaseService
+from plonex.services.sources import SourcesService
+from plonex.services.sources.git import GitCheckout
+from unittest import mock
+
+import unittest
+
+
+class TestGitCheckout(unittest.TestCase):
+
+    def test_clone_and_update_a_branch(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            checkout = GitCheckout(
+                path=cwd / "src" / "my.package",
+                repo=upstream.as_uri(),
+                rev="main",
+                execute=BaseService.execute_command,
+            )
+            self.assertEqual(checkout.update(), "cloned")
+            self.assertEqual(
+                git(checkout.path, "config", "remote.origin.promisor"), "true"
+            )
+
+            latest = commit(upstream, "README.md", "second\n")
+            self.assertEqual(checkout.update(), "updated")
+            self.assertEqual(checkout.head(), latest)
+            self.assertEqual(git(checkout.path, "branch", "--show-current"), "main")
+
+    def test_pinned_commit_is_not_fetched_again(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            pinned = commit(upstream, "README.md", "pinned\n")
+            commit(upstream, "README.md", "later\n")
+            execute = mock.Mock(wraps=BaseService.execute_command)
+            checkout = GitCheckout(
+                path=cwd / "src" / "my.package",
+                repo=upstream.as_uri(),
+                rev=pinned[:12],
+                execute=execute,
+            )
+            self.assertEqual(checkout.update(), "cloned")
+            self.assertEqual(checkout.head(), pinned)
+            self.assertEqual((checkout.path / "README.md").read_text(), "pinned\n")
+
+            execute.reset_mock()
+            self.assertEqual(checkout.update(), f"already at {pinned[:12]}")
+            self.assertListEqual(
+                [call.args[0][3:] for call in execute.call_args_list],
+                [["rev-parse", "HEAD"]],
+            )
+
+    def test_update_to_a_tag(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            checkout = GitCheckout(
+                path=cwd / "src" / "my.package",
+                repo=upstream.as_uri(),
+                rev="main",
+                execute=BaseService.execute_command,
+            )
+            checkout.update()
+            tagged = commit(upstream, "README.md", "tagged\n")
+            git(upstream, "tag", "1.0")
+            commit(upstream, "README.md", "after the tag\n")
+
+            checkout.rev = "1.0"
+            self.assertEqual(checkout.update(), "updated")
+            self.assertEqual(checkout.head(), tagged)
+
+
+class TestGitEngine(unittest.TestCase):
+
+    def test_run_update_with_the_git_engine(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "sources_engine: git\n"
+                "sources:\n"
+                "    my.package:\n"
+                f"      repo: {upstream.as_uri()}\n"
+                "    missing.package:\n"
+                f"      repo: {(cwd / 'missing').as_uri()}\n"
+            )
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(svc.logger, "isEnabledFor", return_value=True),
+                    mock.patch.object(svc.console, "print") as mock_print,
+                ):
+                    svc.run_update(jobs=2)
+            self.assertTrue((cwd / "src" / "my.package" / "README.md").exists())
+            self.assertFalse((cwd / "var" / "gitman.yml").exists())
+            lines = [
+                str(call.args[0]) for call in mock_print.call_args_list if call.args
+            ]
+            self.assertIn("[green]✅[/green] my.package: cloned", lines)
+            self.assertTrue(
+                any(
+                    line.startswith("[red]❌[/red] missing.package: ") for line in lines
+                )
+            )
+
+    def test_unknown_engine_falls_back_to_gitman(self):
+        with temp_cwd() as cwd:
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text("sources_engine: svn\n")
+            svc = SourcesService()
+            with mock.patch.object(svc.logger, "warning") as mock_warning:
+                self.assertEqual(svc.update_engine, "gitman")
+            mock_warning.assert_called_once()
@@ -0,0 +1,182 @@
+from .utils import commit
+from .utils import git
+from .utils import make_upstream
+from .utils import temp_cwd
+from pathlib import Path
+from plonex.base import BaseService
+from plonex.services.sources import SourcesService
+from plonex.services.sources.git import GitCheckout
+from plonex.services.sources.reference import ReferenceCache
+from unittest import mock
+
+import unittest
+
+
+def alternates(checkout: Path) -> list[Path]:
+    path = checkout / ".git" / "objects" / "info" / "alternates"
+    if not path.exists():
+        return []
+    return [Path(line) for line in path.read_text().splitlines()]
+
+
+class TestReferenceCache(unittest.TestCase):
+
+    def test_mirror_path(self):
+        cache = ReferenceCache(folder=Path("/cache"), execute=mock.Mock())
+        https = cache.mirror_path("https://github.com/collective/my.package.git")
+        ssh = cache.mirror_path("git@github.com:collective/my.package.git")
+        self.assertEqual(https.parent, Path("/cache"))
+        self.assertTrue(https.name.startswith("my.package-"))
+        self.assertTrue(https.name.endswith(".git"))
+        self.assertTrue(ssh.name.startswith("my.package-"))
+        self.assertNotEqual(https, ssh)
+
+    def test_ensure_creates_then_refreshes_the_mirror(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            cache = ReferenceCache(
+                folder=cwd / "cache", execute=BaseService.execute_command
+            )
+            mirror = cache.ensure(upstream.as_uri())
+            self.assertEqual(mirror, cache.mirror_path(upstream.as_uri()))
+            self.assertEqual(git(mirror, "config", "core.bare"), "true")
+            self.assertEqual(git(mirror, "config", "gc.auto"), "0")
+            self.assertListEqual(
+                [path.name for path in (cwd / "cache").iterdir()], [mirror.name]
+            )
+
+            latest = commit(upstream, "README.md", "second\n")
+            self.assertEqual(cache.ensure(upstream.as_uri()), mirror)
+            self.assertEqual(git(mirror, "rev-parse", "main"), latest)
+
+    def test_ensure_without_a_mirror_to_use(self):
+        with temp_cwd() as cwd:
+            cache = ReferenceCache(
+                folder=cwd / "cache", execute=BaseService.execute_command
+            )
+            self.assertIsNone(cache.ensure((cwd / "missing").as_uri()))
+            self.assertListEqual(list((cwd / "cache").iterdir()), [])
+
+    def test_git_checkout_borrows_the_objects(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            cache = ReferenceCache(
+                folder=cwd / "cache", execute=BaseService.execute_command
+            )
+            mirror = cache.ensure(upstream.as_uri())
+            checkout = GitCheckout(
+                path=cwd / "src" / "my.package",
+                repo=upstream.as_uri(),
+                rev="main",
+                execute=BaseService.execute_command,
+                reference=mirror,
+            )
+            self.assertEqual(checkout.update(), "cloned")
+            self.assertListEqual(alternates(checkout.path), [mirror / "objects"])
+            self.assertEqual(
+                git(checkout.path, "config", "remote.origin.url"), upstream.as_uri()
+            )
+
+
+class TestSourcesReferenceCache(unittest.TestCase):
+
+    def write_config(self, cwd: Path, upstream: Path, engine: str = "gitman"):
+        (cwd / "etc").mkdir()
+        (cwd / "etc" / "plonex.yml").write_text(
+            f"sources_engine: {engine}\n"
+            f"sources_reference_cache: {cwd / 'cache'}\n"
+            "sources:\n"
+            "    my.package:\n"
+            f"      repo: {upstream.as_uri()}\n"
+        )
+
+    def test_reference_cache_option(self):
+        with temp_cwd() as cwd:
+            self.assertIsNone(SourcesService().reference_cache)
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "sources_reference_cache: var/mirrors\n"
+            )
+            cache = SourcesService().reference_cache
+            self.assertEqual(cache.folder, cwd / "var" / "mirrors")
+
+    def test_clone_missing_uses_the_mirror(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            self.write_config(cwd, upstream)
+            with SourcesService() as svc:
+                svc.run_clone_missing(assume_yes=True)
+                mirror = svc.reference_cache.mirror_path(upstream.as_uri())
+            checkout = cwd / "src" / "my.package"
+            self.assertTrue((checkout / "README.md").exists())
+            self.assertListEqual(alternates(checkout), [mirror / "objects"])
+
+    def test_git_engine_uses_the_mirror_for_new_clones_only(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            self.write_config(cwd, upstream, engine="git")
+            with SourcesService() as svc:
+                with mock.patch.object(svc.console, "print"):
+                    svc.run_update()
+                mirror = svc.reference_cache.mirror_path(upstream.as_uri())
+            checkout = cwd / "src" / "my.package"
+            self.assertListEqual(alternates(checkout), [mirror / "objects"])
+
+            latest = commit(upstream, "README.md", "second\n")
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(svc.console, "print"),
+                    mock.patch.object(svc, "_reference_for") as mock_reference,
+                ):
+                    svc.run_update()
+            mock_reference.assert_not_called()
+            self.assertEqual(git(checkout, "rev-parse", "HEAD"), latest)
+
+    def test_sources_sharing_a_repository_share_the_mirror(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                "sources_engine: git\n"
+                f"sources_reference_cache: {cwd / 'cache'}\n"
+                "sources:\n"
+                "    first.package:\n"
+                f"      repo: {upstream.as_uri()}\n"
+                "    second.package:\n"
+                f"      repo: {upstream.as_uri()}\n"
+            )
+            execute = mock.Mock(wraps=BaseService.execute_command)
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(svc.console, "print"),
+                    mock.patch.object(svc, "execute_command", execute),
+                ):
+                    svc.run_update(jobs=2)
+                mirror = svc.reference_cache.mirror_path(upstream.as_uri())
+            mirror_clones = [
+                call for call in execute.call_args_list if "--mirror" in call.args[0]
+            ]
+            self.assertEqual(len(mirror_clones), 1)
+            self.assertListEqual(list((cwd / "cache").iterdir()), [mirror])
+            for name in ("first.package", "second.package"):
+                checkout = cwd / "src" / name
+                self.assertTrue((checkout / "README.md").exists())
+                self.assertListEqual(alternates(checkout), [mirror / "objects"])
+
+    def test_clone_without_a_mirror_to_use(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            self.write_config(cwd, upstream)
+            with SourcesService() as svc:
+                with (
+                    mock.patch.object(
+                        ReferenceCache, "ensure", return_value=None
+                    ) as mock_ensure,
+                    mock.patch.object(svc.logger, "warning") as mock_warning,
+                ):
+                    svc.run_clone_missing(assume_yes=True)
+            mock_ensure.assert_called_once_with(upstream.as_uri())
+            mock_warning.assert_called_once()
+            checkout = cwd / "src" / "my.package"
+            self.assertTrue((checkout / "README.md").exists())
+            self.assertListEqual(alternates(checkout), [])
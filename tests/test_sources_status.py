@@ -0,0 +1,224 @@
+from .utils import commit
+from .utils import git
+from .utils import make_upstream
+from .utils import temp_cwd
+from plonex.services.describe import DescribeService
+from plonex.services.sources import SourcesService
+from plonex.services.sources.status import collect_status
+from plonex.services.sources.status import parse_status
+from plonex.services.sources.status import read_remote_url
+from plonex.services.sources.status import status_markers
+from plonex.services.sources.status import StatusIndex
+from textwrap import dedent
+from unittest import mock
+
+import unittest
+
+
+class TestCheckoutStatus(unittest.TestCase):
+
+    def test_parse_status(self):
+        output = dedent("""\
+            # branch.oid 0123456789abcdef0123456789abcdef01234567
+            # branch.head main
+            # branch.upstream origin/main
+            # branch.ab +2 -1
+            1 .M N... 100644 100644 100644 abc abc setup.py
+            """)
+        self.assertDictEqual(
+            parse_status(output),
+            {
+                "modified": True,
+                "head": "0123456789abcdef0123456789abcdef01234567",
+                "branch": "main",
+                "upstream": "origin/main",
+                "ahead": 2,
+                "behind": 1,
+            },
+        )
+        self.assertDictEqual(
+            parse_status("# branch.oid (initial)\n# branch.head (detached)\n"),
+            {"modified": False},
+        )
+
+    def test_read_remote_url(self):
+        with temp_cwd() as cwd:
+            (cwd / "config").write_text(dedent("""\
+                    [core]
+                    \tbare = false
+                    [remote "upstream"]
+                    \turl = https://example.com/upstream.git
+                    [remote "origin"]
+                    \tfetch = +refs/heads/*:refs/remotes/origin/*
+                    \turl = "git@github.com:example/my.package.git"
+                    """))
+            self.assertEqual(
+                read_remote_url(cwd), "git@github.com:example/my.package.git"
+            )
+            self.assertEqual(
+                read_remote_url(cwd, "upstream"), "https://example.com/upstream.git"
+            )
+            self.assertIsNone(read_remote_url(cwd, "missing"))
+
+    def test_collect_status_of_a_checkout(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            checkout = cwd / "src" / "my.package"
+            git(cwd, "clone", "-q", upstream.as_uri(), str(checkout))
+            commit(upstream, "upstream.txt", "new\n")
+            git(checkout, "fetch", "-q")
+            head = commit(checkout, "local.txt", "local\n")
+            (checkout / "untracked.txt").write_text("")
+            execute = mock.Mock(wraps=SourcesService.execute_command)
+
+            status = collect_status(checkout, execute)
+
+            execute.assert_called_once()
+            self.assertEqual(status.remote_url, upstream.as_uri())
+            self.assertEqual(status.branch, "main")
+            self.assertEqual(status.revision, "main")
+            self.assertEqual(status.head, head)
+            self.assertEqual(status.upstream, "origin/main")
+            self.assertEqual((status.ahead, status.behind), (1, 1))
+            self.assertTrue(status.modified)
+
+            git(checkout, "checkout", "-q", "--detach")
+            (checkout / "untracked.txt").unlink()
+            status = collect_status(checkout, execute)
+            self.assertIsNone(status.branch)
+            self.assertEqual(status.revision, head)
+            self.assertFalse(status.modified)
+
+    def test_collect_status_of_a_worktree(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            main = cwd / "main"
+            git(cwd, "clone", "-q", upstream.as_uri(), str(main))
+            worktree = cwd / "src" / "my.package"
+            git(main, "worktree", "add", "-q", "-b", "feature", str(worktree))
+            git(worktree, "branch", "-q", "--set-upstream-to", "origin/main")
+
+            status = collect_status(worktree, SourcesService.execute_command)
+            self.assertEqual(status.remote_url, upstream.as_uri())
+            self.assertEqual(status.branch, "feature")
+            self.assertEqual(status.upstream, "origin/main")
+            self.assertFalse(status.modified)
+            self.assertIn(
+                main / ".git" / "refs" / "heads" / "feature",
+                status_markers(worktree, status),
+            )
+
+            # Committing in the worktree invalidates the indexed status
+            index = StatusIndex(path=cwd / "status.json")
+            index.put(status)
+            self.assertEqual(index.get(worktree), status)
+            head = commit(worktree, "new.txt", "new\n")
+            self.assertIsNone(index.get(worktree))
+            status = collect_status(worktree, SourcesService.execute_command)
+            self.assertEqual((status.head, status.ahead), (head, 1))
+
+            # Fetching moves the upstream ref in the main git folder
+            index.put(status)
+            commit(upstream, "upstream.txt", "new\n")
+            git(worktree, "fetch", "-q")
+            self.assertIsNone(index.get(worktree))
+            status = collect_status(worktree, SourcesService.execute_command)
+            self.assertEqual((status.ahead, status.behind), (1, 1))
+
+    def test_collect_status_of_missing_and_plain_folders(self):
+        with temp_cwd() as cwd:
+            execute = mock.Mock()
+            status = collect_status(cwd / "missing", execute)
+            self.assertFalse(status.exists)
+            status = collect_status(cwd, execute)
+            self.assertTrue(status.exists)
+            self.assertFalse(status.is_git)
+            execute.assert_not_called()
+
+    def test_one_git_process_per_checkout(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            (cwd / "etc").mkdir()
+            sources = "sources:\n"
+            for name in ("a.package", "b.package", "c.package"):
+                git(cwd, "clone", "-q", upstream.as_uri(), str(cwd / "src" / name))
+                sources += f"    {name}:\n      repo: {upstream.as_uri()}\n"
+            (cwd / "src" / "b.package" / "new.txt").write_text("")
+            (cwd / "etc" / "plonex.yml").write_text(sources)
+
+            with mock.patch.object(
+                SourcesService,
+                "execute_command",
+                wraps=SourcesService.execute_command,
+            ) as mock_execute:
+                rows = DescribeService(target=cwd).sources_status_rows
+                with SourcesService(target=cwd) as svc:
+                    tainted = svc.list_tainted()
+
+            self.assertEqual(mock_execute.call_count, 6)
+            self.assertListEqual(
+                rows,
+                [
+                    (
+                        "a.package",
+                        "src/a.package",
+                        upstream.as_uri(),
+                        "✓",
+                        "branch:main",
+                    ),
+                    (
+                        "b.package",
+                        "src/b.package",
+                        upstream.as_uri(),
+                        "⚠",
+                        "modified, branch:main",
+                    ),
+                    (
+                        "c.package",
+                        "src/c.package",
+                        upstream.as_uri(),
+                        "✓",
+                        "branch:main",
+                    ),
+                ],
+            )
+            self.assertListEqual(tainted, [cwd / "src" / "b.package"])
+
+    def test_status_index(self):
+        with temp_cwd() as cwd:
+            upstream = make_upstream(cwd / "upstream")
+            checkout = cwd / "src" / "my.package"
+            git(cwd, "clone", "-q", upstream.as_uri(), str(checkout))
+            (cwd / "etc").mkdir()
+            (cwd / "etc" / "plonex.yml").write_text(
+                f"sources:\n    my.package:\n      repo: {upstream.as_uri()}\n"
+            )
+            svc = SourcesService(target=cwd)
+
+            def statuses(**kwargs):
+                with mock.patch.object(
+                    svc, "checkout_status", wraps=svc.checkout_status
+                ) as mock_status:
+                    status = svc.checkout_statuses([checkout], **kwargs)[checkout]
+                return status, mock_status.call_count
+
+            first, calls = statuses(cached=True)
+            self.assertEqual(calls, 1)
+            self.assertTrue(svc.status_index.path.exists())
+            self.assertEqual(statuses(cached=True), (first, 0))
+            self.assertEqual(statuses(cached=True, refresh=True), (first, 1))
+            # Without the index, the checkout is always inspected
+            self.assertEqual(statuses(), (first, 1))
+
+            # Committing moves the markers
+            head = commit(checkout, "new.txt", "new\n")
+            status, calls = statuses(cached=True)
+            self.assertEqual(calls, 1)
+            self.assertEqual(status.head, head)
+            self.assertEqual(status.ahead, 1)
+            self.assertEqual(statuses(cached=True), (status, 0))
+
+            git(checkout, "checkout", "-q", "-b", "feature")
+            status, calls = statuses(cached=True)
+            self.assertEqual(calls, 1)
+            self.assertEqual(status.branch, "feature")
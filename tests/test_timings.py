@@ -0,0 +1,182 @@
+from .utils import temp_cwd
+from concurrent.futures import ThreadPoolExecutor
+from plonex.timings import in_current_context
+from plonex.timings import rotate
+from plonex.timings import TimingsRecorder
+from threading import Barrier
+
+import json
+import unittest
+
+
+class TestTimingsRecorder(unittest.TestCase):
+
+    def test_inactive_spans_are_not_recorded(self):
+        recorder = TimingsRecorder()
+        with recorder.span("phase") as span:
+            pass
+        self.assertIsNone(span)
+        self.assertIsNone(recorder.root)
+        self.assertFalse(recorder.active)
+
+    def test_nested_spans(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex compile", target="/project")
+        with recorder.span("options"):
+            with recorder.span("profiles"):
+                pass
+        with recorder.span("command", cwd="/project"):
+            pass
+        self.assertIs(recorder.stop(), root)
+        self.assertFalse(recorder.active)
+        self.assertListEqual(
+            [child.name for child in root.children], ["options", "command"]
+        )
+        self.assertListEqual(
+            [child.name for child in root.children[0].children], ["profiles"]
+        )
+        self.assertEqual(root.children[1].attributes, {"cwd": "/project"})
+        self.assertGreaterEqual(root.wall, root.children[0].wall)
+
+    def test_span_is_closed_on_error(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex")
+        with self.assertRaises(ValueError):
+            with recorder.span("failing"):
+                raise ValueError
+        with recorder.span("next"):
+            pass
+        self.assertListEqual(
+            [child.name for child in root.children], ["failing", "next"]
+        )
+
+    def test_spans_of_concurrent_threads_are_siblings(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex")
+        # Keep all the worker spans open at the same time
+        barrier = Barrier(4)
+
+        def work(index: int) -> str | None:
+            with recorder.span(f"worker {index}"):
+                barrier.wait(timeout=5)
+                with recorder.span(f"step {index}"):
+                    pass
+            return recorder.current and recorder.current.name
+
+        with recorder.span("pool") as pool:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                currents = list(executor.map(in_current_context(work), range(4)))
+            self.assertIs(recorder.current, pool)
+        self.assertListEqual(currents, ["pool"] * 4)
+        self.assertListEqual([child.name for child in root.children], ["pool"])
+        self.assertListEqual(
+            sorted(child.name for child in pool.children),
+            [f"worker {index}" for index in range(4)],
+        )
+        for worker in pool.children:
+            self.assertListEqual(
+                [child.name for child in worker.children],
+                [worker.name.replace("worker", "step")],
+            )
+
+    def test_threads_without_the_context_record_nothing(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex")
+
+        def work() -> bool:
+            with recorder.span("worker") as span:
+                return span is None
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertTrue(executor.submit(work).result())
+        self.assertListEqual(root.children, [])
+
+    def test_render(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex")
+        with recorder.span("command [echo]"):
+            pass
+        recorder.stop()
+        tree = recorder.render(root)
+        self.assertTrue(str(tree.label).startswith("plonex "))
+        self.assertIn("ms wall", str(tree.label))
+        (child,) = tree.children
+        self.assertTrue(str(child.label).startswith("command \\[echo]"))
+
+    def test_write_json(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex", target="/project")
+        with recorder.span("options"):
+            pass
+        recorder.stop()
+        with temp_cwd() as temp_dir:
+            path = recorder.write_json(root, temp_dir / "var" / "log" / "timings")
+            data = json.loads(path.read_text())
+        self.assertEqual(data["name"], "plonex")
+        self.assertEqual(data["start"], 0)
+        self.assertEqual(data["attributes"], {"target": "/project"})
+        self.assertIn("created", data)
+        self.assertEqual(data["children"][0]["name"], "options")
+        self.assertGreaterEqual(data["children"][0]["start"], 0)
+
+    def test_otel_spans(self):
+        recorder = TimingsRecorder()
+        root = recorder.start("plonex", target="/project")
+        with self.assertRaises(ValueError):
+            with recorder.span("run compile", **{"plonex.service": "compile"}):
+                raise ValueError("broken")
+        recorder.stop()
+        parent, child = root.otel_spans(recorder.trace_id)
+        self.assertEqual(len(recorder.trace_id), 32)
+        self.assertEqual(parent["traceId"], recorder.trace_id)
+        self.assertEqual(child["traceId"], recorder.trace_id)
+        self.assertEqual(parent["parentSpanId"], "")
+        self.assertEqual(child["parentSpanId"], parent["spanId"])
+        self.assertEqual(len(child["spanId"]), 16)
+        self.assertEqual(parent["status"], {"code": 1})
+        self.assertEqual(child["status"], {"code": 2, "message": "ValueError: broken"})
+        self.assertLessEqual(
+            int(parent["startTimeUnixNano"]), int(child["startTimeUnixNano"])
+        )
+        self.assertLessEqual(
+            int(child["endTimeUnixNano"]), int(parent["endTimeUnixNano"])
+        )
+        self.assertIn(
+            {"key": "plonex.service", "value": {"stringValue": "compile"}},
+            child["attributes"],
+        )
+
+    def test_write_trace_appends_one_line_per_command(self):
+        recorder = TimingsRecorder()
+        with temp_cwd() as temp_dir:
+            path = temp_dir / "var" / "log" / "plonex-trace.jsonl"
+            for _ in range(2):
+                root = recorder.start("plonex")
+                with recorder.span("options"):
+                    pass
+                recorder.stop()
+                recorder.write_trace(root, path, resource={"process.pid": 42})
+            lines = path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        (resource_spans,) = json.loads(lines[0])["resourceSpans"]
+        self.assertIn(
+            {"key": "process.pid", "value": {"intValue": "42"}},
+            resource_spans["resource"]["attributes"],
+        )
+        (scope_spans,) = resource_spans["scopeSpans"]
+        self.assertEqual(scope_spans["scope"]["name"], "plonex")
+        self.assertListEqual(
+            [span["name"] for span in scope_spans["spans"]], ["plonex", "options"]
+        )
+
+    def test_rotate(self):
+        with temp_cwd() as temp_dir:
+            path = temp_dir / "trace.jsonl"
+            rotate(path, max_bytes=10, backup_count=2)
+            for content in ("first line\n", "second line\n", "third line\n"):
+                path.write_text(content)
+                rotate(path, max_bytes=10, backup_count=2)
+            self.assertFalse(path.exists())
+            self.assertEqual((temp_dir / "trace.jsonl.1").read_text(), "third line\n")
+            self.assertEqual((temp_dir / "trace.jsonl.2").read_text(), "second line\n")
+            self.assertFalse((temp_dir / "trace.jsonl.3").exists())
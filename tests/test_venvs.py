@@ -0,0 +1,88 @@
+from .utils import temp_cwd
+from pathlib import Path
+from plonex.services.install.venvs import Virtualenvs
+from unittest import mock
+
+import os
+import unittest
+
+
+def make_virtualenv(path: Path) -> Path:
+    (path / "bin").mkdir(parents=True)
+    (path / "bin" / "activate").touch()
+    return path
+
+
+class TestVirtualenvs(unittest.TestCase):
+
+    def test_switch_and_switch_back(self):
+        with temp_cwd() as cwd:
+            virtualenvs = Virtualenvs(target=cwd)
+            first = make_virtualenv(virtualenvs.path_for("first"))
+            second = make_virtualenv(virtualenvs.path_for("second"))
+            self.assertIsNone(virtualenvs.current())
+
+            virtualenvs.switch(first)
+            self.assertEqual(virtualenvs.current(), first.resolve())
+            self.assertIsNone(virtualenvs.previous())
+            # The symlinks are relative, the project folder can be moved
+            self.assertEqual(os.readlink(cwd / ".venv"), ".venvs/first")
+
+            virtualenvs.switch(second)
+            self.assertEqual(virtualenvs.current(), second.resolve())
+            self.assertEqual(virtualenvs.previous(), first.resolve())
+            self.assertTrue((cwd / ".venv" / "bin" / "activate").exists())
+
+            virtualenvs.switch(virtualenvs.previous())
+            self.assertEqual(virtualenvs.current(), first.resolve())
+            self.assertEqual(virtualenvs.previous(), second.resolve())
+            self.assertListEqual(
+                sorted(path.name for path in cwd.iterdir()), [".venv", ".venvs"]
+            )
+
+    def test_switch_adopts_a_virtualenv_folder(self):
+        with temp_cwd() as cwd:
+            virtualenvs = Virtualenvs(target=cwd)
+            make_virtualenv(cwd / ".venv")
+            (cwd / ".venv" / "bin" / "zope").write_text("#!.venv/bin/python\n")
+            new = make_virtualenv(virtualenvs.path_for("new"))
+
+            virtualenvs.switch(new)
+
+            adopted = virtualenvs.previous()
+            self.assertIsNotNone(adopted)
+            self.assertTrue(adopted.name.startswith("adopted-"))
+            self.assertEqual(adopted.parent, virtualenvs.folder.resolve())
+            self.assertTrue((adopted / "bin" / "zope").exists())
+            self.assertEqual(virtualenvs.current(), new.resolve())
+
+    def test_recover_after_an_interrupted_adoption(self):
+        with temp_cwd() as cwd:
+            virtualenvs = Virtualenvs(target=cwd)
+            make_virtualenv(cwd / ".venv")
+            with (
+                mock.patch("os.replace", side_effect=KeyboardInterrupt),
+                self.assertRaises(KeyboardInterrupt),
+            ):
+                virtualenvs.adopt()
+            self.assertFalse((cwd / ".venv").exists())
+
+            adopted = virtualenvs.recover()
+            self.assertTrue(adopted.name.startswith("adopted-"))
+            self.assertEqual(virtualenvs.current(), adopted.resolve())
+            self.assertTrue((cwd / ".venv" / "bin" / "activate").exists())
+            self.assertIsNone(virtualenvs.recover())
+
+            # Nothing to recover when there is no adopted virtualenv
+            (cwd / ".venv").unlink()
+            (adopted / "bin" / "activate").unlink()
+            self.assertIsNone(virtualenvs.recover())
+            self.assertFalse((cwd / ".venv").is_symlink())
+
+    def test_no_previous_virtualenv_when_it_was_removed(self):
+        with temp_cwd() as cwd:
+            virtualenvs = Virtualenvs(target=cwd)
+            virtualenvs.switch(make_virtualenv(virtualenvs.path_for("first")))
+            virtualenvs.switch(make_virtualenv(virtualenvs.path_for("second")))
+            (virtualenvs.path_for("first") / "bin" / "activate").unlink()
+            self.assertIsNone(virtualenvs.previous())
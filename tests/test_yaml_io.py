@@ -0,0 +1,52 @@
+from .utils import temp_cwd
+from plonex import yaml_io
+from unittest import mock
+
+import unittest
+import yaml
+
+
+class TestYamlIO(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = self.enterContext(temp_cwd())
+        self.addCleanup(yaml_io.clear_cache)
+
+    def test_uses_libyaml_when_available(self):
+        if not yaml.__with_libyaml__:
+            self.skipTest("PyYAML is built without libyaml")
+        self.assertIs(yaml_io.SafeLoader, yaml.CSafeLoader)
+        self.assertIs(yaml_io.SafeDumper, yaml.CSafeDumper)
+
+    def test_round_trip(self):
+        data = {"b": [1, 2], "a": {"c": "d"}}
+        text = yaml_io.dump(data, sort_keys=True)
+        self.assertTrue(text.startswith("a:"))
+        self.assertEqual(yaml_io.safe_load(text), data)
+
+    def test_dump_refuses_python_objects(self):
+        with self.assertRaises(yaml.representer.RepresenterError):
+            yaml_io.dump({"path": object()})
+
+    def test_load_file_is_cached(self):
+        path = self.temp_dir / "plonex.yml"
+        path.write_text("key: value\n")
+        self.assertEqual(yaml_io.load_file(path), {"key": "value"})
+        with mock.patch("plonex.yaml_io.safe_load") as mock_load:
+            self.assertEqual(yaml_io.load_file(path), {"key": "value"})
+        mock_load.assert_not_called()
+
+    def test_load_file_returns_copies(self):
+        path = self.temp_dir / "plonex.yml"
+        path.write_text("items:\n  - one\n")
+        yaml_io.load_file(path)["items"].append("two")
+        self.assertEqual(yaml_io.load_file(path), {"items": ["one"]})
+
+    def test_load_file_notices_changes(self):
+        path = self.temp_dir / "plonex.yml"
+        path.write_text("key: old\n")
+        self.assertEqual(yaml_io.load_file(path), {"key": "old"})
+        # Same size, written right away: only the content hash can tell
+        path.write_text("key: new\n")
+        self.assertEqual(yaml_io.load_file(path), {"key": "new"})
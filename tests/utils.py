@@ -2,11 +2,16 @@ from contextlib import chdir
 from contextlib import contextmanager
 from dataclasses import dataclass
 from dataclasses import field
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from pathlib import Path
 from plonex import logger
 from tempfile import TemporaryDirectory
+from threading import Thread
 
+import hashlib
 import logging
+import subprocess
 import unittest
 
 
@@ -49,6 +54,89 @@ def temp_cwd():
             yield temp_dir_path
 
 
+@contextmanager
+def serve_files(files: dict[str, str]):
+    """Serve the files (a path to text mapping) over HTTP on localhost.
+
+    The server supports conditional requests with ETag.
+    Yields the base URL and the list of (path, status) of the answered requests.
+    """
+    log: list[tuple[str, int]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path not in files:
+                log.append((self.path, 404))
+                self.send_error(404)
+                return
+            body = files[self.path].encode()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                log.append((self.path, 304))
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            log.append((self.path, 200))
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", log
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def git(path: Path, *args: str) -> str:
+    """Run git in a folder and return its output"""
+    return subprocess.run(
+        [
+            "git",
+            "-C",
+            str(path),
+            "-c",
+            "user.name=Test",
+            "-c",
+            "user.email=test@example.com",
+            *args,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def commit(path: Path, filename: str, content: str) -> str:
+    (path / filename).write_text(content)
+    git(path, "add", filename)
+    git(path, "commit", "-q", "-m", f"Update {filename}")
+    return git(path, "rev-parse", "HEAD")
+
+
+def make_upstream(path: Path) -> Path:
+    """Create a repository to clone with a file:// URL"""
+    path.mkdir(parents=True)
+    git(path, "init", "-q", "-b", "main")
+    # Allow partial clones through the file:// protocol
+    git(path, "config", "uploadpack.allowFilter", "true")
+    git(path, "config", "uploadpack.allowAnySHA1InWant", "true")
+    commit(path, "README.md", "first\n")
+    return path
+
+
 @dataclass
 class ReadExpected:
 